@@ -5,17 +5,20 @@ import os
 # Add src directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.utils.session_manager import initialize_session_state, get_form_data, load_data_from_url_params
+from src.utils.session_manager import initialize_session_state, get_form_data, load_data_from_url_params, load_job_from_url_params, autosave_form_data, pull_job_changes, record_form_history
 from src.components.report_type_selector import render_report_type_selector
 from src.components.general_info import render_general_info
-from src.components.canopy_config import render_canopy_configuration
 from src.components.sidebar import render_sidebar
-from src.components.signature_notes import render_signature_and_notes
-from src.components.action_buttons import render_action_buttons
 from src.components.edge_box_check import render_edge_box_check
-from src.components.uv_checklist import render_uv_checklist
 from src.components.save_share import render_save_share_section, render_load_shared_data_notification
-from src.utils.session_manager import has_uv_technology
+from src.utils.session_manager import has_uv_technology, is_debug_mode
+from src.utils.session_memory import track_session
+from src.utils.render_pool import start_render_pool
+
+# Components that pull in heavy dependencies (pandas, PIL, streamlit-drawable-canvas,
+# docxtpl/python-docx) are imported inside main() right before they render, so the
+# first sections reach the browser without waiting for those libraries to load.
+# Run `python -m src.utils.import_profiler` to check what is loaded at startup.
 
 # Configure the page
 st.set_page_config(
@@ -33,10 +36,16 @@ def main():
     # Initialize session state
     initialize_session_state()
     
-    # Check for shared data in URL parameters
-    if load_data_from_url_params():
+    # Warm up the render workers in the background (once per server process)
+    start_render_pool()
+    
+    # Check for shared data in URL parameters (job share token, or the older inline data link)
+    if load_job_from_url_params() or load_data_from_url_params():
         st.session_state.data_loaded_from_url = True
     
+    # Merge changes made to this job elsewhere (office pre-fill <-> technician completion)
+    pull_job_changes()
+    
     # Show notification if data was loaded from shared link
     render_load_shared_data_notification()
     
@@ -53,8 +62,14 @@ def main():
     # Canopy Configuration Section (only for Canopy Commissioning reports)
     if report_type == "Canopy Commissioning":
         st.markdown("---")
+        from src.components.canopy_config import render_canopy_configuration
         render_canopy_configuration()
         
+        # Results Summary - the same tables and charts as the report
+        st.markdown("---")
+        from src.components.results_summary import render_results_summary
+        render_results_summary()
+        
     # Edge Box Check Section (optional)
     st.markdown("---")
     render_edge_box_check()
@@ -65,11 +80,44 @@ def main():
     
     # Signature and Notes Section
     st.markdown("---")
+    from src.components.signature_notes import render_signature_and_notes
     render_signature_and_notes()
     
+    # Live Report Preview
+    st.markdown("---")
+    from src.components.report_preview import render_report_preview
+    render_report_preview()
+    
     # Action Buttons
     st.markdown("---")
+    from src.components.action_buttons import render_action_buttons
     render_action_buttons()
+    
+    # Archive of earlier generated reports
+    st.markdown("---")
+    from src.components.report_archive import render_report_archive
+    render_report_archive()
+    
+    # Record this run's changes as an undo step (after every component has updated form_data)
+    record_form_history()
+    from src.components.undo_redo import render_undo_redo
+    with st.sidebar:
+        render_undo_redo()
+    
+    # Save to the shared job store so any app process can resume this job
+    autosave_form_data()
+    
+    # Debug panels - rendered last so they reflect this run's session state
+    if is_debug_mode():
+        from src.components.session_debug import render_session_debug, render_memory_debug, render_render_pool_debug, render_derived_values_debug
+        with st.sidebar:
+            render_session_debug()
+            render_memory_debug()
+            render_render_pool_debug()
+            render_derived_values_debug()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Register this session for memory accounting and bring back anything spilled while idle;
+    # the session isn't spilled while the run is in progress
+    with track_session():
+        main()
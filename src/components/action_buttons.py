@@ -1,7 +1,7 @@
 import streamlit as st
 import os
-from src.utils.session_manager import clear_form_data, get_form_data
-from src.utils.document_generator import generate_document, generate_filename
+import hashlib
+from src.utils.session_manager import clear_form_data, form_data_fingerprint, get_form_data, get_job_id
 
 def render_action_buttons():
     """Render action buttons for document generation."""
@@ -20,23 +20,101 @@ def render_action_buttons():
         if os.path.exists(template_path):
             st.info(f"📋 Using template: **{template_filename}** for {report_type}")
             
+            output_format = st.radio("Output format", ["Word (.docx)", "Word + PDF"], horizontal=True, key="output_format")
+            
             if st.button("📥 Generate & Download Document", type="primary"):
                 try:
+                    # docxtpl/python-docx/PIL are only loaded once a document is requested
+                    from src.utils.document_generator import generate_document, generate_filename
+                    
                     doc_bytes = generate_document(template_path)
                     filename = generate_filename(form_data)
+                    fingerprint = form_data_fingerprint(form_data)
                     
-                    st.download_button(
-                        label="💾 Download Generated Document",
-                        data=doc_bytes,
-                        file_name=filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+                    # Shrink the report for download over site connections
+                    optimization = None
+                    try:
+                        from src.utils.output_optimizer import optimize_docx
+                        doc_bytes, optimization = optimize_docx(doc_bytes)
+                    except Exception as e:
+                        # The unoptimized report is still valid
+                        st.warning(f"⚠️ The report couldn't be optimized, so it is larger than usual: {str(e)}")
+                    
+                    # Kept in session state so the download stays available across reruns
+                    # (and can be spilled to disk if the session goes idle), for as long as
+                    # the form data it was generated from doesn't change
+                    generated_document = {'data': doc_bytes, 'file_name': filename, 'optimization': optimization,
+                                          'form_fingerprint': fingerprint}
+                    
+                    # PDF from the converter pool (cached by content, so regenerating an unchanged report is instant)
+                    if output_format == "Word + PDF":
+                        from src.utils.pdf_converter import PdfConversionError, convert_to_pdf, pdf_filename
+                        try:
+                            with st.spinner("Converting to PDF..."):
+                                generated_document['pdf'] = {'data': convert_to_pdf(doc_bytes), 'file_name': pdf_filename(filename)}
+                        except PdfConversionError as e:
+                            st.warning(f"⚠️ PDF export unavailable: {str(e)}")
+                    
+                    st.session_state.generated_document = generated_document
+                    
+                    # Keep every generated report in the archive (stored once per distinct report)
+                    try:
+                        from src.utils.report_archive import archive_report
+                        archive_report(doc_bytes, form_data, filename, pdf=generated_document.get('pdf', {}).get('data'),
+                                       job_id=get_job_id())
+                    except Exception as e:
+                        st.warning(f"⚠️ The report couldn't be added to the archive: {str(e)}")
+                    
+                    # Also keep it in the shared job store so the job can be resumed on another app process
+                    try:
+                        from src.utils.job_store import get_job_store
+                        get_job_store().save_artifact(get_job_id(), 'report', doc_bytes,
+                                                      {'file_name': filename, 'form_fingerprint': fingerprint})
+                        if 'pdf' in generated_document:
+                            get_job_store().save_artifact(get_job_id(), 'report_pdf', generated_document['pdf']['data'], {
+                                'file_name': generated_document['pdf']['file_name'],
+                                'docx_sha256': hashlib.sha256(doc_bytes).hexdigest()
+                            })
+                    except Exception as e:
+                        st.warning(f"⚠️ The report couldn't be saved with the job, so other devices won't see it: {str(e)}")
                     
                     st.success("✅ Document generated successfully!")
                     
                 except Exception as e:
                     st.error(f"❌ Error generating document: {str(e)}")
                     st.exception(e)
+            
+            generated_document = st.session_state.get('generated_document')
+            if generated_document and generated_document.get('form_fingerprint') != form_data_fingerprint(form_data):
+                # Edited since it was generated - don't offer a report that doesn't match the form
+                st.session_state.pop('generated_document', None)
+                generated_document = None
+                st.info("ℹ️ The form has changed since the document was generated. Generate it again to download it.")
+            if generated_document:
+                st.download_button(
+                    label="💾 Download Generated Document",
+                    data=generated_document['data'],
+                    file_name=generated_document['file_name'],
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+                
+                if generated_document.get('pdf'):
+                    st.download_button(
+                        label="📑 Download PDF",
+                        data=generated_document['pdf']['data'],
+                        file_name=generated_document['pdf']['file_name'],
+                        mime="application/pdf"
+                    )
+                
+                optimization = generated_document.get('optimization')
+                if optimization:
+                    st.caption(
+                        f"📦 Report size: {optimization['input_bytes'] / 1024:.0f} KB → "
+                        f"{optimization['output_bytes'] / 1024:.0f} KB "
+                        f"(optimized in {optimization['seconds'] * 1000:.0f} ms)"
+                    )
+                    if not optimization['within_budget']:
+                        st.warning("⚠️ The report is larger than the download size budget even with images reduced.")
         else:
             st.error(f"❌ Template not found: {template_filename}")
             st.info("Please ensure the correct template file is in the templates/ directory.")
@@ -45,12 +123,8 @@ def render_action_buttons():
 
 def get_template_for_report_type(report_type: str) -> str:
     """Get the template filename based on report type."""
-    template_mapping = {
-        "Canopy Commissioning": "Canopy Commissioning Report Template 2022.docx",
-        "Supply Air Analysis": "supply_air_analysis_template.docx", 
-        "Full System Report": "full_system_report_template.docx"
-    }
+    from src.config import REPORT_TEMPLATES
     
-    return template_mapping.get(report_type, "canopy_commissioning_template.docx")
+    return REPORT_TEMPLATES.get(report_type, "canopy_commissioning_template.docx")
 
  
\ No newline at end of file
@@ -1,9 +1,11 @@
 import streamlit as st
-from src.config import CANOPY_MODELS, MAX_CANOPIES, MAX_SECTIONS, get_k_factor, is_length_based_model, get_available_ksas, is_cxw_model, is_cmwf_model, is_cmwi_model, is_cmw_anemometer_model, is_cmw_model, calculate_cxw_flowrate, calculate_cmwf_flowrate, calculate_cmwi_flowrate, calculate_free_area_from_grill_size, calculate_free_area_from_slot_dimensions, is_uv_model, UV_SYSTEM_CHECKLIST, WATER_WASH_SYSTEM_CHECKLIST
+from src.config import CANOPY_MODELS, MAX_CANOPIES, MAX_SECTIONS, is_length_based_model, get_available_ksas, is_cxw_model, is_cmwf_model, is_cmwi_model, is_cmw_anemometer_model, is_cmw_model, is_uv_model, UV_SYSTEM_CHECKLIST, WATER_WASH_SYSTEM_CHECKLIST
 from src.utils.session_manager import get_form_data, update_form_data, initialize_canopy_data, initialize_section_data
+from src.utils.derived_values import get_derived_value
+from src.utils.session_keys import canopy_key, section_key, checklist_key, collect_orphaned_keys, collect_orphaned_section_keys
 from src.components.water_wash_checklist import render_water_wash_checklist_for_canopy
-
-import pandas as pd
+from src.components.schedule_import import render_schedule_import
+from src.components.section_grid_editor import render_section_grid
 
 def safe_float(value, default=0.0):
     """Safely convert a value to float, handling string inputs from session state."""
@@ -45,6 +47,9 @@ def render_canopy_configuration():
     """Render the canopy configuration component."""
     st.header("🏭 Canopy Configuration")
     
+    # Bulk import must run before the canopy widgets below are created
+    render_schedule_import()
+    
     # Initialize session state for number of canopies if not exists
     if 'num_canopies' not in st.session_state:
         st.session_state.num_canopies = safe_int(get_form_data('num_canopies', 1), min_value=1, max_value=MAX_CANOPIES)
@@ -62,11 +67,22 @@ def render_canopy_configuration():
     num_canopies_value = safe_int(st.session_state.get('num_canopies', 1), min_value=1, max_value=MAX_CANOPIES)
     
     update_form_data({'num_canopies': num_canopies_value})
+    
+    # Drop widget keys and checklist data of canopies that were removed
+    collect_orphaned_keys(num_canopies_value)
     initialize_canopy_data(num_canopies_value)
     
     # Display canopy input forms
     st.subheader("📝 Canopy Details")
     
+    st.radio(
+        "Section data entry",
+        options=["Form", "Grid"],
+        key="section_entry_mode",
+        horizontal=True,
+        help="Grid shows one editable table per canopy - faster for large jobs and supports pasting readings from a spreadsheet"
+    )
+    
     for i in range(num_canopies_value):
         with st.expander(f"Canopy {i+1}", expanded=i == 0):
             render_single_canopy(i)
@@ -80,9 +96,9 @@ def render_single_canopy(canopy_index: int):
     canopy = canopies[canopy_index]
     
     # Initialize session state values if not exists
-    drawing_key = f"drawing_number_{canopy_index}"
-    location_key = f"canopy_location_{canopy_index}"
-    model_key = f"canopy_model_{canopy_index}"
+    drawing_key = canopy_key('drawing_number', canopy_index)
+    location_key = canopy_key('canopy_location', canopy_index)
+    model_key = canopy_key('canopy_model', canopy_index)
     
     if drawing_key not in st.session_state:
         st.session_state[drawing_key] = safe_str(canopy.get('drawing_number', ''))
@@ -134,9 +150,9 @@ def render_single_canopy(canopy_index: int):
     st.markdown("---")
     
     # Initialize toggle keys
-    marvel_key = f"with_marvel_{canopy_index}"
-    uv_key = f"with_uv_checks_{canopy_index}"
-    water_wash_key = f"with_water_wash_checks_{canopy_index}"
+    marvel_key = canopy_key('with_marvel', canopy_index)
+    uv_key = canopy_key('with_uv_checks', canopy_index)
+    water_wash_key = canopy_key('with_water_wash_checks', canopy_index)
     
     if marvel_key not in st.session_state:
         st.session_state[marvel_key] = canopy.get('with_marvel', False)
@@ -218,9 +234,9 @@ def render_single_canopy(canopy_index: int):
         col1, col2, col3 = st.columns(3)
         
         # Initialize session state for CXW fields
-        grill_key = f"grill_size_{canopy_index}"
-        grills_key = f"number_of_grills_{canopy_index}"
-        design_key = f"design_airflow_{canopy_index}"
+        grill_key = canopy_key('grill_size', canopy_index)
+        grills_key = canopy_key('number_of_grills', canopy_index)
+        design_key = canopy_key('design_airflow', canopy_index)
         
         if grill_key not in st.session_state:
             st.session_state[grill_key] = safe_str(canopy.get('grill_size', ''))
@@ -269,8 +285,8 @@ def render_single_canopy(canopy_index: int):
         col1, col2 = st.columns(2)
         
         # Initialize session state for CMWF fields
-        slot_length_key = f"slot_length_{canopy_index}"
-        slot_width_key = f"slot_width_{canopy_index}"
+        slot_length_key = canopy_key('slot_length', canopy_index)
+        slot_width_key = canopy_key('slot_width', canopy_index)
         
         if slot_length_key not in st.session_state:
             st.session_state[slot_length_key] = safe_float(canopy.get('slot_length', 0))
@@ -298,9 +314,9 @@ def render_single_canopy(canopy_index: int):
         col1, col2, col3 = st.columns(3)
         
         # Initialize session state for other CMWF fields
-        sections_key = f"number_of_sections_{canopy_index}"
-        design_key = f"design_airflow_{canopy_index}"
-        supply_key = f"supply_airflow_{canopy_index}"
+        sections_key = canopy_key('number_of_sections', canopy_index)
+        design_key = canopy_key('design_airflow', canopy_index)
+        supply_key = canopy_key('supply_airflow', canopy_index)
         
         if sections_key not in st.session_state:
             st.session_state[sections_key] = safe_int(canopy.get('number_of_sections', 1), min_value=1, max_value=MAX_SECTIONS)
@@ -350,8 +366,8 @@ def render_single_canopy(canopy_index: int):
         col1, col2 = st.columns(2)
         
         # Initialize session state for CMWI fields
-        slot_length_key = f"slot_length_{canopy_index}"
-        slot_width_key = f"slot_width_{canopy_index}"
+        slot_length_key = canopy_key('slot_length', canopy_index)
+        slot_width_key = canopy_key('slot_width', canopy_index)
         
         if slot_length_key not in st.session_state:
             st.session_state[slot_length_key] = safe_float(canopy.get('slot_length', 0))
@@ -379,8 +395,8 @@ def render_single_canopy(canopy_index: int):
         col1, col2 = st.columns(2)
         
         # Initialize session state for other CMWI fields
-        sections_key = f"number_of_sections_{canopy_index}"
-        design_key = f"design_airflow_{canopy_index}"
+        sections_key = canopy_key('number_of_sections', canopy_index)
+        design_key = canopy_key('design_airflow', canopy_index)
         
         if sections_key not in st.session_state:
             st.session_state[sections_key] = safe_int(canopy.get('number_of_sections', 1), min_value=1, max_value=MAX_SECTIONS)
@@ -419,9 +435,9 @@ def render_single_canopy(canopy_index: int):
         col1, col2, col3 = st.columns(3)
         
         # Initialize session state for length-based fields
-        length_key = f"canopy_length_{canopy_index}"
-        design_key = f"design_airflow_{canopy_index}"
-        supply_key = f"supply_airflow_{canopy_index}"
+        length_key = canopy_key('canopy_length', canopy_index)
+        design_key = canopy_key('design_airflow', canopy_index)
+        supply_key = canopy_key('supply_airflow', canopy_index)
         
         if length_key not in st.session_state:
             st.session_state[length_key] = safe_int(canopy.get('canopy_length', 1000), min_value=1000, max_value=4000)
@@ -469,9 +485,9 @@ def render_single_canopy(canopy_index: int):
         col1, col2, col3 = st.columns(3)
         
         # Initialize session state for section-based fields
-        sections_key = f"number_of_sections_{canopy_index}"
-        design_key = f"design_airflow_{canopy_index}"
-        supply_key = f"supply_airflow_{canopy_index}"
+        sections_key = canopy_key('number_of_sections', canopy_index)
+        design_key = canopy_key('design_airflow', canopy_index)
+        supply_key = canopy_key('supply_airflow', canopy_index)
         
         if sections_key not in st.session_state:
             st.session_state[sections_key] = safe_int(canopy.get('number_of_sections', 1), min_value=1, max_value=MAX_SECTIONS)
@@ -516,9 +532,9 @@ def render_single_canopy(canopy_index: int):
     else:
         # No model selected - use default values (already initialized above)
         # Update values from session state or use defaults
-        design_key = f"design_airflow_{canopy_index}"
-        supply_key = f"supply_airflow_{canopy_index}"
-        sections_key = f"number_of_sections_{canopy_index}"
+        design_key = canopy_key('design_airflow', canopy_index)
+        supply_key = canopy_key('supply_airflow', canopy_index)
+        sections_key = canopy_key('number_of_sections', canopy_index)
         
         # Get values from session state if they exist, otherwise use defaults
         design_airflow_value = safe_float(st.session_state.get(design_key, canopy.get('design_airflow', 0.0)))
@@ -557,8 +573,16 @@ def render_single_canopy(canopy_index: int):
     
     get_form_data('canopies')[canopy_index].update(canopy_data)
     
+    # Drop widget keys of sections that were removed
+    collect_orphaned_section_keys(canopy_index, number_of_sections_value)
+    
     # Section-specific data collection
     render_section_data(canopy_index, canopy_model_value, with_marvel_value, number_of_sections_value)
+    
+    # Site photos of the canopy (filters, plenums, ...)
+    from src.components.photo_upload import render_photo_attachments
+    photos = get_form_data('canopies')[canopy_index].setdefault('photos', [])
+    render_photo_attachments(photos, lambda field: canopy_key(field, canopy_index), "📷 Canopy Photos")
 
 def render_section_data(canopy_index: int, canopy_model: str, with_marvel: bool, number_of_sections: int):
     """Render section data collection for a canopy."""
@@ -573,6 +597,11 @@ def render_section_data(canopy_index: int, canopy_model: str, with_marvel: bool,
         # Initialize section data first
         initialize_section_data(canopy_index, number_of_sections, with_marvel)
         
+        # Grid mode: one data editor for all sections instead of widgets per section
+        if st.session_state.get('section_entry_mode') == "Grid":
+            render_section_grid(canopy_index, canopy_model, with_marvel)
+            return
+        
         # Display section input forms
         for section_idx in range(number_of_sections):
             with st.container():
@@ -609,17 +638,13 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # CXW models need anemometer reading - free area is calculated from grill size
         st.markdown("**Extract Air Readings**")
         
-        # Get grill size from canopy data
-        canopy = get_form_data('canopies')[canopy_index]
-        grill_size = canopy.get('grill_size', '')
-        
-        # Calculate free area from grill size
-        free_area = calculate_free_area_from_grill_size(grill_size)
+        # Free area calculated from the canopy's grill size
+        free_area = get_derived_value('free_area', canopy_index)
         
         col1, col2 = st.columns(2)
         
         # Initialize session state for CXW section fields
-        anemometer_key = f"anemometer_reading_{canopy_index}_{section_idx}"
+        anemometer_key = section_key('anemometer_reading', canopy_index, section_idx)
         if anemometer_key not in st.session_state:
             st.session_state[anemometer_key] = safe_float(section.get('anemometer_reading', 0.0))
         
@@ -642,9 +667,10 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # Get value from session state
         anemometer_reading = st.session_state.get(anemometer_key, 0.0)
         
-        # Calculate and display flowrates
+        # Calculate and display flowrates (the reading is stored first, so the derived flowrate uses it)
+        section['anemometer_reading'] = anemometer_reading
         if anemometer_reading > 0 and free_area > 0:
-            flowrate_m3h, flowrate_m3s = calculate_cxw_flowrate(free_area, anemometer_reading)
+            flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, section_idx)
             st.write(f"**Flowrate: {flowrate_m3h:.2f} m³/h ({flowrate_m3s:.3f} m³/s)**")
         
         # Update section data for CXW
@@ -659,9 +685,9 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
             col1, col2, col3 = st.columns(3)
             
             # Initialize session state for Marvel fields
-            min_key = f"min_percent_{canopy_index}_{section_idx}"
-            idle_key = f"idle_percent_{canopy_index}_{section_idx}"
-            design_key = f"design_m3s_{canopy_index}_{section_idx}"
+            min_key = section_key('min_percent', canopy_index, section_idx)
+            idle_key = section_key('idle_percent', canopy_index, section_idx)
+            design_key = section_key('design_m3s', canopy_index, section_idx)
             
             if min_key not in st.session_state:
                 st.session_state[min_key] = safe_float(section.get('min_percent', 0.0))
@@ -716,18 +742,13 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # CMWF models need anemometer reading - free area is calculated from slot dimensions
         st.markdown("**Extract Air Readings**")
         
-        # Get slot dimensions from canopy data
-        canopy = get_form_data('canopies')[canopy_index]
-        slot_length = canopy.get('slot_length', 0.0)
-        slot_width = canopy.get('slot_width', 85.0)
-        
-        # Calculate free area from slot dimensions
-        free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
+        # Free area calculated from the canopy's slot dimensions
+        free_area = get_derived_value('free_area', canopy_index)
         
         col1, col2 = st.columns(2)
         
         # Initialize session state for CMWF extract fields
-        anemometer_key = f"anemometer_reading_{canopy_index}_{section_idx}"
+        anemometer_key = section_key('anemometer_reading', canopy_index, section_idx)
         if anemometer_key not in st.session_state:
             st.session_state[anemometer_key] = safe_float(section.get('anemometer_reading', 0.0))
         
@@ -750,9 +771,10 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # Get value from session state
         anemometer_reading = st.session_state.get(anemometer_key, 0.0)
         
-        # Calculate and display flowrates
+        # Calculate and display flowrates (the reading is stored first, so the derived flowrate uses it)
+        section['anemometer_reading'] = anemometer_reading
         if anemometer_reading > 0 and free_area > 0:
-            flowrate_m3h, flowrate_m3s = calculate_cmwf_flowrate(free_area, anemometer_reading)
+            flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, section_idx)
             st.write(f"**Flowrate: {flowrate_m3h:.2f} m³/h ({flowrate_m3s:.3f} m³/s)**")
         
         # Supply Air Readings for CMWF (F models have supply)
@@ -761,7 +783,7 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         col1, col2 = st.columns(2)
         
         # Initialize session state for CMWF supply fields
-        supply_anemometer_key = f"supply_anemometer_reading_{canopy_index}_{section_idx}"
+        supply_anemometer_key = section_key('supply_anemometer_reading', canopy_index, section_idx)
         if supply_anemometer_key not in st.session_state:
             st.session_state[supply_anemometer_key] = safe_float(section.get('supply_anemometer_reading', 0.0))
         
@@ -787,8 +809,9 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # Calculate and display supply flowrates
         supply_flowrate_m3h = 0.0
         supply_flowrate_m3s = 0.0
+        section['supply_anemometer_reading'] = supply_anemometer_reading
         if supply_anemometer_reading > 0 and free_area > 0:
-            supply_flowrate_m3h, supply_flowrate_m3s = calculate_cmwf_flowrate(free_area, supply_anemometer_reading)
+            supply_flowrate_m3h, supply_flowrate_m3s = get_derived_value('supply_flowrate', canopy_index, section_idx)
             st.write(f"**Supply Flowrate: {supply_flowrate_m3h:.2f} m³/h ({supply_flowrate_m3s:.3f} m³/s)**")
         
         # Update section data for CMWF
@@ -804,9 +827,9 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
             col1, col2, col3 = st.columns(3)
             
             # Initialize session state for Marvel fields
-            min_key = f"min_percent_{canopy_index}_{section_idx}"
-            idle_key = f"idle_percent_{canopy_index}_{section_idx}"
-            design_key = f"design_m3s_{canopy_index}_{section_idx}"
+            min_key = section_key('min_percent', canopy_index, section_idx)
+            idle_key = section_key('idle_percent', canopy_index, section_idx)
+            design_key = section_key('design_m3s', canopy_index, section_idx)
             
             if min_key not in st.session_state:
                 st.session_state[min_key] = safe_float(section.get('min_percent', 0.0))
@@ -861,18 +884,13 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # CMWI models need anemometer reading - free area is calculated from slot dimensions
         st.markdown("**Extract Air Readings**")
         
-        # Get slot dimensions from canopy data
-        canopy = get_form_data('canopies')[canopy_index]
-        slot_length = canopy.get('slot_length', 0.0)
-        slot_width = canopy.get('slot_width', 85.0)
-        
-        # Calculate free area from slot dimensions
-        free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
+        # Free area calculated from the canopy's slot dimensions
+        free_area = get_derived_value('free_area', canopy_index)
         
         col1, col2 = st.columns(2)
         
         # Initialize session state for CMWI extract fields
-        anemometer_key = f"anemometer_reading_{canopy_index}_{section_idx}"
+        anemometer_key = section_key('anemometer_reading', canopy_index, section_idx)
         if anemometer_key not in st.session_state:
             st.session_state[anemometer_key] = safe_float(section.get('anemometer_reading', 0.0))
         
@@ -895,9 +913,10 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         # Get value from session state
         anemometer_reading = st.session_state.get(anemometer_key, 0.0)
         
-        # Calculate and display flowrates
+        # Calculate and display flowrates (the reading is stored first, so the derived flowrate uses it)
+        section['anemometer_reading'] = anemometer_reading
         if anemometer_reading > 0 and free_area > 0:
-            flowrate_m3h, flowrate_m3s = calculate_cmwi_flowrate(free_area, anemometer_reading)
+            flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, section_idx)
             st.write(f"**Flowrate: {flowrate_m3h:.2f} m³/h ({flowrate_m3s:.3f} m³/s)**")
         
         # Update section data for CMWI (extract only)
@@ -912,9 +931,9 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
             col1, col2, col3 = st.columns(3)
             
             # Initialize session state for Marvel fields
-            min_key = f"min_percent_{canopy_index}_{section_idx}"
-            idle_key = f"idle_percent_{canopy_index}_{section_idx}"
-            design_key = f"design_m3s_{canopy_index}_{section_idx}"
+            min_key = section_key('min_percent', canopy_index, section_idx)
+            idle_key = section_key('idle_percent', canopy_index, section_idx)
+            design_key = section_key('design_m3s', canopy_index, section_idx)
             
             if min_key not in st.session_state:
                 st.session_state[min_key] = safe_float(section.get('min_percent', 0.0))
@@ -974,8 +993,8 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
         col1, col2 = st.columns(2)
         
         # Initialize session state for extract fields
-        extract_ksa_key = f"extract_ksa_{canopy_index}_{section_idx}"
-        extract_tab_key = f"extract_tab_reading_{canopy_index}_{section_idx}"
+        extract_ksa_key = section_key('extract_ksa', canopy_index, section_idx)
+        extract_tab_key = section_key('extract_tab_reading', canopy_index, section_idx)
         
         if extract_ksa_key not in st.session_state:
             if canopy_model:
@@ -1003,7 +1022,8 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
                         help=f"Select the number of KSAs for extract in section {section_idx + 1}"
                     )
                     # Calculate and display K-factor for extract
-                    k_factor = get_k_factor(canopy_model, extract_ksa)
+                    section['extract_ksa'] = extract_ksa
+                    k_factor = get_derived_value('extract_k_factor', canopy_index, section_idx)
                     if k_factor > 0:
                         st.write(f"**K-Factor: {k_factor:.1f}**")
                 else:
@@ -1028,8 +1048,8 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
             col1, col2 = st.columns(2)
             
             # Initialize session state for supply fields
-            supply_plenum_key = f"supply_plenum_length_{canopy_index}_{section_idx}"
-            supply_tab_key = f"supply_tab_reading_{canopy_index}_{section_idx}"
+            supply_plenum_key = section_key('supply_plenum_length', canopy_index, section_idx)
+            supply_tab_key = section_key('supply_tab_reading', canopy_index, section_idx)
             
             if supply_plenum_key not in st.session_state:
                 plenum_lengths = [1000, 1500, 2000, 2500, 3000, 3500, 4000]
@@ -1069,9 +1089,9 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
             col1, col2, col3 = st.columns(3)
             
             # Initialize session state for Marvel fields
-            min_key = f"min_percent_{canopy_index}_{section_idx}"
-            idle_key = f"idle_percent_{canopy_index}_{section_idx}"
-            design_key = f"design_m3s_{canopy_index}_{section_idx}"
+            min_key = section_key('min_percent', canopy_index, section_idx)
+            idle_key = section_key('idle_percent', canopy_index, section_idx)
+            design_key = section_key('design_m3s', canopy_index, section_idx)
             
             if min_key not in st.session_state:
                 st.session_state[min_key] = safe_float(section.get('min_percent', 0.0))
@@ -1142,6 +1162,8 @@ def render_single_section(canopy_index: int, section_idx: int, with_marvel: bool
 
 def render_canopy_data_tables(canopy_index: int, canopy_model: str):
     """Render canopy data in table format based on model type."""
+    import pandas as pd  # Imported lazily - only needed when the tables are shown
+    
     canopy = get_form_data('canopies')[canopy_index]
     
     st.markdown("---")
@@ -1172,16 +1194,12 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
         sections_data = canopy.get('sections', [])
         if sections_data:
             readings_data = []
-            grill_size = canopy.get('grill_size', '')
-            
             for i, section in enumerate(sections_data):
                 anemometer_reading = section.get('anemometer_reading', 0.0)
                 
-                # Calculate free area from grill size for each section
-                free_area = calculate_free_area_from_grill_size(grill_size)
-                
-                # Calculate flowrate using CXW formula
-                flowrate_m3h, flowrate_m3s = calculate_cxw_flowrate(free_area, anemometer_reading)
+                # Free area from the grill size and flowrate (Qv = A x m/s)
+                free_area = get_derived_value('free_area', canopy_index)
+                flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, i)
                 
                 readings_data.append({
                     'Anemometer Reading (Average m/s)': f"{anemometer_reading:.1f}" if anemometer_reading else '',
@@ -1229,17 +1247,12 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
         sections_data = canopy.get('sections', [])
         if sections_data:
             readings_data = []
-            slot_length = canopy.get('slot_length', 0.0)
-            slot_width = canopy.get('slot_width', 85.0)
-            
             for i, section in enumerate(sections_data):
                 anemometer_reading = section.get('anemometer_reading', 0.0)
                 
-                # Calculate free area from slot dimensions for each section
-                free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
-                
-                # Calculate flowrate using CMWF formula
-                flowrate_m3h, flowrate_m3s = calculate_cmwf_flowrate(free_area, anemometer_reading)
+                # Free area from the slot dimensions and flowrate (Qv = A x m/s)
+                free_area = get_derived_value('free_area', canopy_index)
+                flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, i)
                 
                 readings_data.append({
                     'Anemometer Reading (Average m/s)': f"{anemometer_reading:.1f}" if anemometer_reading else '',
@@ -1286,11 +1299,9 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
             for i, section in enumerate(sections_data):
                 supply_anemometer_reading = section.get('supply_anemometer_reading', 0.0)
                 
-                # Calculate free area from slot dimensions for each section
-                free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
-                
-                # Calculate supply flowrate using CMWF formula
-                supply_flowrate_m3h, supply_flowrate_m3s = calculate_cmwf_flowrate(free_area, supply_anemometer_reading)
+                # Free area from the slot dimensions and supply flowrate (Qv = A x m/s)
+                free_area = get_derived_value('free_area', canopy_index)
+                supply_flowrate_m3h, supply_flowrate_m3s = get_derived_value('supply_flowrate', canopy_index, i)
                 
                 supply_readings_data.append({
                     'Anemometer Reading (Average m/s)': f"{supply_anemometer_reading:.1f}" if supply_anemometer_reading else '',
@@ -1338,17 +1349,12 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
         sections_data = canopy.get('sections', [])
         if sections_data:
             readings_data = []
-            slot_length = canopy.get('slot_length', 0.0)
-            slot_width = canopy.get('slot_width', 85.0)
-            
             for i, section in enumerate(sections_data):
                 anemometer_reading = section.get('anemometer_reading', 0.0)
                 
-                # Calculate free area from slot dimensions for each section
-                free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
-                
-                # Calculate flowrate using CMWI formula
-                flowrate_m3h, flowrate_m3s = calculate_cmwi_flowrate(free_area, anemometer_reading)
+                # Free area from the slot dimensions and flowrate (Qv = A x m/s)
+                free_area = get_derived_value('free_area', canopy_index)
+                flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, i)
                 
                 readings_data.append({
                     'Anemometer Reading (Average m/s)': f"{anemometer_reading:.1f}" if anemometer_reading else '',
@@ -1401,18 +1407,10 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
         for i, section in enumerate(sections_data):
             extract_ksa = section.get('extract_ksa', '')
             extract_tab_reading = section.get('extract_tab_reading', '')
-            k_factor = get_k_factor(canopy_model, extract_ksa) if extract_ksa else 0.0
             
-            # Calculate flowrate if we have tab reading and k-factor
-            flowrate_m3h = 0.0
-            flowrate_m3s = 0.0
-            if extract_tab_reading and k_factor:
-                try:
-                    tab_value = float(extract_tab_reading)
-                    flowrate_m3h = k_factor * (tab_value ** 0.5)  # Qv = Kf x √Pa
-                    flowrate_m3s = flowrate_m3h / 3600  # Convert to m³/s
-                except:
-                    pass
+            # K-factor and flowrate (Qv = Kf x √Pa)
+            k_factor = get_derived_value('extract_k_factor', canopy_index, i)
+            flowrate_m3h, flowrate_m3s = get_derived_value('extract_flowrate', canopy_index, i)
             
             readings_data.append({
                 'T.A.B Point Reading (Pa)': extract_tab_reading,
@@ -1457,29 +1455,11 @@ def render_canopy_data_tables(canopy_index: int, canopy_model: str):
         if sections_data:
             supply_readings_data = []
             for i, section in enumerate(sections_data):
-                supply_plenum_length = section.get('supply_plenum_length', '')
                 supply_tab_reading = section.get('supply_tab_reading', '')
                 
-                # For supply air K-factor calculation:
-                # - Length-based models (CMW-F, CMW-I, KVD, KVV): use plenum length
-                # - Section-based models (KVF, UVF, etc.): use same K-factor as extract (based on KSAs)
-                if is_length_based_model(canopy_model):
-                    k_factor = get_k_factor(canopy_model, supply_plenum_length) if supply_plenum_length else 0.0
-                else:
-                    # For section-based models, use the same K-factor as extract air (based on KSAs)
-                    extract_ksa = section.get('extract_ksa', '')
-                    k_factor = get_k_factor(canopy_model, extract_ksa) if extract_ksa else 0.0
-                
-                # Calculate flowrate if we have tab reading and k-factor
-                flowrate_m3h = 0.0
-                flowrate_m3s = 0.0
-                if supply_tab_reading and k_factor:
-                    try:
-                        tab_value = float(supply_tab_reading)
-                        flowrate_m3h = k_factor * (tab_value ** 0.5)  # Qv = Kf x √Pa
-                        flowrate_m3s = flowrate_m3h / 3600  # Convert to m³/s
-                    except:
-                        pass
+                # K-factor (plenum length for length-based models, else the extract K-factor) and flowrate (Qv = Kf x √Pa)
+                k_factor = get_derived_value('supply_k_factor', canopy_index, i)
+                flowrate_m3h, flowrate_m3s = get_derived_value('supply_flowrate', canopy_index, i) or (0.0, 0.0)
                 
                 supply_readings_data.append({
                     'T.A.B Point Reading (Pa)': supply_tab_reading,
@@ -1516,7 +1496,7 @@ def render_uv_checklist_for_canopy(canopy_index: int, canopy_model: str):
                 f"📊 {item}",
                 min_value=0,
                 value=canopy_uv_data.get(item, None),  # Default to None (empty)
-                key=f"canopy_{canopy_index}_uv_check_{i}",
+                key=checklist_key('uv', canopy_index, i),
                 help="Enter quantity of slaves per system"
             )
         elif item == 'UV Pressure Setpoint (Pa)':
@@ -1524,14 +1504,14 @@ def render_uv_checklist_for_canopy(canopy_index: int, canopy_model: str):
                 f"📊 {item}",
                 min_value=0,
                 value=canopy_uv_data.get(item, None),  # Default to None (empty)
-                key=f"canopy_{canopy_index}_uv_check_{i}",
+                key=checklist_key('uv', canopy_index, i),
                 help="Enter UV pressure setpoint in Pa"
             )
         elif item == 'Capture Jet average pressure reading (Pa)':
             value = st.text_input(
                 f"📊 {item}",
                 value=canopy_uv_data.get(item, ''),  # Default to empty
-                key=f"canopy_{canopy_index}_uv_check_{i}",
+                key=checklist_key('uv', canopy_index, i),
                 placeholder="Enter pressure reading",
                 help="Enter capture jet average pressure reading"
             )
@@ -1540,7 +1520,7 @@ def render_uv_checklist_for_canopy(canopy_index: int, canopy_model: str):
             value = st.checkbox(
                 f"☐ {item}",
                 value=canopy_uv_data.get(item, False),  # Default to False (unchecked)
-                key=f"canopy_{canopy_index}_uv_check_{i}",
+                key=checklist_key('uv', canopy_index, i),
                 help=f"Check if {item.lower()} is completed"
             )
         
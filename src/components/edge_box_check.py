@@ -71,12 +71,17 @@ def render_edge_box_check():
             'edge_4g_status': edge_4g_status,
             'lan_connection': lan_connection,
             'modbus_operation': modbus_operation,
-            'modbus_value': modbus_value if modbus_operation else None
+            'modbus_value': modbus_value if modbus_operation else None,
+            'photos': edge_data.get('photos', [])
         }
     }
     
     update_form_data(edge_box_data)
     
+    if edge_installed:
+        from src.components.photo_upload import render_photo_attachments
+        render_photo_attachments(edge_box_data['edge_box']['photos'], lambda field: f"edge_box_{field}", "📷 Edge Box Photos")
+    
     # Show a summary if any edge box data is filled
     if any([edge_installed, edge_id, edge_4g_status, lan_connection, modbus_operation]):
         st.info("✅ Edge box information has been recorded.")
@@ -1,5 +1,5 @@
 import streamlit as st
-from src.config import K_FACTOR_DATA
+from src.config import get_k_factor_data
 
 def render_k_factor_info():
     """Render K-factor information panel."""
@@ -100,6 +100,8 @@ def render_k_factor_table():
     """Render a detailed K-factor reference table."""
     st.markdown("### 📋 Complete K-Factor Reference")
     
+    k_factor_data = get_k_factor_data()
+    
     # Create tabs for different model types
     tab1, tab2 = st.tabs(["Section-Based Models", "Length-Based Models"])
     
@@ -108,7 +110,7 @@ def render_k_factor_table():
         
         # Create a comprehensive table
         data = []
-        for model, info in K_FACTOR_DATA.items():
+        for model, info in k_factor_data.items():
             if info['type'] == 'section_based':
                 for ksas, k_factor in info['sections'].items():
                     data.append({
@@ -127,7 +129,7 @@ def render_k_factor_table():
         
         # Create length-based table
         data = []
-        for model, info in K_FACTOR_DATA.items():
+        for model, info in k_factor_data.items():
             if info['type'] == 'length_based':
                 for length, k_factor in info['length_ranges'].items():
                     data.append({
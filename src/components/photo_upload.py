@@ -0,0 +1,68 @@
+import streamlit as st
+from typing import Callable
+
+def render_photo_attachments(photos: list, make_key: Callable[[str], str], label: str = "📷 Photos"):
+    """
+    Render photo upload, thumbnails and captions for one item (a canopy or the Edge box).
+    
+    Uploads are handed to the background photo pipeline and the uploader is
+    reset, so the raw files don't stay in memory; only photo IDs and captions
+    are kept in ``photos``.
+    
+    Args:
+        photos: The item's photo list in form data ({'id', 'caption'} dicts) - updated in place
+        make_key: Builds a widget key from a field name
+        label: Subheading for the photo area
+    """
+    from src.config import MAX_PHOTOS_PER_ITEM
+    from src.utils.photo_store import submit_photo, get_photo_status, get_photo_path, wait_for_photos
+    
+    st.markdown(f"**{label}**")
+    
+    # A new uploader key after each upload clears the uploaded files from the widget
+    counter_key = make_key('photo_upload_counter')
+    upload_key = make_key(f"photo_upload_{st.session_state.get(counter_key, 0)}")
+    
+    if len(photos) < MAX_PHOTOS_PER_ITEM:
+        uploaded_files = st.file_uploader(
+            "Add photos",
+            type=['jpg', 'jpeg', 'png', 'webp'],
+            accept_multiple_files=True,
+            key=upload_key,
+            help=f"Up to {MAX_PHOTOS_PER_ITEM} photos - they are resized for the report automatically"
+        )
+        if uploaded_files:
+            known = {photo['id'] for photo in photos}
+            for uploaded_file in uploaded_files[:MAX_PHOTOS_PER_ITEM - len(photos)]:
+                photo_id = submit_photo(uploaded_file.getvalue())
+                if photo_id not in known:
+                    photos.append({'id': photo_id, 'caption': ''})
+                    known.add(photo_id)
+            with st.spinner("Processing photos..."):
+                wait_for_photos([photo['id'] for photo in photos], timeout=10)
+            st.session_state.pop(upload_key, None)
+            st.session_state[counter_key] = st.session_state.get(counter_key, 0) + 1
+            st.rerun()
+    
+    if not photos:
+        return
+    
+    columns = st.columns(4)
+    for index, photo in enumerate(list(photos)):
+        with columns[index % 4]:
+            status = get_photo_status(photo['id'])
+            thumbnail = get_photo_path(photo['id'], thumbnail=True) if status == 'ready' else None
+            if thumbnail:
+                st.image(thumbnail, use_container_width=True)
+            elif status == 'processing':
+                st.caption("⏳ Processing...")
+            else:
+                st.caption("⚠️ Photo could not be read" if status == 'failed' else "⚠️ Photo file missing")
+            
+            photo['caption'] = st.text_input(
+                "Caption", value=photo.get('caption', ''), key=make_key(f"photo_caption_{photo['id'][:12]}"),
+                label_visibility="collapsed", placeholder="Caption (e.g. Filter condition)"
+            )
+            if st.button("🗑️ Remove", key=make_key(f"photo_remove_{photo['id'][:12]}")):
+                photos.remove(photo)
+                st.rerun()
@@ -0,0 +1,90 @@
+import streamlit as st
+from datetime import datetime
+
+def render_report_archive():
+    """Render the archive of generated reports: search, list and download earlier reports."""
+    from src.config import REPORT_ARCHIVE_PAGE_SIZE
+    from src.utils.report_archive import list_reports, read_report, get_archive_stats
+    from src.components.session_debug import format_bytes
+    
+    st.header("🗄️ Report Archive")
+    
+    try:
+        stats = get_archive_stats()
+    except Exception as e:
+        st.warning(f"⚠️ Report archive unavailable: {str(e)}")
+        return
+    
+    if not stats['reports']:
+        st.info("ℹ️ Generated reports are archived here automatically.")
+        return
+    
+    st.caption(f"{stats['reports']} report{'s' if stats['reports'] != 1 else ''}, {format_bytes(stats['bytes'])} - identical reports are stored once")
+    
+    search = st.text_input("🔍 Search", key="report_archive_search",
+                           placeholder="Client, project number, engineer, model...")
+    if search != st.session_state.get('report_archive_last_search', ''):
+        st.session_state.report_archive_page = 0  # A new search starts at the newest reports
+        st.session_state.report_archive_last_search = search
+    page = st.session_state.get('report_archive_page', 0)
+    reports = list_reports(search, limit=REPORT_ARCHIVE_PAGE_SIZE, offset=page * REPORT_ARCHIVE_PAGE_SIZE)
+    
+    if not reports:
+        st.info("ℹ️ No archived reports match the search.")
+        return
+    
+    st.dataframe(
+        [{
+            'Generated': datetime.fromtimestamp(report['generated_at']).strftime('%Y-%m-%d %H:%M'),
+            'Client': report['client_name'],
+            'Project': report['project_number'],
+            'Report Type': report['report_type'],
+            'Engineer': report['engineer_name'],
+            'Date of Visit': report['date_of_visit'],
+            'Models': report['models'],
+            'File': report['file_name'],
+            'PDF': '✅' if report['pdf_sha256'] else '',
+        } for report in reports],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if page > 0 and col1.button("⬅️ Newer", key="report_archive_newer"):
+        st.session_state.report_archive_page = page - 1
+        st.rerun()
+    if len(reports) == REPORT_ARCHIVE_PAGE_SIZE and col2.button("Older ➡️", key="report_archive_older"):
+        st.session_state.report_archive_page = page + 1
+        st.rerun()
+    
+    # Only the selected report's files are read
+    labels = {report['sha256']: f"{report['file_name']} ({report['client_name'] or 'no client'}, "
+                                f"{datetime.fromtimestamp(report['generated_at']).strftime('%Y-%m-%d %H:%M')})"
+              for report in reports}
+    selected = st.selectbox("Report", list(labels), format_func=labels.get, key="report_archive_selected")
+    report = next(report for report in reports if report['sha256'] == selected)
+    
+    col1, col2 = st.columns(2)
+    docx = read_report(selected)
+    if docx:
+        col1.download_button(
+            label=f"💾 Download .docx ({format_bytes(report['size'])})",
+            data=docx,
+            file_name=report['file_name'],
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            key="report_archive_download_docx"
+        )
+    else:
+        col1.warning("⚠️ The report file is missing from the archive.")
+    
+    if report['pdf_sha256']:
+        pdf = read_report(selected, pdf=True)
+        if pdf:
+            from src.utils.pdf_converter import pdf_filename
+            col2.download_button(
+                label=f"📑 Download PDF ({format_bytes(report['pdf_size'])})",
+                data=pdf,
+                file_name=pdf_filename(report['file_name']),
+                mime="application/pdf",
+                key="report_archive_download_pdf"
+            )
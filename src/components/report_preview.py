@@ -0,0 +1,26 @@
+import streamlit as st
+from src.utils.session_manager import get_form_data
+
+def render_report_preview():
+    """Render a live HTML preview of the report (off until the engineer turns it on)."""
+    st.header("👁️ Report Preview")
+    
+    if not st.toggle("Show live preview", key="show_report_preview",
+                     help="Shows the report's values and results tables without generating the Word document"):
+        return
+    
+    form_data = get_form_data()
+    if not form_data.get('canopies'):
+        st.info("ℹ️ Add canopy data to preview the report.")
+        return
+    
+    try:
+        from src.utils.report_preview import build_report_preview
+        html, stats = build_report_preview(form_data)
+    except Exception as e:
+        st.error(f"❌ Error building preview: {str(e)}")
+        return
+    
+    st.html(html)
+    st.caption(f"⚡ Preview built in {stats['seconds'] * 1000:.0f} ms - "
+               f"{stats['rendered']} of {stats['canopies']} canopies re-rendered, the rest unchanged")
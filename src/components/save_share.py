@@ -1,6 +1,8 @@
 import streamlit as st
-from src.utils.session_manager import get_form_data, get_shareable_url, serialize_form_data_to_url
+import time
+from src.utils.session_manager import get_form_data, get_shareable_url, serialize_form_data_to_url, get_job_id, autosave_form_data, open_job_file
 from src.utils.progress_tracker import calculate_progress
+from src.utils.session_memory import session_callback
 
 def render_save_share_section():
     """Render the save and share functionality section."""
@@ -18,6 +20,9 @@ def render_save_share_section():
     # Check if there's any data to save
     has_data = bool(form_data and any(form_data.values()))
     
+    # Export to / open from a file (works on an empty form too)
+    render_job_file(has_data)
+    
     if not has_data:
         st.info("ℹ️ No data to save yet. Please fill out some information first.")
         return
@@ -46,13 +51,20 @@ def render_save_share_section():
                 except:
                     pass
                 
-                # Serialize form data
-                serialized_data = serialize_form_data_to_url()
+                # Short link to the job in the shared job store - opens on any app process
+                try:
+                    from src.utils.job_store import get_job_store
+                    store = get_job_store()
+                    autosave_form_data()  # Pushes only what changed since the last sync
+                    if st.session_state.get('job_revision') is None:
+                        raise RuntimeError("Job not saved")
+                    shareable_url = f"http://{current_url}/?job={store.create_share_token(get_job_id())}&role=technician"
+                except Exception:
+                    # Fall back to embedding the form data in the link
+                    serialized_data = serialize_form_data_to_url()
+                    shareable_url = f"http://{current_url}/?data={serialized_data}" if serialized_data else ""
                 
-                if serialized_data:
-                    # Create shareable URL
-                    shareable_url = f"http://{current_url}/?data={serialized_data}"
-                    
+                if shareable_url:
                     # Store in session state for display
                     st.session_state.shareable_url = shareable_url
                     st.success("✅ Shareable link generated!")
@@ -62,6 +74,8 @@ def render_save_share_section():
             except Exception as e:
                 st.error(f"❌ Error generating link: {e}")
     
+    render_sync_status()
+    
     # Display the shareable URL if generated
     if hasattr(st.session_state, 'shareable_url'):
         st.markdown("### 🔗 Shareable Link")
@@ -108,6 +122,92 @@ Thanks!"""
             help="Copy this template and customize it for your email"
         )
 
+def render_sync_status():
+    """Show the job's sync state: revision, last change and how much was exchanged."""
+    if st.session_state.get('job_revision') is None:
+        return
+    sync = st.session_state.get('job_sync', {})
+    
+    st.markdown("### 🔄 Sync")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        last_change = ""
+        if sync.get('changed_at'):
+            minutes = int((time.time() - sync['changed_at']) // 60)
+            last_change = f" · last change by **{sync.get('author') or 'unknown'}** " + (f"{minutes} min ago" if minutes else "just now")
+        st.markdown(f"Revision **{st.session_state.job_revision}**{last_change}")
+        st.caption(
+            f"Sent {sync.get('pushed_bytes', 0):,} bytes (last {sync.get('last_push_bytes', 0):,}) · "
+            f"received {sync.get('pulled_bytes', 0):,} bytes (last {sync.get('last_pull_bytes', 0):,}) - only changed fields are exchanged"
+        )
+    with col2:
+        # Any rerun pulls the latest changes (see pull_job_changes in main)
+        st.button("🔄 Check for updates", key="check_job_updates", help="Load changes made by the office or technician")
+
+def render_job_file(has_data: bool):
+    """Export the job to a portable file, or open one (e.g. saved on another machine)."""
+    from src.config import JOB_FILE_EXTENSION
+    
+    st.markdown("### 📁 Job File")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if has_data and st.button("📦 Export Job File", key="export_job_file",
+                                  help="Save the form data, signature and photos to a single file"):
+            from src.utils.job_file import export_job, job_file_name
+            form_data = get_form_data()
+            with st.spinner("Packing job file..."):
+                st.session_state.job_file = {
+                    'data': export_job(form_data),
+                    'file_name': job_file_name(form_data),
+                    'exported_at': time.time()
+                }
+        
+        job_file = st.session_state.get('job_file')
+        if job_file:
+            st.download_button(
+                label="💾 Download Job File",
+                data=job_file['data'],
+                file_name=job_file['file_name'],
+                mime="application/octet-stream",
+                key="download_job_file"
+            )
+            st.caption(f"{job_file['file_name']} - {len(job_file['data']) / 1024:.0f} KB, "
+                       f"exported at {time.strftime('%H:%M', time.localtime(job_file['exported_at']))}")
+    
+    with col2:
+        # A new uploader key after each upload clears the file from the widget
+        upload_key = f"job_file_upload_{st.session_state.get('job_file_upload_counter', 0)}"
+        st.file_uploader(
+            "📂 Open Job File",
+            type=[JOB_FILE_EXTENSION.lstrip('.'), 'json'],
+            key=upload_key,
+            on_change=_open_uploaded_job_file,
+            args=(upload_key,),
+            help="Replaces the current form with the job in the file"
+        )
+    
+    message = st.session_state.pop('job_file_message', None)
+    if message:
+        getattr(st, message[0])(message[1])
+
+@session_callback
+def _open_uploaded_job_file(upload_key: str):
+    """File uploader callback: open the uploaded job file before the form renders."""
+    from src.utils.job_file import JobFileError
+    
+    uploaded_file = st.session_state.pop(upload_key, None)
+    st.session_state.job_file_upload_counter = st.session_state.get('job_file_upload_counter', 0) + 1
+    if uploaded_file is None:
+        return
+    
+    try:
+        open_job_file(uploaded_file.getvalue())
+        st.session_state.pop('job_file', None)
+        st.session_state.job_file_message = ('success', f"✅ Opened job file {uploaded_file.name}")
+    except JobFileError as e:
+        st.session_state.job_file_message = ('error', f"❌ Could not open {uploaded_file.name}: {e}")
+
 def render_load_shared_data_notification():
     """Show notification if data was loaded from a shared link."""
     if hasattr(st.session_state, 'data_loaded_from_url') and st.session_state.data_loaded_from_url:
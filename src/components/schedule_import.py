@@ -0,0 +1,45 @@
+import streamlit as st
+
+def render_schedule_import():
+    """Render the canopy schedule import (CSV/Excel) panel."""
+    with st.expander("📥 Import Canopy Schedule (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Upload the canopy schedule from the design drawings to fill in all canopies at once. "
+            "Columns: **Drawing Number**, **Model** (required), Location, Sections, Design Airflow, "
+            "Supply Airflow, Canopy Length, Grill Size, Slot Length, Slot Width, Marvel."
+        )
+
+        uploaded_file = st.file_uploader(
+            "Canopy schedule",
+            type=['csv', 'xlsx'],
+            key="schedule_import_file",
+            help="CSV or Excel file with one row per canopy"
+        )
+
+        if uploaded_file is None:
+            return
+
+        # pandas/numpy are only needed once a file is uploaded
+        from src.utils.schedule_importer import read_schedule, validate_schedule, apply_schedule
+
+        try:
+            schedule_df = read_schedule(uploaded_file.name, uploaded_file.getvalue())
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+
+        canopies, errors = validate_schedule(schedule_df)
+
+        if errors:
+            st.error(f"❌ {len(errors)} problem(s) found in the schedule - nothing was imported:")
+            st.markdown("\n".join(f"- {error}" for error in errors[:50]))
+            if len(errors) > 50:
+                st.markdown(f"- ... and {len(errors) - 50} more")
+            return
+
+        st.dataframe(schedule_df, use_container_width=True, hide_index=True)
+        st.warning("⚠️ Importing replaces all canopies currently entered, including their section readings.")
+
+        if st.button(f"📥 Import {len(canopies)} Canopies", type="primary", key="schedule_import_apply"):
+            apply_schedule(canopies)
+            st.rerun()
@@ -0,0 +1,269 @@
+"""
+Grid entry mode for section readings.
+
+Instead of one set of widgets per section, each canopy gets a single
+``st.data_editor`` grid with one row per section. Readings can be typed or
+pasted in bulk from a logger export or spreadsheet, and all edits from the grid
+are written back to ``form_data`` in one batched update.
+
+The grid runs as a fragment, so editing it only reruns the grid, not the whole page.
+"""
+import streamlit as st
+
+from src.config import get_available_ksas, is_cxw_model, is_cmwf_model, is_cmwi_model
+from src.utils.derived_values import get_derived_value
+from src.utils.session_manager import get_form_data, clear_section_widget_keys
+from src.utils.session_keys import canopy_key
+from src.utils.session_memory import session_callback, track_session
+
+PLENUM_LENGTHS = [1000, 1500, 2000, 2500, 3000, 3500, 4000]
+
+MARVEL_FIELDS = ['min_percent', 'idle_percent', 'design_m3s']
+
+def get_grid_fields(canopy_model: str, with_marvel: bool) -> list:
+    """
+    Get the editable section fields shown in the grid for a canopy model.
+
+    Args:
+        canopy_model: The canopy model
+        with_marvel: Whether Marvel fields are included
+
+    Returns:
+        List of section field names, in column order
+    """
+    if is_cxw_model(canopy_model) or is_cmwi_model(canopy_model):
+        fields = ['anemometer_reading']
+    elif is_cmwf_model(canopy_model):
+        fields = ['anemometer_reading', 'supply_anemometer_reading']
+    else:
+        fields = ['extract_ksa', 'extract_tab_reading']
+        if 'F' in canopy_model:
+            fields += ['supply_plenum_length', 'supply_tab_reading']
+
+    if with_marvel:
+        fields += MARVEL_FIELDS
+
+    return fields
+
+def build_section_grid(canopy: dict, with_marvel: bool):
+    """
+    Build the editable grid DataFrame for a canopy's sections.
+
+    Calculated columns are kept out of this frame (see ``calculate_section_grid``):
+    the data editor's identity includes its data, so a frame that changed with
+    every edit would remount the grid and lose the cursor.
+
+    Args:
+        canopy: Canopy dict from form_data
+        with_marvel: Whether Marvel fields are included
+
+    Returns:
+        DataFrame with one row per section
+    """
+    import pandas as pd
+
+    canopy_model = canopy.get('canopy_model', '')
+    fields = get_grid_fields(canopy_model, with_marvel)
+    sections = canopy.get('sections', [])
+    label = "Grill" if is_cxw_model(canopy_model) else "Section"
+
+    available_ksas = get_available_ksas(canopy_model)
+    rows = []
+    for section in sections:
+        row = {field: section.get(field) for field in fields}
+        if 'extract_ksa' in row and row['extract_ksa'] not in available_ksas:
+            row['extract_ksa'] = available_ksas[0] if available_ksas else None
+        if 'supply_plenum_length' in row and row['supply_plenum_length'] not in PLENUM_LENGTHS:
+            row['supply_plenum_length'] = 1000
+        for field in ('extract_tab_reading', 'supply_tab_reading'):
+            if field in row:
+                row[field] = '' if row[field] is None else str(row[field])
+        for field in ['anemometer_reading', 'supply_anemometer_reading'] + MARVEL_FIELDS:
+            if field in row:
+                row[field] = _to_float(row[field])
+        rows.append(row)
+
+    return pd.DataFrame(rows, columns=fields, index=[f"{label} {i + 1}" for i in range(len(sections))])
+
+def calculate_section_grid(canopy_index: int, grid):
+    """
+    Calculate the K-factor and flowrate columns for a section grid.
+
+    The values come from the derived values graph, so they are the ones the
+    results summary and the report show, and only sections whose inputs
+    changed are recomputed.
+
+    Args:
+        canopy_index: Index of the canopy
+        grid: DataFrame from ``build_section_grid`` for the canopy's current sections
+
+    Returns:
+        DataFrame of calculated columns, with the grid's index
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(index=grid.index)
+    sections = range(len(grid))
+    if 'extract_ksa' in grid.columns:
+        df['k_factor'] = [get_derived_value('extract_k_factor', canopy_index, s) for s in sections]
+    df['flowrate_m3s'] = [round(get_derived_value('extract_flowrate', canopy_index, s)[1], 3) for s in sections]
+
+    return df
+
+def edit_sections(canopy: dict, sections: list, edited_rows: dict) -> list:
+    """
+    Apply a section grid's edits to a list of sections.
+
+    Args:
+        canopy: Canopy dict from form_data (for the model)
+        sections: Sections the edits are relative to
+        edited_rows: ``edited_rows`` from the data editor state ({row: {field: value}})
+
+    Returns:
+        New list of section dicts (``sections`` is not modified)
+    """
+    sections = [dict(section) for section in sections]
+
+    for row, changes in edited_rows.items():
+        row = int(row)
+        if row >= len(sections):
+            continue
+        for field, value in changes.items():
+            if field in ('extract_ksa', 'supply_plenum_length'):
+                sections[row][field] = int(value) if value is not None else None
+            elif field in ('extract_tab_reading', 'supply_tab_reading'):
+                sections[row][field] = '' if value is None else str(value).strip()
+            else:
+                sections[row][field] = _to_float(value)
+
+    return sections
+
+def apply_section_grid_edits(canopy_index: int, base_sections: list, edited_rows: dict, with_marvel: bool):
+    """
+    Apply edits from a section grid to form_data in a single update.
+
+    ``edited_rows`` holds every edit made since the grid was mounted, relative to
+    the sections it was mounted with, so the grid fields are taken from
+    ``base_sections`` with the edits applied (which also undoes a cell that was
+    changed back). Other section data in form_data is kept.
+
+    Args:
+        canopy_index: Index of the canopy
+        base_sections: Sections the grid was mounted with
+        edited_rows: ``edited_rows`` from the data editor state ({row: {field: value}})
+        with_marvel: Whether Marvel fields are included
+    """
+    canopy = get_form_data('canopies')[canopy_index]
+    edited = edit_sections(canopy, base_sections, edited_rows)
+    fields = get_grid_fields(canopy.get('canopy_model', ''), with_marvel) + ['free_area']
+
+    # Anemometer-based sections store the free area alongside the reading
+    canopy_model = canopy.get('canopy_model', '')
+    if is_cxw_model(canopy_model) or is_cmwf_model(canopy_model) or is_cmwi_model(canopy_model):
+        free_area = get_derived_value('free_area', canopy_index)
+        for section in edited:
+            section['free_area'] = free_area
+
+    sections = [dict(section) for section in canopy.get('sections', [])]
+    for section, edited_section in zip(sections, edited):
+        section.update({field: edited_section[field] for field in fields if field in edited_section})
+    canopy['sections'] = sections
+
+    # Form-mode widgets would otherwise show the values from before the grid edit
+    clear_section_widget_keys(canopy_index)
+
+@session_callback
+def _on_grid_change(canopy_index: int, grid_key: str, base_key: str, with_marvel: bool):
+    """Data editor callback - applies the grid's edits to form_data."""
+    editor_state = st.session_state.get(grid_key) or {}
+    base_sections = st.session_state.get(base_key)
+    if base_sections is not None and editor_state.get('edited_rows') is not None:
+        apply_section_grid_edits(canopy_index, base_sections, editor_state['edited_rows'], with_marvel)
+
+def _get_grid_base(canopy: dict, with_marvel: bool, grid_key: str, base_key: str) -> list:
+    """
+    Sections the grid is mounted with.
+
+    The grid keeps the same input data for as long as form_data only changes
+    through the grid itself, so it isn't remounted on every edit. When the
+    sections change some other way (form mode, undo, sync, another model),
+    the grid is remounted from the current form_data.
+    """
+    import copy
+
+    sections = canopy.get('sections', [])
+    base_sections = st.session_state.get(base_key)
+    if base_sections is not None:
+        edited_rows = (st.session_state.get(grid_key) or {}).get('edited_rows') or {}
+        expected = build_section_grid({**canopy, 'sections': edit_sections(canopy, base_sections, edited_rows)}, with_marvel)
+        if expected.equals(build_section_grid(canopy, with_marvel)):
+            return base_sections
+
+    base_sections = copy.deepcopy(sections)
+    st.session_state[base_key] = base_sections
+    st.session_state.pop(grid_key, None)
+    return base_sections
+
+@st.fragment
+def render_section_grid(canopy_index: int, canopy_model: str, with_marvel: bool):
+    """
+    Render the section readings grid for a canopy.
+
+    Args:
+        canopy_index: Index of the canopy
+        canopy_model: The canopy model
+        with_marvel: Whether Marvel fields are included
+    """
+    # Fragment reruns don't go through main(), so they register the session themselves
+    with track_session():
+        _render_section_grid(canopy_index, canopy_model, with_marvel)
+
+def _render_section_grid(canopy_index: int, canopy_model: str, with_marvel: bool):
+    canopy = get_form_data('canopies')[canopy_index]
+    grid_key = canopy_key('section_grid', canopy_index)
+    base_key = canopy_key('section_grid_base', canopy_index)
+    base_sections = _get_grid_base(canopy, with_marvel, grid_key, base_key)
+    df = build_section_grid({**canopy, 'sections': base_sections}, with_marvel)
+
+    column_config = {
+        'extract_ksa': st.column_config.SelectboxColumn("Section KSA's", options=get_available_ksas(canopy_model), required=True),
+        'extract_tab_reading': st.column_config.TextColumn("T.A.B Reading"),
+        'supply_plenum_length': st.column_config.SelectboxColumn("Plenum Length", options=PLENUM_LENGTHS, required=True),
+        'supply_tab_reading': st.column_config.TextColumn("T.A.B Point Reading"),
+        'anemometer_reading': st.column_config.NumberColumn("Anemometer Reading (m/s)", min_value=0.0, step=0.1),
+        'supply_anemometer_reading': st.column_config.NumberColumn("Supply Anemometer Reading (m/s)", min_value=0.0, step=0.1),
+        'min_percent': st.column_config.NumberColumn("Min (%)", min_value=0.0, max_value=100.0, step=0.1),
+        'idle_percent': st.column_config.NumberColumn("Idle (%)", min_value=0.0, max_value=100.0, step=0.1),
+        'design_m3s': st.column_config.NumberColumn("Design (m³/s)", min_value=0.0, step=0.01),
+    }
+
+    st.data_editor(
+        df,
+        key=grid_key,
+        num_rows="fixed",
+        use_container_width=True,
+        column_config={field: config for field, config in column_config.items() if field in df.columns},
+        on_change=_on_grid_change,
+        args=(canopy_index, grid_key, base_key, with_marvel)
+    )
+
+    # Calculated from form_data, which the callback has already updated with the grid's edits
+    st.dataframe(
+        calculate_section_grid(canopy_index, build_section_grid(canopy, with_marvel)),
+        use_container_width=True,
+        column_config={
+            'k_factor': st.column_config.NumberColumn("K-Factor", format="%.1f"),
+            'flowrate_m3s': st.column_config.NumberColumn("Flowrate (m³/s)", format="%.3f"),
+        }
+    )
+    st.caption("Tip: copy a block of cells from a spreadsheet or logger export and paste it into the grid.")
+
+def _to_float(value, default=0.0) -> float:
+    """Convert a grid cell value to float, treating blanks and invalid values as the default."""
+    try:
+        if value is None or value == '':
+            return default
+        result = float(value)
+        return result if result == result else default  # NaN check
+    except (ValueError, TypeError):
+        return default
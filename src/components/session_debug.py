@@ -0,0 +1,92 @@
+import streamlit as st
+from src.utils.session_keys import get_session_key_stats
+
+def format_bytes(num_bytes: int) -> str:
+    """Format a byte count for display (e.g. 1536 -> '1.5 KB')."""
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024 or unit == 'MB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+def render_session_debug():
+    """Render session state key counts and sizes (debug mode only)."""
+    with st.expander("🛠️ Session Keys", expanded=False):
+        stats = get_session_key_stats()
+        
+        col1, col2 = st.columns(2)
+        col1.metric("Keys", stats['total_keys'])
+        col2.metric("Size", format_bytes(stats['total_bytes']))
+        st.caption(f"{stats['registered_keys']} canopy/section widget keys")
+        
+        if stats['canopies']:
+            st.markdown("**Per canopy**")
+            for canopy_index, canopy_stats in stats['canopies'].items():
+                st.write(f"Canopy {canopy_index + 1}: {canopy_stats['keys']} keys, "
+                         f"{canopy_stats['sections']} sections, {format_bytes(canopy_stats['bytes'])}")
+        
+        st.markdown("**Largest keys**")
+        for key, size in stats['largest']:
+            st.write(f"`{key}` - {format_bytes(size)}")
+
+def render_memory_debug():
+    """Render memory usage of all sessions on this server (debug mode only)."""
+    from src.utils.session_memory import get_memory_report, get_form_data_sizes, sweep_idle_sessions
+    from src.utils.session_manager import get_form_data
+    
+    with st.expander("🧠 Session Memory", expanded=False):
+        report = get_memory_report()
+        
+        col1, col2 = st.columns(2)
+        col1.metric("Sessions", len(report['sessions']))
+        col2.metric("Process RSS", format_bytes(report['process_rss']) if report['process_rss'] else "n/a")
+        
+        for session in report['sessions']:
+            spilled = f", {format_bytes(session['spilled_bytes'])} spilled" if session['spilled_bytes'] else ""
+            st.write(f"`{session['session_id'][:8]}` - {session['keys']} keys, {format_bytes(session['bytes'])}"
+                     f"{spilled}, idle {session['idle_seconds'] / 60:.0f} min")
+        
+        st.markdown("**Largest form data entries (this session)**")
+        for key, size in get_form_data_sizes(get_form_data()):
+            st.write(f"`{key}` - {format_bytes(size)}")
+        
+        if st.button("💤 Spill idle sessions now", key="debug_spill_idle"):
+            spilled = sweep_idle_sessions(force=True)
+            st.success(f"✅ Spilled {format_bytes(spilled)} to disk")
+
+def render_render_pool_debug():
+    """Render the render worker pool's health check (debug mode only)."""
+    from src.utils.render_pool import get_render_pool_status
+    
+    with st.expander("⚙️ Render Workers", expanded=False):
+        status = get_render_pool_status()
+        state_icons = {'warm': '🟢', 'starting': '🟡', 'cold': '⚪', 'disabled': '⚪', 'failed': '🔴'}
+        
+        col1, col2 = st.columns(2)
+        col1.metric("State", f"{state_icons.get(status['state'], '')} {status['state']}")
+        col2.metric("Workers", status['workers'])
+        st.caption(f"{status['renders']} pooled renders ({status['busy']} in progress), {status['fallback_renders']} in-process, "
+                   f"{status['restarts']} restarts after a timeout; workers recycled every {status['max_renders_per_worker']} renders")
+        
+        if status['warm_seconds'] is not None:
+            st.write(f"Warm {status['warm_seconds']:.1f} s after startup")
+        if status.get('worker'):
+            worker = status['worker']
+            st.write(f"Worker `{worker['pid']}` - {worker['renders']} renders, "
+                     f"{len(worker['warmed_templates'])} templates warm")
+        if status['error']:
+            st.error(f"❌ {status['error']}")
+
+def render_derived_values_debug():
+    """Render the derived values graph's cache state (debug mode only)."""
+    from src.utils.derived_values import get_session_graph
+    
+    graph = get_session_graph()
+    if graph is None:
+        return
+    
+    with st.expander("🧮 Derived Values", expanded=False):
+        stats = graph.get_stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Cached nodes", stats['nodes'])
+        col2.metric("Computations", stats['computations'])
+        st.caption("K-factors, flowrates, totals and progress are recomputed only when their inputs change")
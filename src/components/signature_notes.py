@@ -1,15 +1,16 @@
 import streamlit as st
 import base64
 from io import BytesIO
-from PIL import Image
 from datetime import datetime
 from src.utils.session_manager import get_form_data, update_form_data
 
-# Import the drawable canvas - we know it's available
-from streamlit_drawable_canvas import st_canvas
+# PIL and streamlit-drawable-canvas are imported inside the functions that use them
+# so that importing this module does not slow down the first page render.
 
 def render_signature_and_notes():
     """Render signature drawing canvas and additional notes section."""
+    from streamlit_drawable_canvas import st_canvas
+    
     st.header("📝 Additional Notes & Signature")
     
     # Additional Notes Section with multiple notes support
@@ -123,6 +124,7 @@ def render_signature_and_notes():
     st.markdown("Please draw your signature in the box below:")
     
     # Create signature canvas
+    canvas_width, canvas_height = 600, 200
     col1, col2 = st.columns([3, 1])
     
     with col1:
@@ -134,8 +136,8 @@ def render_signature_and_notes():
             background_color="#FFFFFF",  # White background
             background_image=None,
             update_streamlit=True,
-            height=200,
-            width=600,
+            height=canvas_height,
+            width=canvas_width,
             drawing_mode="freedraw",
             point_display_radius=0,
             key="signature_canvas",
@@ -148,52 +150,65 @@ def render_signature_and_notes():
         st.markdown("• Click 'Clear Signature' to start over")
         
         if st.button("🗑️ Clear Signature", type="secondary"):
+            # Also drop a signature saved with the job (e.g. opened from a job file)
+            update_form_data({'signature_strokes': None, 'signature_data': None, 'has_signature': False})
             st.rerun()
     
-    # Process signature data
+    # Process signature data - the strokes are kept as a compact vector path, not as an image
+    signature_strokes = None
     signature_data = None
     
-    if canvas_result.image_data is not None:
-        # Convert canvas to image
-        img = Image.fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
-        
-        # Check if there's actually a signature (not just blank canvas)
-        # Convert to grayscale to check for non-white pixels
-        grayscale = img.convert('L')
-        pixels = list(grayscale.getdata())
-        
-        # If there are pixels that are not white (255), there's a signature
-        has_signature = any(pixel < 250 for pixel in pixels)  # Allow for slight variations
+    if canvas_result.json_data is not None:
+        from src.utils.signature_vector import strokes_from_canvas, encode_signature
         
-        if has_signature:
-            # Convert to base64 for storage
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            signature_data = base64.b64encode(buffered.getvalue()).decode()
-            
-            st.success("✅ Signature captured successfully!")
-        else:
-            st.info("ℹ️ Please draw your signature in the canvas above")
+        signature_strokes = encode_signature(strokes_from_canvas(canvas_result.json_data), (canvas_width, canvas_height))
+        if signature_strokes:
+            st.session_state.signature_drawn = True
+    
+    # A signature saved with the job (opened from a job file or link) is kept until one is drawn in this session
+    saved_strokes, saved_data = get_form_data('signature_strokes'), get_form_data('signature_data')
+    if not st.session_state.get('signature_drawn') and (saved_strokes or saved_data):
+        signature_strokes, signature_data = saved_strokes, saved_data
+        render_saved_signature(saved_strokes, saved_data)
+    elif signature_strokes:
+        st.success("✅ Signature captured successfully!")
+    elif canvas_result.json_data is not None:
+        st.info("ℹ️ Please draw your signature in the canvas above")
     
     # Update session state
     update_form_data({
         'notes_list': notes_list,
         'additional_notes': '\n\n'.join(notes_list),  # Keep backward compatibility
-        'signature_data': signature_data,
+        'signature_data': signature_data,  # Raster signature of an older job, until a new one is drawn
+        'signature_strokes': signature_strokes,
         'signature_date': signature_date_value,
         'print_name': print_name_value,
-        'has_signature': signature_data is not None
+        'has_signature': bool(signature_strokes or signature_data)
     })
     
     return {
         'notes_list': notes_list,
         'additional_notes': '\n\n'.join(notes_list),  # Keep backward compatibility
-        'signature_data': signature_data,
+        'signature_data': signature_data,  # Raster signature of an older job, until a new one is drawn
+        'signature_strokes': signature_strokes,
         'signature_date': signature_date_value,
         'print_name': print_name_value,
-        'has_signature': signature_data is not None
+        'has_signature': bool(signature_strokes or signature_data)
     }
 
+def render_saved_signature(signature_strokes: str, signature_data: str):
+    """Show the signature saved with the job (the canvas itself starts empty)."""
+    try:
+        if signature_strokes:
+            from src.utils.signature_vector import rasterize_signature
+            image = rasterize_signature(signature_strokes)[0]
+        else:
+            image = base64.b64decode(signature_data)
+        st.image(image, width=300)
+    except Exception:
+        pass
+    st.info("ℹ️ Saved signature - draw in the canvas to replace it, or click 'Clear Signature'")
+
 def get_signature_image_for_template(signature_base64: str) -> str:
     """
     Convert base64 signature data to a format suitable for Word template.
@@ -208,6 +223,8 @@ def get_signature_image_for_template(signature_base64: str) -> str:
         return ""
     
     try:
+        from PIL import Image
+        
         # Decode base64 to image
         image_data = base64.b64decode(signature_base64)
         img = Image.open(BytesIO(image_data))
@@ -1,9 +1,10 @@
 import streamlit as st
-import pandas as pd
 from src.utils.session_manager import get_form_data
 
 def render_testing_panel(report_type: str):
     """Render the testing panel for viewing collected data."""
+    import pandas as pd  # Imported lazily - only needed when the panel is shown
+    
     st.subheader("🔍 Current Form Data (for testing)")
     
     col1, col2 = st.columns(2)
@@ -0,0 +1,34 @@
+import streamlit as st
+from src.utils.session_manager import get_form_history, undo_form_data, redo_form_data, is_debug_mode
+
+def render_undo_redo():
+    """Render undo/redo buttons for form changes (in the sidebar)."""
+    history = get_form_history()
+    stats = history.get_stats()
+    
+    st.markdown("---")
+    st.subheader("↩️ Undo / Redo")
+    
+    col1, col2 = st.columns(2)
+    undo_keys, redo_keys = history.undo_keys(), history.redo_keys()
+    col1.button(
+        "↩️ Undo",
+        key="undo_form_change",
+        on_click=undo_form_data,
+        disabled=not history.can_undo(),
+        help=f"Undo change to: {', '.join(undo_keys)}" if undo_keys else None,
+        use_container_width=True
+    )
+    col2.button(
+        "↪️ Redo",
+        key="redo_form_change",
+        on_click=redo_form_data,
+        disabled=not history.can_redo(),
+        help=f"Redo change to: {', '.join(redo_keys)}" if redo_keys else None,
+        use_container_width=True
+    )
+    
+    st.caption(f"{stats['undo_steps']} change(s) to undo, {stats['redo_steps']} to redo")
+    if is_debug_mode():
+        from src.components.session_debug import format_bytes
+        st.caption(f"History: {stats['steps']} snapshots, {format_bytes(stats['bytes'])} beyond the oldest")
@@ -110,9 +110,12 @@ def render_uv_checklist():
         else:
             st.error("❌ UV System Checks Incomplete")
 
-def get_uv_checklist_summary():
-    """Get a summary of UV checklist completion for templates."""
-    uv_checklist_data = get_form_data('uv_checklist', {})
+def get_uv_checklist_summary(form_data: dict = None):
+    """Get a summary of UV checklist completion for templates (from the session's form data unless given)."""
+    if form_data is None:
+        uv_checklist_data = get_form_data('uv_checklist', {})
+    else:
+        uv_checklist_data = form_data.get('uv_checklist', {})
     
     summary = {
         'total_items': len(UV_SYSTEM_CHECKLIST),
@@ -1,6 +1,7 @@
 import streamlit as st
 from src.config import WATER_WASH_SYSTEM_CHECKLIST
 from src.utils.session_manager import get_form_data, update_form_data
+from src.utils.session_keys import checklist_key
 
 def render_water_wash_checklist_for_canopy(canopy_index: int, canopy_model: str):
     """Render Water Wash System Checklist for a specific canopy."""
@@ -19,7 +20,7 @@ def render_water_wash_checklist_for_canopy(canopy_index: int, canopy_model: str)
                 min_value=0.0,
                 step=0.1,
                 value=canopy_wash_data.get(item, None),  # Default to None (empty)
-                key=f"canopy_{canopy_index}_wash_check_{i}",
+                key=checklist_key('wash', canopy_index, i),
                 help="Enter cold water pressure in BAR"
             )
         elif item == 'Hot water pressure (BAR)':
@@ -28,7 +29,7 @@ def render_water_wash_checklist_for_canopy(canopy_index: int, canopy_model: str)
                 min_value=0.0,
                 step=0.1,
                 value=canopy_wash_data.get(item, None),  # Default to None (empty)
-                key=f"canopy_{canopy_index}_wash_check_{i}",
+                key=checklist_key('wash', canopy_index, i),
                 help="Enter hot water pressure in BAR"
             )
         elif item == 'Hot water temperature (°C)':
@@ -37,14 +38,14 @@ def render_water_wash_checklist_for_canopy(canopy_index: int, canopy_model: str)
                 min_value=0.0,
                 step=1.0,
                 value=canopy_wash_data.get(item, None),  # Default to None (empty)
-                key=f"canopy_{canopy_index}_wash_check_{i}",
+                key=checklist_key('wash', canopy_index, i),
                 help="Enter hot water temperature in Celsius"
             )
         elif item == 'Capture Jet average Pressure (Pa)':
             value = st.text_input(
                 f"📊 {item}",
                 value=canopy_wash_data.get(item, ''),  # Default to empty
-                key=f"canopy_{canopy_index}_wash_check_{i}",
+                key=checklist_key('wash', canopy_index, i),
                 placeholder="Enter pressure reading",
                 help="Enter capture jet average pressure reading"
             )
@@ -53,7 +54,7 @@ def render_water_wash_checklist_for_canopy(canopy_index: int, canopy_model: str)
             value = st.checkbox(
                 f"☐ {item}",
                 value=canopy_wash_data.get(item, False),  # Default to False (unchecked)
-                key=f"canopy_{canopy_index}_wash_check_{i}",
+                key=checklist_key('wash', canopy_index, i),
                 help=f"Check if {item.lower()} is completed"
             )
         
@@ -1,5 +1,15 @@
 # Configuration settings for the Canopy Commissioning Report Generator
 
+import os
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    """Whole-number setting from the environment, or the default if it is unset or invalid."""
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value >= minimum else default
+
 # Report types
 REPORT_TYPES = ["Canopy Commissioning", "Supply Air Analysis", "Full System Report"]
 
@@ -68,7 +78,7 @@ WATER_WASH_SYSTEM_CHECKLIST = [
 BASIC_FIELDS = 6  # report_type, client_name, project_name, project_number, date_of_visit, engineer_name
 
 # Canopy configuration
-MAX_CANOPIES = 20
+MAX_CANOPIES = _env_int('CANOPY_MAX_CANOPIES', 20, minimum=1)  # also the largest schedule that can be imported
 MAX_SECTIONS = 6
 
 # Section field configuration
@@ -77,173 +87,126 @@ SUPPLY_SECTION_FIELDS = 2  # supply_plenum_length, supply_tab_reading (only for
 MARVEL_SECTION_FIELDS = 3  # min_percent, idle_percent, design_percent
 BASIC_CANOPY_FIELDS = 7   # drawing_number, canopy_location, canopy_model, with_marvel, design_airflow, supply_airflow, number_of_sections 
 
-# K-factor data based on canopy documentation
-K_FACTOR_DATA = {
-    # 1.1 Capture Jet™ hoods (KVF, KVI, KCH-F, KCH-I)
-    'KVF': {
-        'type': 'section_based',
-        'sections': {
-            1: 71.8, 2: 143.6, 3: 215.4, 4: 287.2, 5: 359.0, 6: 430.8
-        }
-    },
-    'KVI': {
-        'type': 'section_based',
-        'sections': {
-            1: 71.8, 2: 143.6, 3: 215.4, 4: 287.2, 5: 359.0, 6: 430.8
-        }
-    },
-    'KCH-F': {
-        'type': 'section_based',
-        'sections': {
-            1: 71.8, 2: 143.6, 3: 215.4, 4: 287.2, 5: 359.0, 6: 430.8
-        }
-    },
-    'KCH-I': {
-        'type': 'section_based',
-        'sections': {
-            1: 71.8, 2: 143.6, 3: 215.4, 4: 287.2, 5: 359.0, 6: 430.8
-        }
-    },
-    
-    # 1.2 Capture Jet™ low proximity (KSR-S, KSR-F, KSR-M)
-    'KSR-S': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    'KSR-F': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    'KSR-M': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    
-    # 1.3 Capture Ray™ hoods (UVF, UVI)
-    'UVF': {
-        'type': 'section_based',
-        'sections': {
-            1: 49.7, 2: 99.4, 3: 149.1, 4: 198.8, 5: 248.5, 6: 298.2
-        }
-    },
-    'UVI': {
-        'type': 'section_based',
-        'sections': {
-            1: 49.7, 2: 99.4, 3: 149.1, 4: 198.8, 5: 248.5, 6: 298.2
-        }
-    },
-    
-    # 1.4 Capture Ray™ low proximity (USR-S, USR-F, USR-M)
-    'USR-S': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    'USR-F': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    'USR-M': {
-        'type': 'section_based',
-        'sections': {
-            1: 67.7, 2: 135.4, 3: 203.1, 4: 270.8, 5: 338.5, 6: 406.2
-        }
-    },
-    
-    # 1.5 Water Wash hoods (KWF, KWI, UWF, UWI, CMW-FMOD, CMW-IMOD)
-    'KWF': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    'KWI': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    'UWF': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    'UWI': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    'CMW-FMOD': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    'CMW-IMOD': {
-        'type': 'section_based',
-        'sections': {
-            1: 65.5, 2: 131.0, 3: 196.5, 4: 262.0, 5: 327.5, 6: 393.0
-        }
-    },
-    
-    # 1.6 Cold Mist only (CMW-F, CMW-I)
-    'CMW-F': {
-        'type': 'length_based',
-        'length_ranges': {
-            1000: 115, 1500: 172.5, 2000: 230, 2500: 287.5, 3000: 345
-        }
-    },
-    'CMW-I': {
-        'type': 'length_based',
-        'length_ranges': {
-            1000: 115, 1500: 172.5, 2000: 230, 2500: 287.5, 3000: 345
-        }
-    },
-    
-    # 1.7 Steam hoods (KVD, KVV)
-    'KVD': {
-        'type': 'length_based',
-        'length_ranges': {
-            1000: 161, 1500: 241.5, 2000: 322, 2500: 402.5, 3000: 483, 3500: 563.5, 4000: 644
-        }
-    },
-    'KVV': {
-        'type': 'length_based',
-        'length_ranges': {
-            1000: 161, 1500: 241.5, 2000: 322, 2500: 402.5, 3000: 483, 3500: 563.5, 4000: 644
-        }
-    },
-    
-    # 1.8 CXW hoods (special handling - uses anemometer readings and free area calculation)
-    'CXW': {
-        'type': 'cxw_special',
-        'calculation': 'Qv = A x m/s'  # Flowrate = Free Area x Anemometer Reading
-    },
-    
-    # 1.9 CMWF hoods (similar to CXW but uses slot dimensions)
-    'CMWF': {
-        'type': 'cmwf_special',
-        'calculation': 'Qv = A x m/s'  # Flowrate = Free Area x Anemometer Reading
-    },
-    
-    # 1.10 CMWI hoods (similar to CMWF but extract only)
-    'CMWI': {
-        'type': 'cmwi_special',
-        'calculation': 'Qv = A x m/s'  # Flowrate = Free Area x Anemometer Reading
-    }
+# K-factor catalogue (data/k_factors.json), compiled to a binary cache in CACHE_DIR
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache')
+K_FACTOR_CATALOGUE_PATH = os.path.join(PROJECT_ROOT, 'data', 'k_factors.json')
+K_FACTOR_CATALOGUE_CHECK_INTERVAL = 5.0  # seconds between checks for an edited catalogue file
+
+# Debug panels (session state stats) - shown only when this environment variable is set on the server,
+# as they expose other sessions' memory use
+DEBUG_ENV_VAR = 'CANOPY_REPORT_DEBUG'
+
+# Idle session spill - heavy payloads of sessions idle this long are moved to disk until the session is used again
+SESSION_SPILL_DIR = os.path.join(CACHE_DIR, 'sessions')
+SESSION_IDLE_SPILL_SECONDS = 15 * 60
+SESSION_SWEEP_INTERVAL = 60.0  # seconds between idle-session sweeps
+SESSION_SPILL_MIN_BYTES = 16 * 1024  # smaller values stay in memory
+
+# Shared job store (form data, share tokens, generated documents) - every app process must point at the same store
+JOB_STORE_URL = os.environ.get('CANOPY_JOB_STORE_URL', 'sqlite:///' + os.path.join(CACHE_DIR, 'jobs.sqlite3'))
+JOB_SYNC_RETRIES = 3  # push attempts when the job was changed elsewhere meanwhile (pull, merge, retry)
+JOB_PATCH_HISTORY = 500  # form data patches kept per job for delta sync (older revisions resync in full)
+
+# Job files - portable export of a job (form data, signature, photos) that can be opened on any machine
+JOB_FILE_EXTENSION = '.ccjob'
+JOB_FILE_COMPRESSION_LEVEL = 6  # zlib level for the form data (photos are stored as they are)
+
+# Per-canopy template context cache (entries, shared by all sessions in a process)
+CANOPY_CONTEXT_CACHE_SIZE = 512
+# Rendered per-canopy template blocks (entries of 100-170 KB of XML, shared by all sessions in a process)
+RENDERED_FRAGMENT_CACHE_SIZE = 128
+
+# Derived values graph (K-factors, flowrates, totals, progress) - cached node values per session
+DERIVED_CACHE_SIZE = 4096
+
+# Undo/redo history of form data - steps kept per session, and memory the steps may add beyond the current form data
+FORM_HISTORY_STEPS = 200
+FORM_HISTORY_MAX_BYTES = 4 * 1024 * 1024
+
+# Template preprocessing - slimmed copies of the templates are cached here (set CANOPY_TEMPLATE_PREPROCESSING=0 to render the originals)
+TEMPLATE_CACHE_DIR = os.path.join(CACHE_DIR, 'templates')
+TEMPLATE_PREPROCESSING = os.environ.get('CANOPY_TEMPLATE_PREPROCESSING', '1') != '0'
+TEMPLATE_IMAGE_COLORS = 256  # palette size for template PNGs (0 keeps full colour)
+
+# Generated report optimization (before download)
+OUTPUT_DEFLATE_LEVEL = 9
+OUTPUT_IMAGE_MAX_DPI = 150  # images (signature, photos) are downsized to this resolution at their on-page size
+OUTPUT_JPEG_QUALITY = 80
+OUTPUT_MAX_BYTES = int(os.environ.get('CANOPY_REPORT_MAX_BYTES', 2 * 1024 * 1024))  # size budget (0 for none)
+OUTPUT_BUDGET_DPI_STEPS = (120, 96, 72)  # lower image resolutions tried, in order, while over the budget
+
+# Design vs actual airflow charts (drawn in the background, cached by their numbers)
+CHART_WORKERS = 2
+CHART_CACHE_SIZE = 256
+CHART_SIZE = (1200, 600)  # pixels
+CHART_WIDTH_INCHES = 6.0  # width in the report
+
+# Site photos - processed once in the background, stored by content hash
+PHOTO_DIR = os.path.join(CACHE_DIR, 'photos')
+PHOTO_WORKERS = 2
+PHOTO_MAX_PIXELS = 1600  # long edge of the image inserted in the report
+PHOTO_THUMBNAIL_PIXELS = 240  # long edge of the UI thumbnail
+PHOTO_JPEG_QUALITY = 85
+PHOTO_WIDTH_INCHES = 3.0  # width in the report
+MAX_PHOTOS_PER_ITEM = 10
+
+# Signatures - stored as simplified vector strokes, rasterized when a report is rendered
+SIGNATURE_SIMPLIFY_TOLERANCE = 1.0  # canvas pixels a simplified stroke may deviate from the drawn one
+SIGNATURE_MAX_WIDTH_INCHES = 3.125  # box the signature is fitted into in the report
+SIGNATURE_MAX_HEIGHT_INCHES = 1.0
+SIGNATURE_DPI = 300
+SIGNATURE_STROKE_WIDTH = 2  # canvas pixels (matches the canvas pen)
+
+# Report templates (in TEMPLATES_DIR) by report type
+TEMPLATES_DIR = os.path.join(PROJECT_ROOT, 'templates')
+REPORT_TEMPLATES = {
+    "Canopy Commissioning": "Canopy Commissioning Report Template 2022.docx",
+    "Supply Air Analysis": "supply_air_analysis_template.docx",
+    "Full System Report": "full_system_report_template.docx"
 }
 
+# Render worker pool - pre-warmed processes that render reports (set CANOPY_RENDER_WORKERS=0 to render in the app process)
+RENDER_WORKERS = int(os.environ.get('CANOPY_RENDER_WORKERS', 2))
+RENDER_WORKER_MAX_RENDERS = 50  # a worker is replaced after this many renders, bounding its memory growth
+RENDER_TIMEOUT = 60.0  # seconds to wait for a worker before rendering in the app process instead
+
+# PDF export - long-lived converter processes ('office' is headless LibreOffice, 'stub' writes a plain-text PDF)
+PDF_CONVERTER = os.environ.get('CANOPY_PDF_CONVERTER', 'office')
+PDF_CONVERTERS = int(os.environ.get('CANOPY_PDF_CONVERTERS', 2))  # converter processes (= concurrent conversions)
+PDF_QUEUE_SIZE = 8  # conversions waiting for a converter before new requests are turned away
+PDF_TIMEOUT = 120.0  # seconds before a conversion is abandoned and its converter restarted
+PDF_CONVERTER_MAX_JOBS = 100  # a converter is restarted after this many conversions
+PDF_OFFICE_BINARY = os.environ.get('CANOPY_OFFICE_BINARY', 'soffice')
+PDF_OFFICE_START_TIMEOUT = 30.0  # seconds for LibreOffice to start (part of PDF_TIMEOUT for the job that waits for it)
+PDF_CACHE_DIR = os.path.join(CACHE_DIR, 'pdf')  # converted PDFs by .docx content hash
+
+# Report archive - every generated report (and PDF), stored once by content hash with a searchable index
+REPORT_ARCHIVE_DIR = os.environ.get('CANOPY_REPORT_ARCHIVE_DIR', os.path.join(PROJECT_ROOT, 'archive'))
+REPORT_ARCHIVE_RETENTION_DAYS = int(os.environ.get('CANOPY_REPORT_ARCHIVE_RETENTION_DAYS', 365))  # 0 keeps reports forever
+REPORT_ARCHIVE_MAX_BYTES = int(os.environ.get('CANOPY_REPORT_ARCHIVE_MAX_BYTES', 5 * 1024 ** 3))  # oldest removed first (0 for no limit)
+REPORT_ARCHIVE_PAGE_SIZE = 20  # reports listed at a time in the UI
+
+def get_k_factor_data() -> dict:
+    """
+    Get the current K-factor catalogue.
+    
+    Loaded from K_FACTOR_CATALOGUE_PATH on first use and reloaded automatically
+    when the file changes. Grab it once if you need a consistent view across
+    many lookups.
+    
+    Returns:
+        Dict mapping canopy model to its K-factor data
+    """
+    from src.utils.k_factor_catalogue import get_k_factor_catalogue
+    return get_k_factor_catalogue()
+
+def __getattr__(name):
+    # Keep `from src.config import K_FACTOR_DATA` working - always returns the current catalogue
+    if name == 'K_FACTOR_DATA':
+        return get_k_factor_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_k_factor(canopy_model: str, ksa_count: int) -> float:
     """
     Get K-factor value for a given canopy model and number of KSAs.
@@ -255,10 +218,11 @@ def get_k_factor(canopy_model: str, ksa_count: int) -> float:
     Returns:
         K-factor value or 0.0 if not found
     """
-    if canopy_model not in K_FACTOR_DATA:
+    k_factor_data = get_k_factor_data()
+    if canopy_model not in k_factor_data:
         return 0.0
     
-    model_data = K_FACTOR_DATA[canopy_model]
+    model_data = k_factor_data[canopy_model]
     
     if model_data['type'] == 'section_based':
         return model_data['sections'].get(ksa_count, 0.0)
@@ -286,10 +250,11 @@ def get_available_ksas(canopy_model: str) -> list:
     Returns:
         List of available KSA counts/lengths
     """
-    if canopy_model not in K_FACTOR_DATA:
+    k_factor_data = get_k_factor_data()
+    if canopy_model not in k_factor_data:
         return []
     
-    model_data = K_FACTOR_DATA[canopy_model]
+    model_data = k_factor_data[canopy_model]
     
     if model_data['type'] == 'section_based':
         return list(model_data['sections'].keys())
@@ -300,7 +265,8 @@ def get_available_ksas(canopy_model: str) -> list:
 
 def is_length_based_model(canopy_model: str) -> bool:
     """Check if a canopy model uses length-based K-factors."""
-    return canopy_model in K_FACTOR_DATA and K_FACTOR_DATA[canopy_model]['type'] == 'length_based'
+    k_factor_data = get_k_factor_data()
+    return canopy_model in k_factor_data and k_factor_data[canopy_model]['type'] == 'length_based'
 
 def is_cxw_model(canopy_model: str) -> bool:
     """
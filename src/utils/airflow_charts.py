@@ -0,0 +1,237 @@
+"""
+Design vs actual airflow charts for reports and the results summary.
+
+Charts are drawn with PIL (already needed for signatures and templates) on a
+small thread pool. Each chart is cached by a hash of the numbers it shows, so
+it is only drawn again when the data changes; ``request_charts()`` starts the
+drawing in the background and ``get_chart()`` waits for one chart.
+
+A forked process (a render worker) inherits the pool object but not its
+threads, so the pool and the charts being drawn are reset in the child after a
+fork; the child starts its own pool when it first needs one.
+
+A chart is described by a spec: ``{'title': str, 'groups': [[label, design,
+actual], ...]}``, with airflows in m³/s.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.config import CHART_WORKERS, CHART_CACHE_SIZE, CHART_SIZE, CHART_WIDTH_INCHES
+
+DESIGN_COLOUR = (154, 165, 177)
+ACTUAL_COLOUR = (31, 119, 180)
+AXIS_COLOUR = (90, 90, 90)
+GRID_COLOUR = (225, 225, 225)
+
+# Chart hash -> PNG bytes (LRU) and charts being drawn
+_chart_cache: 'OrderedDict[str, bytes]' = OrderedDict()
+_pending: Dict[str, Future] = {}
+_chart_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def canopy_chart_spec(canopy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chart of one canopy's extract (and supply, if it has supply air) design vs actual.
+
+    Args:
+        canopy: Canopy context (from build_canopy_context)
+
+    Returns:
+        Chart spec
+    """
+    groups = [['Extract', canopy.get('design_airflow') or 0.0, canopy.get('extract_total_flowrate_m3s') or 0.0]]
+    if canopy.get('has_f_in_name') and canopy.get('supply_airflow'):
+        groups.append(['Supply', canopy.get('supply_airflow') or 0.0, canopy.get('supply_total_flowrate_m3s') or 0.0])
+
+    title = f"Canopy {canopy['index']}"
+    if canopy.get('drawing_number'):
+        title += f" - {canopy['drawing_number']}"
+    return {'title': title, 'groups': groups}
+
+def results_chart_spec(title: str, results: List[Dict[str, str]], total_design: str, total_actual: str) -> Dict[str, Any]:
+    """
+    Chart of a results summary table (one group per canopy plus the total).
+
+    Args:
+        title: Chart title
+        results: Rows from generate_results_summary_data
+        total_design: Total design flow rate
+        total_actual: Total actual flowrate
+
+    Returns:
+        Chart spec
+    """
+    groups = [[row['drawing_number'] or f"#{i + 1}", float(row['design_flow_rate']), float(row['actual_flowrate'])]
+              for i, row in enumerate(results)]
+    groups.append(['TOTAL', float(total_design), float(total_actual)])
+    return {'title': title, 'groups': groups}
+
+def chart_key(spec: Dict[str, Any]) -> str:
+    """Hash of a chart spec (and the chart size)."""
+    return hashlib.sha1(json.dumps([spec, CHART_SIZE], sort_keys=True).encode('utf-8')).hexdigest()
+
+def request_charts(specs: List[Dict[str, Any]]) -> List[Future]:
+    """
+    Start drawing charts in the background (cached charts resolve immediately).
+
+    Args:
+        specs: Chart specs
+
+    Returns:
+        One future per spec, resolving to the chart's PNG bytes
+    """
+    global _executor
+
+    futures = []
+    for spec in specs:
+        key = chart_key(spec)
+        with _chart_lock:
+            if key in _chart_cache:
+                _chart_cache.move_to_end(key)
+                future = Future()
+                future.set_result(_chart_cache[key])
+            elif key in _pending:
+                future = _pending[key]
+            else:
+                if _executor is None:
+                    _executor = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix='chart')
+                future = _executor.submit(_draw_and_cache, key, spec)
+                _pending[key] = future
+        futures.append(future)
+    return futures
+
+def get_chart(spec: Dict[str, Any], timeout: Optional[float] = None) -> bytes:
+    """
+    Get a chart, drawing it if it isn't cached.
+
+    Args:
+        spec: Chart spec
+        timeout: Seconds to wait (None waits until it is drawn)
+
+    Returns:
+        PNG bytes
+    """
+    return request_charts([spec])[0].result(timeout=timeout)
+
+def stop_chart_workers():
+    """Wait for the charts being drawn and stop the drawing threads (a new pool starts when charts are requested)."""
+    global _executor
+
+    with _chart_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def _reset_after_fork():
+    """Forget the parent's pool (its threads don't exist in the child) and its charts in progress."""
+    global _executor, _pending, _chart_lock
+
+    _executor = None
+    _pending = {}
+    _chart_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _draw_and_cache(key: str, spec: Dict[str, Any]) -> bytes:
+    """Pool task: draw a chart and put it in the cache."""
+    try:
+        png = draw_bar_chart(spec['title'], spec['groups'])
+        with _chart_lock:
+            _chart_cache[key] = png
+            while len(_chart_cache) > CHART_CACHE_SIZE:
+                _chart_cache.popitem(last=False)
+        return png
+    finally:
+        with _chart_lock:
+            _pending.pop(key, None)
+
+def draw_bar_chart(title: str, groups: List[list], size: tuple = CHART_SIZE) -> bytes:
+    """
+    Draw a grouped bar chart of design vs actual airflow.
+
+    Args:
+        title: Chart title
+        groups: [label, design, actual] per group of bars
+        size: (width, height) in pixels
+
+    Returns:
+        PNG bytes
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    scale = height / 400
+    title_font, label_font = _font(round(20 * scale)), _font(round(13 * scale))
+
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+
+    left, right = round(70 * scale), width - round(20 * scale)
+    top, bottom = round(60 * scale), height - round(50 * scale)
+
+    draw.text((width / 2, round(10 * scale)), title, fill='black', font=title_font, anchor='ma')
+
+    # Legend
+    legend_x = left
+    for name, colour in (('Design', DESIGN_COLOUR), ('Actual', ACTUAL_COLOUR)):
+        box = round(12 * scale)
+        draw.rectangle([legend_x, round(38 * scale), legend_x + box, round(38 * scale) + box], fill=colour)
+        draw.text((legend_x + box + round(5 * scale), round(38 * scale)), name, fill='black', font=label_font)
+        legend_x += round(90 * scale)
+
+    # Y axis with gridlines at "nice" steps
+    highest = max([max(design, actual) for _, design, actual in groups] + [0.0])
+    step = _nice_step(highest / 5) if highest > 0 else 0.1
+    y_max = step * max(1, math.ceil(highest * 1.1 / step))  # headroom for the percentage labels
+
+    def y_position(value: float) -> float:
+        return bottom - (bottom - top) * value / y_max
+
+    for n in range(round(y_max / step) + 1):
+        tick = round(n * step, 10)
+        y = y_position(tick)
+        draw.line([left, y, right, y], fill=GRID_COLOUR, width=max(1, round(scale)))
+        draw.text((left - round(8 * scale), y), f"{tick:g}", fill=AXIS_COLOUR, font=label_font, anchor='rm')
+    draw.text((round(8 * scale), top - round(22 * scale)), 'm3/s', fill=AXIS_COLOUR, font=label_font)
+    draw.line([left, top, left, bottom, right, bottom], fill=AXIS_COLOUR, width=max(1, round(2 * scale)))
+
+    # Bars
+    slot = (right - left) / max(1, len(groups))
+    bar = min(slot * 0.35, 60 * scale)
+    for i, (label, design, actual) in enumerate(groups):
+        centre = left + slot * (i + 0.5)
+        draw.rectangle([centre - bar, y_position(design), centre, bottom], fill=DESIGN_COLOUR)
+        draw.rectangle([centre, y_position(actual), centre + bar, bottom], fill=ACTUAL_COLOUR)
+        if design:
+            draw.text((centre + bar / 2, y_position(actual) - round(3 * scale)), f"{actual / design * 100:.0f}%",
+                      fill='black', font=label_font, anchor='md')
+        draw.text((centre, bottom + round(8 * scale)), str(label), fill='black', font=label_font, anchor='ma')
+
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+def _nice_step(raw_step: float) -> float:
+    """Round a gridline step up to 1, 2 or 5 times a power of ten."""
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    for multiple in (1, 2, 5, 10):
+        if raw_step <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+def _font(size: int):
+    """PIL's built-in font at a size (fixed-size bitmap font on Pillow < 10.1)."""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
@@ -0,0 +1,567 @@
+"""
+Reactive graph of values derived from form data.
+
+K-factors, free areas, section flowrates, canopy totals, the results summary
+and form progress are nodes of a small computation graph. Each node declares
+its inputs - paths in ``form_data`` and other nodes - and a function that
+computes its value from them.
+
+The graph keeps a structurally shared snapshot of the form data it last saw
+(``form_history.share_snapshot``). Getting a value diffs the form data the
+node can read against that snapshot - its canopy for nodes of one canopy, the
+whole form for job-wide nodes - and only the nodes reading a changed path are
+recomputed, so editing a T.A.B. reading recomputes that section's flowrate,
+its canopy's totals and the job totals, and everything else is answered from
+the cache without looking at its inputs. Nodes whose new value equals the old
+one don't invalidate their dependents.
+
+UI components and the template context read derived values through
+``get_derived_value()`` instead of computing them.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.config import DERIVED_CACHE_SIZE
+from src.utils.form_history import share_snapshot
+
+# Node name -> (inputs function, compute function, shape function)
+NODES: Dict[str, Tuple[Callable, Callable, Callable]] = {}
+
+class _Missing:
+    """Value of a path that doesn't exist in the form data (survives copying and pickling as itself)."""
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return 'MISSING'
+
+MISSING = _Missing()
+
+# Session state key of the session's graph
+SESSION_GRAPH_KEY = '_derived_graph'
+
+def field(*path) -> tuple:
+    """Input source: a value in form_data, e.g. ``field('canopies', 0, 'grill_size')``."""
+    return ('field', path)
+
+def derived(name: str, *args) -> tuple:
+    """Input source: the value of another node, e.g. ``derived('free_area', 0)``."""
+    return ('node', name, args)
+
+def node(inputs: Callable[..., List[tuple]], shape: Optional[Callable[..., List[tuple]]] = None):
+    """
+    Register a derived node (decorator).
+
+    Nodes with arguments (canopy index, section index) must only read their
+    canopy's part of the form data.
+
+    Args:
+        inputs: Function of (form_data, *node args) returning the node's input
+            sources (``field()``/``derived()``); their values are passed to the
+            decorated function in the same order
+        shape: Function of (*node args) returning the form data paths whose
+            size or value decides which inputs the node has (e.g. a canopy's
+            sections list)
+    """
+    def register(compute: Callable) -> Callable:
+        NODES[compute.__name__] = (inputs, compute, shape or (lambda *args: []))
+        return compute
+    return register
+
+class DerivedGraph:
+    """Cached node values for one form (one per session, plus one per process for render workers)."""
+
+    def __init__(self):
+        self._values: 'OrderedDict[tuple, tuple]' = OrderedDict()  # (name, args) -> (value, version, dependency versions)
+        self._stale: Set[tuple] = set()  # Nodes with a changed form data input
+        self._unchecked: Set[tuple] = set()  # Nodes depending on a stale node (recomputed if its value changed)
+        self._readers: Dict[tuple, Set[tuple]] = {}  # Form data path -> nodes reading it
+        self._shape_readers: Dict[tuple, Set[tuple]] = {}  # Form data path -> nodes whose inputs depend on its size
+        self._dependents: Dict[tuple, Set[tuple]] = {}  # Node -> nodes using its value
+        self._snapshot: Any = MISSING  # Form data as last seen (shared snapshot)
+        self._version = 0
+        self.computations = 0  # number of node (re)computations, for the debug panel
+
+    def get(self, form_data: Dict[str, Any], name: str, *args) -> Any:
+        """
+        Get a node's value, recomputing it (and any stale inputs) if needed.
+
+        Args:
+            form_data: Form data the value is derived from
+            name: Node name
+            *args: Node arguments (canopy index, section index)
+
+        Returns:
+            The node's value (shared with the cache - treat as read-only)
+        """
+        scope = ('canopies', args[0]) if args else ()
+        canopies = self._snapshot.get('canopies') if isinstance(self._snapshot, dict) else None
+        if scope and not (isinstance(canopies, list) and args[0] < len(canopies)):
+            scope = ()  # Canopy not in the snapshot yet
+        self._refresh(form_data, scope)
+        return self._get(form_data, (name, args))[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Cached node count and total computations."""
+        return {'nodes': len(self._values), 'computations': self.computations}
+
+    def _refresh(self, form_data: Dict[str, Any], scope: tuple):
+        """Diff the form data under ``scope`` against the snapshot and invalidate the nodes reading what changed."""
+        previous = _lookup(self._snapshot, scope)
+        snapshot, _ = share_snapshot(_lookup(form_data, scope), previous)
+        if snapshot is previous:
+            return
+
+        changes: List[Tuple[tuple, bool]] = []
+        _diff(snapshot, previous, scope, changes)
+        for path, container in changes:
+            self._invalidate_path(path, container)
+        self._snapshot = _replace(self._snapshot, scope, snapshot)
+
+    def _invalidate_path(self, path: tuple, container: bool):
+        """Mark the nodes reading a changed form data path stale."""
+        stale = set()
+        for i in range(len(path) + 1):
+            stale |= self._readers.get(path[:i], set())
+        if container:  # A dict/list was added, removed or replaced: everything read inside it changed
+            for read_path, readers in self._readers.items():
+                if read_path[:len(path)] == path:
+                    stale |= readers
+        for shape_path, readers in self._shape_readers.items():
+            if shape_path[:len(path)] == path or (len(path) == len(shape_path) + 1 and path[:-1] == shape_path):
+                stale |= readers
+
+        self._stale |= stale
+        pending = list(stale)
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in self._unchecked and dependent not in self._stale:
+                    self._unchecked.add(dependent)
+                    pending.append(dependent)
+
+    def _get(self, form_data: Dict[str, Any], key: tuple) -> tuple:
+        """A node's (value, version, dependency versions), recomputed if stale."""
+        cached = self._values.get(key)
+        if cached is not None and key not in self._stale:
+            if key in self._unchecked:
+                if any(self._get(form_data, dependency)[1] != version for dependency, version in cached[2]):
+                    return self._compute(form_data, key, cached)
+                self._unchecked.discard(key)
+            self._values.move_to_end(key)
+            return cached
+        return self._compute(form_data, key, cached)
+
+    def _compute(self, form_data: Dict[str, Any], key: tuple, cached: Optional[tuple]) -> tuple:
+        """(Re)compute a node and record which form data paths and nodes it read."""
+        name, args = key
+        inputs, compute, shape = NODES[name]
+        values, dependencies = [], []
+        for source in inputs(form_data, *args):
+            if source[0] == 'node':
+                dependency = (source[1], source[2])
+                value, version, _ = self._get(form_data, dependency)
+                dependencies.append((dependency, version))
+                self._dependents.setdefault(dependency, set()).add(key)
+            else:
+                value = _lookup(form_data, source[1])
+                self._readers.setdefault(source[1], set()).add(key)
+            values.append(value)
+        for path in shape(*args):
+            self._shape_readers.setdefault(path, set()).add(key)
+
+        value = compute(*values)
+        self.computations += 1
+        if cached is not None and _equal(cached[0], value):
+            version = cached[1]  # Unchanged: dependents don't need recomputing
+        else:
+            self._version += 1
+            version = self._version
+
+        entry = (value, version, tuple(dependencies))
+        self._values[key] = entry
+        self._values.move_to_end(key)
+        self._stale.discard(key)
+        self._unchecked.discard(key)
+        while len(self._values) > DERIVED_CACHE_SIZE:
+            evicted, _ = self._values.popitem(last=False)
+            self._stale.discard(evicted)
+            self._unchecked.discard(evicted)
+        return entry
+
+_process_graph = DerivedGraph()
+_process_graph_lock = threading.RLock()
+
+def get_derived_value(name: str, *args, form_data: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Get a derived value.
+
+    In a Streamlit session the session's graph is used (and ``form_data``
+    defaults to the session's form data); elsewhere (render workers) a graph
+    shared by the process.
+
+    Args:
+        name: Node name (see the nodes below)
+        *args: Node arguments (canopy index, section index)
+        form_data: Form data to derive from
+
+    Returns:
+        The node's value
+    """
+    graph = get_session_graph()
+    if graph is not None:
+        if form_data is None:
+            import streamlit as st
+            form_data = st.session_state.form_data
+        return graph.get(form_data, name, *args)
+
+    with _process_graph_lock:
+        return _process_graph.get(form_data or {}, name, *args)
+
+def get_session_graph() -> Optional[DerivedGraph]:
+    """The current Streamlit session's graph, or None outside a session."""
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return None
+        if SESSION_GRAPH_KEY not in st.session_state:
+            st.session_state[SESSION_GRAPH_KEY] = DerivedGraph()
+        return st.session_state[SESSION_GRAPH_KEY]
+    except Exception:
+        return None
+
+def _lookup(form_data: Dict[str, Any], path: tuple) -> Any:
+    """Value at a path of dict keys and list indexes (MISSING if absent)."""
+    value = form_data
+    for part in path:
+        if isinstance(value, dict):
+            if part not in value:
+                return MISSING
+            value = value[part]
+        elif isinstance(value, list) and isinstance(part, int) and part < len(value):
+            value = value[part]
+        else:
+            return MISSING
+    return value
+
+def _diff(new: Any, old: Any, path: tuple, changes: List[Tuple[tuple, bool]]):
+    """Collect (path, is a dict/list) of the values that differ between two shared snapshots."""
+    if new is old:
+        return
+    if isinstance(new, dict) and isinstance(old, dict):
+        for key in new.keys() | old.keys():
+            _diff(new.get(key, MISSING), old.get(key, MISSING), path + (key,), changes)
+    elif isinstance(new, list) and isinstance(old, list):
+        for i in range(max(len(new), len(old))):
+            _diff(new[i] if i < len(new) else MISSING, old[i] if i < len(old) else MISSING, path + (i,), changes)
+    else:
+        changes.append((path, isinstance(new, (dict, list)) or isinstance(old, (dict, list))))
+
+def _replace(snapshot: Any, path: tuple, value: Any) -> Any:
+    """Copy of a snapshot with the value at ``path`` replaced (copying only the containers on the path)."""
+    if not path:
+        return value
+    copied = dict(snapshot) if isinstance(snapshot, dict) else list(snapshot)
+    copied[path[0]] = _replace(copied[path[0]], path[1:], value)
+    return copied
+
+def _equal(a: Any, b: Any) -> bool:
+    """Equality that never raises."""
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+def _canopy(c: int, name: str) -> tuple:
+    return field('canopies', c, name)
+
+def _section(c: int, s: int, name: str) -> tuple:
+    return field('canopies', c, 'sections', s, name)
+
+def _section_count(form_data: Dict[str, Any], c: int) -> int:
+    canopies = form_data.get('canopies', [])
+    return len(canopies[c].get('sections', [])) if c < len(canopies) else 0
+
+def _or_default(value: Any, default: Any) -> Any:
+    """Missing values take the form's default (like ``dict.get(key, default)``)."""
+    return default if value is MISSING else value
+
+# ---------------------------------------------------------------------------
+# Nodes. Values match what the report has always shown: flowrates are kept
+# unrounded here, and rounded where they are displayed.
+# ---------------------------------------------------------------------------
+
+@node(lambda form_data, c: [_canopy(c, 'canopy_model'), _canopy(c, 'grill_size'), _canopy(c, 'slot_length'), _canopy(c, 'slot_width')])
+def free_area(canopy_model, grill_size, slot_length, slot_width) -> float:
+    """Free area (m²) of a CXW canopy's grills or a CMWF/CMWI canopy's slot; 0.0 for other models."""
+    from src.config import calculate_free_area_from_grill_size, calculate_free_area_from_slot_dimensions
+
+    try:
+        if canopy_model == 'CXW':
+            return calculate_free_area_from_grill_size(_or_default(grill_size, ''))
+        if canopy_model in ('CMWF', 'CMWI'):
+            return calculate_free_area_from_slot_dimensions(_or_default(slot_length, 0.0), _or_default(slot_width, 85.0))
+    except Exception:
+        pass
+    return 0.0
+
+@node(lambda form_data, c, s: [_canopy(c, 'canopy_model'), _section(c, s, 'extract_ksa')])
+def extract_k_factor(canopy_model, extract_ksa) -> float:
+    """K-factor of a section's extract (from the model and the section's KSA count)."""
+    try:
+        from src.config import get_k_factor
+        extract_ksa = _or_default(extract_ksa, None)
+        return get_k_factor(canopy_model, extract_ksa) if canopy_model and extract_ksa else 0.0
+    except Exception:
+        return 0.0
+
+@node(lambda form_data, c, s: [_canopy(c, 'canopy_model'), _section(c, s, 'supply_plenum_length'), derived('extract_k_factor', c, s)])
+def supply_k_factor(canopy_model, supply_plenum_length, extract_k) -> float:
+    """
+    K-factor of a section's supply.
+
+    Length-based models (CMW-F, CMW-I, KVD, KVV) use the plenum length;
+    section-based models (KVF, UVF, ...) use the extract K-factor.
+    """
+    from src.config import is_length_based_model
+
+    try:
+        length_based = is_length_based_model(canopy_model)
+    except Exception:
+        length_based = False
+    if length_based:
+        return extract_k_factor(canopy_model, _or_default(supply_plenum_length, None))
+    return extract_k
+
+@node(lambda form_data, c, s: [
+    _canopy(c, 'canopy_model'), _section(c, s, 'anemometer_reading'), _section(c, s, 'extract_tab_reading'),
+    derived('free_area', c), derived('extract_k_factor', c, s)
+])
+def extract_flowrate(canopy_model, anemometer_reading, tab_reading, area, k_factor) -> Tuple[float, float]:
+    """Extract flowrate of a section as (m³/h, m³/s): Qv = A x m/s for CXW/CMWF/CMWI, Qv = Kf x √Pa otherwise."""
+    from src.config import calculate_cxw_flowrate, calculate_cmwf_flowrate, calculate_cmwi_flowrate
+
+    anemometer_formulas = {'CXW': calculate_cxw_flowrate, 'CMWF': calculate_cmwf_flowrate, 'CMWI': calculate_cmwi_flowrate}
+    if canopy_model in anemometer_formulas:
+        anemometer_reading = _or_default(anemometer_reading, 0.0)
+        if anemometer_reading and area:
+            try:
+                return anemometer_formulas[canopy_model](area, anemometer_reading)
+            except Exception:
+                pass
+        return 0.0, 0.0
+    return _tab_flowrate(tab_reading, k_factor)
+
+@node(lambda form_data, c, s: [
+    _canopy(c, 'canopy_model'), _section(c, s, 'supply_plenum_length'), _section(c, s, 'supply_anemometer_reading'),
+    _section(c, s, 'supply_tab_reading'), derived('free_area', c), derived('supply_k_factor', c, s)
+])
+def supply_flowrate(canopy_model, supply_plenum_length, anemometer_reading, tab_reading, area, k_factor) -> Optional[Tuple[float, float]]:
+    """
+    Supply flowrate of a section as (m³/h, m³/s), or None if the section has no supply readings.
+
+    CMWF canopies measure supply with an anemometer; other supply models
+    (sections with a plenum length) use Qv = Kf x √Pa. CXW and CMWI have no supply.
+    """
+    from src.config import calculate_cmwf_flowrate
+
+    if canopy_model == 'CMWF':
+        anemometer_reading = _or_default(anemometer_reading, 0.0)
+        if anemometer_reading and area:
+            try:
+                return calculate_cmwf_flowrate(area, anemometer_reading)
+            except Exception:
+                pass
+        return 0.0, 0.0
+    if canopy_model in ('CXW', 'CMWI') or supply_plenum_length is MISSING:
+        return None
+    return _tab_flowrate(tab_reading, k_factor)
+
+def _tab_flowrate(tab_reading, k_factor) -> Tuple[float, float]:
+    """Qv = Kf x √Pa from a T.A.B. reading, as (m³/h, m³/s)."""
+    if tab_reading and k_factor:
+        try:
+            flowrate_m3h = k_factor * (float(tab_reading) ** 0.5)
+            return flowrate_m3h, flowrate_m3h / 3600
+        except Exception:
+            pass
+    return 0.0, 0.0
+
+@node(lambda form_data, c: [derived('extract_flowrate', c, s) for s in range(_section_count(form_data, c))]
+                           + [derived('supply_flowrate', c, s) for s in range(_section_count(form_data, c))],
+      shape=lambda c: [('canopies', c, 'sections')])
+def canopy_totals(*flowrates) -> Dict[str, float]:
+    """A canopy's total extract and supply flowrates (m³/s) over its sections."""
+    half = len(flowrates) // 2
+    return {
+        'extract_m3s': sum(flowrate[1] for flowrate in flowrates[:half]),
+        'supply_m3s': sum(flowrate[1] for flowrate in flowrates[half:] if flowrate),
+    }
+
+@node(lambda form_data: [
+    item for c in range(len(form_data.get('canopies', [])))
+    for item in (_canopy(c, 'drawing_number'), _canopy(c, 'canopy_model'), _canopy(c, 'design_airflow'),
+                 _canopy(c, 'supply_airflow'), derived('canopy_totals', c))
+], shape=lambda: [('canopies',)])
+def results_summary(*values) -> tuple:
+    """
+    Extract and supply results tables with totals and percentage of design.
+
+    Returns:
+        Tuple of (extract_results, supply_results, totals), as from generate_results_summary_data
+    """
+    canopies = []
+    for i in range(0, len(values), 5):
+        drawing_number, canopy_model, design_airflow, supply_airflow, totals = values[i:i + 5]
+        canopies.append({
+            'drawing_number': _or_default(drawing_number, ''),
+            'design_airflow': _or_default(design_airflow, 0.0),
+            'supply_airflow': _or_default(supply_airflow, 0.0),
+            'extract_total_flowrate_m3s': round(totals['extract_m3s'], 3),
+            'supply_total_flowrate_m3s': round(totals['supply_m3s'], 3),
+            'has_f_in_name': 'F' in _or_default(canopy_model, ''),
+        })
+    return generate_results_summary_data(canopies)
+
+def generate_results_summary_data(canopies: list) -> tuple:
+    """
+    Generate results summary data for Extract and Supply Air tables.
+    
+    Args:
+        canopies: List of processed canopy data
+        
+    Returns:
+        Tuple of (extract_results, supply_results, totals) where totals is a dict
+    """
+    extract_results = []
+    supply_results = []
+    
+    total_extract_design = 0.0
+    total_extract_actual = 0.0
+    total_supply_design = 0.0
+    total_supply_actual = 0.0
+    
+    for canopy in canopies:
+        drawing_number = canopy.get('drawing_number', '')
+        design_airflow = canopy.get('design_airflow', 0.0)
+        supply_airflow = canopy.get('supply_airflow', 0.0)
+        extract_total_flowrate = canopy.get('extract_total_flowrate_m3s', 0.0)
+        supply_total_flowrate = canopy.get('supply_total_flowrate_m3s', 0.0)
+        
+        # Calculate percentages
+        extract_percentage = (extract_total_flowrate / design_airflow * 100) if design_airflow > 0 else 0
+        supply_percentage = (supply_total_flowrate / supply_airflow * 100) if supply_airflow > 0 else 0
+        
+        # Add to extract results (without TOTAL row)
+        extract_results.append({
+            'drawing_number': drawing_number,
+            'design_flow_rate': f"{design_airflow:.2f}",
+            'actual_flowrate': f"{extract_total_flowrate:.3f}",
+            'percentage': f"{extract_percentage:.1f}%"
+        })
+        
+        # Add to supply results (only for models with supply air, without TOTAL row)
+        if canopy.get('has_f_in_name', False) and supply_airflow > 0:
+            supply_results.append({
+                'drawing_number': drawing_number,
+                'design_flow_rate': f"{supply_airflow:.2f}",
+                'actual_flowrate': f"{supply_total_flowrate:.3f}",
+                'percentage': f"{supply_percentage:.1f}%"
+            })
+        
+        # Add to totals
+        total_extract_design += design_airflow
+        total_extract_actual += extract_total_flowrate
+        if canopy.get('has_f_in_name', False):
+            total_supply_design += supply_airflow
+            total_supply_actual += supply_total_flowrate
+    
+    # Calculate total percentages
+    total_extract_percentage = (total_extract_actual / total_extract_design * 100) if total_extract_design > 0 else 0
+    total_supply_percentage = (total_supply_actual / total_supply_design * 100) if total_supply_design > 0 else 0
+    
+    # Create totals dictionary
+    totals = {
+        'extract_total_design': f"{total_extract_design:.2f}",
+        'extract_total_actual': f"{total_extract_actual:.3f}",
+        'extract_total_percentage': f"{total_extract_percentage:.1f}%",
+        'supply_total_design': f"{total_supply_design:.2f}",
+        'supply_total_actual': f"{total_supply_actual:.3f}",
+        'supply_total_percentage': f"{total_supply_percentage:.1f}%"
+    }
+    
+    return extract_results, supply_results, totals
+
+@node(lambda form_data, c: [field('canopies', c)])
+def canopy_progress(canopy) -> Tuple[int, int]:
+    """Completed and total fields of one canopy (including its sections)."""
+    from src.config import BASIC_CANOPY_FIELDS, BASIC_SECTION_FIELDS, SUPPLY_SECTION_FIELDS, MARVEL_SECTION_FIELDS, is_length_based_model
+
+    completed, total = 0, BASIC_CANOPY_FIELDS
+    for key, value in canopy.items():
+        if key == 'sections':
+            continue  # Handled below
+        elif key == 'with_marvel':
+            completed += 1  # A toggle counts as completed whether True or False
+        elif value and str(value).strip():
+            completed += 1
+
+    # Section fields, for all models except length-based ones
+    canopy_model = canopy.get('canopy_model', '')
+    num_sections = canopy.get('number_of_sections', 0)
+    if canopy_model and not is_length_based_model(canopy_model) and num_sections > 0:
+        fields_per_section = BASIC_SECTION_FIELDS
+        if 'F' in canopy_model:
+            fields_per_section += SUPPLY_SECTION_FIELDS
+        if canopy.get('with_marvel', False):
+            fields_per_section += MARVEL_SECTION_FIELDS
+        total += num_sections * fields_per_section
+
+        for section in canopy.get('sections', []):
+            completed += sum(1 for value in section.values() if value and str(value).strip())
+    return completed, total
+
+PROGRESS_BASIC_FIELDS = ['report_type', 'client_name', 'project_name', 'project_number', 'date_of_visit', 'engineer_name']
+
+def _progress_inputs(form_data: Dict[str, Any]) -> List[tuple]:
+    sources = [field(key) for key in PROGRESS_BASIC_FIELDS] + [field('edge_box')]
+    if form_data.get('report_type') == "Canopy Commissioning" and form_data.get('num_canopies', 0) > 0:
+        sources += [derived('canopy_progress', c) for c in range(len(form_data.get('canopies', [])))]
+    return sources
+
+@node(_progress_inputs, shape=lambda: [('report_type',), ('num_canopies',), ('canopies',)])
+def progress(*values) -> Tuple[float, int, int]:
+    """
+    Overall form completion.
+
+    Returns:
+        Tuple of (progress 0-1, completed fields, total fields)
+    """
+    basic_values = values[:len(PROGRESS_BASIC_FIELDS)]
+    edge_box_data = _or_default(values[len(PROGRESS_BASIC_FIELDS)], {})
+    canopies = values[len(PROGRESS_BASIC_FIELDS) + 1:]
+
+    completed = sum(1 for value in basic_values if value is not MISSING and value and str(value).strip())
+    total = len(PROGRESS_BASIC_FIELDS)
+    for canopy_completed, canopy_total in canopies:
+        completed += canopy_completed
+        total += canopy_total
+
+    # Edge box fields only count once any Edge box data is present
+    edge_fields = ['edge_installed', 'edge_id', 'edge_4g_status', 'lan_connection', 'modbus_operation']
+    if any(edge_box_data.get(key) for key in edge_fields):
+        # modbus_value is only asked for when modbus_operation is on
+        total += len(edge_fields) + (1 if edge_box_data.get('modbus_operation', False) else 0)
+        completed += sum(1 for key in edge_fields if edge_box_data.get(key))
+        if edge_box_data.get('modbus_operation', False) and edge_box_data.get('modbus_value') is not None:
+            completed += 1
+
+    return min(completed / total if total > 0 else 0, 1.0), completed, total
@@ -1,35 +1,75 @@
 import os
 import io
+import json
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, Any
 from docxtpl import DocxTemplate, InlineImage
 from docx.shared import Inches
 from src.utils.session_manager import get_form_data
+from src.utils.template_analysis import LazyContext, get_template_variables
+from src.utils.derived_values import get_derived_value, generate_results_summary_data
+from src.utils.template_engine import CacheableItem, CompiledDocxTemplate
+from src.utils.template_preprocessor import get_preprocessed_template
+from src.config import CANOPY_CONTEXT_CACHE_SIZE
 import streamlit as st
 import base64
 from PIL import Image
 
+# Per-canopy context cache: content hash -> canopy context (LRU)
+_canopy_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+_canopy_cache_lock = threading.Lock()
+
 def generate_document(template_path: str) -> bytes:
     """
     Generate a Word document from a template using form data.
     
+    Rendered by the pre-warmed render pool when it is running, otherwise in this process.
+    
     Args:
         template_path: Path to the Word template file
         
     Returns:
         bytes: Generated document as bytes
     """
+    from src.utils.render_pool import render_report
+    
+    from src.utils.photo_store import form_photo_ids, wait_for_photos
+    
     # Get all form data
     form_data = get_form_data()
     
-    # Load template
-    doc = DocxTemplate(template_path)
+    # Photos uploaded moments ago may still be processing
+    wait_for_photos(form_photo_ids(form_data), timeout=30)
+    
+    return render_report(template_path, form_data)
+
+def render_document(template_path: str, form_data: Dict[str, Any]) -> bytes:
+    """
+    Render a Word document from a template and the given form data.
+    
+    Doesn't touch session state, so it can run in a render worker process.
+    
+    Args:
+        template_path: Path to the Word template file
+        form_data: Form data to render
+        
+    Returns:
+        bytes: Generated document as bytes
+    """
+    # Render the slimmed copy of the template (built once, shared by identical templates)
+    template_path = get_preprocessed_template(template_path)
+    
+    # Load template - the patched, compiled template is cached per file
+    doc = CompiledDocxTemplate(template_path)
     
-    # Prepare context data for template
+    # Prepare context data for template - only the variables the template uses are computed
     context = prepare_template_context(form_data, doc)
     
     # Render template with context
-    doc.render(context)
+    doc.render(context.resolve(get_template_variables(template_path)))
     
     # Save to bytes
     doc_io = io.BytesIO()
@@ -38,478 +78,367 @@ def generate_document(template_path: str) -> bytes:
     
     return doc_io.getvalue()
 
-def prepare_template_context(form_data: Dict[str, Any], doc: DocxTemplate) -> Dict[str, Any]:
+def prepare_template_context(form_data: Dict[str, Any], doc: DocxTemplate) -> LazyContext:
     """
     Prepare context data for Jinja2 template rendering.
     
+    Values are computed on first access, so rendering a template that only
+    references some of the keys (see get_template_variables) skips the rest.
+    
     Args:
         form_data: Raw form data from session state
         doc: The DocxTemplate document for creating InlineImage objects
         
     Returns:
-        Dict containing organized data for template
+        LazyContext containing organized data for template
     """
-    context = {
+    from src.config import is_uv_model, is_cmw_model
+    
+    now = datetime.now()
+    canopies_data = form_data.get('canopies', [])
+    edge_box_data = form_data.get('edge_box', {})
+    
+    return LazyContext({
         # Basic information
-        'report_type': form_data.get('report_type', ''),
-        'client_name': form_data.get('client_name', ''),
-        'project_name': form_data.get('project_name', ''),
-        'project_number': form_data.get('project_number', ''),
-        'date_of_visit': form_data.get('date_of_visit', ''),
-        'engineer_name': form_data.get('engineer_name', ''),
+        'report_type': lambda ctx: form_data.get('report_type', ''),
+        'client_name': lambda ctx: form_data.get('client_name', ''),
+        'project_name': lambda ctx: form_data.get('project_name', ''),
+        'project_number': lambda ctx: form_data.get('project_number', ''),
+        'date_of_visit': lambda ctx: form_data.get('date_of_visit', ''),
+        'engineer_name': lambda ctx: form_data.get('engineer_name', ''),
         
         # Generated metadata
-        'generation_date': datetime.now().strftime('%Y-%m-%d'),
-        'generation_time': datetime.now().strftime('%H:%M:%S'),
+        'generation_date': lambda ctx: now.strftime('%Y-%m-%d'),
+        'generation_time': lambda ctx: now.strftime('%H:%M:%S'),
         
         # Canopy data
-        'num_canopies': form_data.get('num_canopies', 0),
-        'canopies': [],
-        'marvel_canopies': [],  # Canopies with Marvel Technology
-        'standard_canopies': [],  # Canopies without Marvel Technology
-        
-        # Global Marvel flag
-        'has_marvel_technology': False,  # Will be set after processing canopies
-        
-        # Global UV flag
-        'has_uv_technology': False,  # Will be set after processing canopies
-    }
+        'num_canopies': lambda ctx: form_data.get('num_canopies', 0),
+        'canopies': lambda ctx: build_canopy_contexts(form_data),
+        'marvel_canopies': lambda ctx: [canopy for canopy in ctx['canopies'] if canopy['with_marvel']],  # Canopies with Marvel Technology
+        'standard_canopies': lambda ctx: [canopy for canopy in ctx['canopies'] if not canopy['with_marvel']],  # Canopies without Marvel Technology
+        
+        # Global technology flags (from the form data, so they don't need the canopy contexts)
+        'has_marvel_technology': lambda ctx: any(canopy.get('with_marvel', False) for canopy in canopies_data),
+        'has_uv_technology': lambda ctx: any(is_uv_model(canopy.get('canopy_model', '')) for canopy in canopies_data),
+        'has_cmw_technology': lambda ctx: any(is_cmw_model(canopy.get('canopy_model', '')) for canopy in canopies_data),
+        
+        # UV and Water Wash System checklist data if the technology is present
+        'uv_checklist': lambda ctx: _get_uv_checklist_summary(ctx, form_data),
+        'water_wash_checklist': _get_water_wash_checklist_summary,
+        
+        # Results summary data (shared by the keys below)
+        '_results_summary': lambda ctx: get_derived_value('results_summary', form_data=form_data),
+        'extract_results': lambda ctx: ctx['_results_summary'][0],
+        'supply_results': lambda ctx: ctx['_results_summary'][1],
+        'extract_total_design': lambda ctx: ctx['_results_summary'][2]['extract_total_design'],
+        'extract_total_actual': lambda ctx: ctx['_results_summary'][2]['extract_total_actual'],
+        'extract_total_percentage': lambda ctx: ctx['_results_summary'][2]['extract_total_percentage'],
+        'supply_total_design': lambda ctx: ctx['_results_summary'][2]['supply_total_design'],
+        'supply_total_actual': lambda ctx: ctx['_results_summary'][2]['supply_total_actual'],
+        'supply_total_percentage': lambda ctx: ctx['_results_summary'][2]['supply_total_percentage'],
+        
+        # Design vs actual airflow charts (images)
+        'canopy_charts': lambda ctx: _create_canopy_charts(ctx, doc),  # canopy index -> chart
+        'extract_chart': lambda ctx: _create_results_chart(ctx, doc, 'extract'),
+        'supply_chart': lambda ctx: _create_results_chart(ctx, doc, 'supply'),
+        
+        # Site photos (images with captions)
+        'canopy_photos': lambda ctx: {
+            i + 1: _create_photo_images(canopy.get('photos', []), doc) for i, canopy in enumerate(canopies_data)
+        },  # canopy index -> photos
+        'edge_box_photos': lambda ctx: _create_photo_images(edge_box_data.get('photos', []), doc),
+        'has_photos': lambda ctx: any(ctx['canopy_photos'].values()) or bool(ctx['edge_box_photos']),
+        
+        # Edge box data
+        'edge_box': lambda ctx: {
+            'edge_installed': edge_box_data.get('edge_installed', False),
+            'edge_id': edge_box_data.get('edge_id', ''),
+            'edge_4g_status': edge_box_data.get('edge_4g_status', ''),
+            'lan_connection': edge_box_data.get('lan_connection', False),
+            'modbus_operation': edge_box_data.get('modbus_operation', False),
+            'modbus_value': edge_box_data.get('modbus_value', None),
+            'has_edge_data': any([
+                edge_box_data.get('edge_installed', False),
+                edge_box_data.get('edge_id', ''),
+                edge_box_data.get('edge_4g_status', ''),
+                edge_box_data.get('lan_connection', False),
+                edge_box_data.get('modbus_operation', False)
+            ])
+        },
+        
+        # Signature and notes data
+        'additional_notes': lambda ctx: form_data.get('additional_notes', ''),
+        'notes_list': lambda ctx: form_data.get('notes_list', []),
+        'has_notes': lambda ctx: len(form_data.get('notes_list', [])) > 0,
+        'signature_data': lambda ctx: form_data.get('signature_data', ''),
+        'signature_date': lambda ctx: form_data.get('signature_date', ''),
+        'print_name': lambda ctx: form_data.get('print_name', ''),
+        'has_signature': lambda ctx: form_data.get('has_signature', False),
+        'signature_image': lambda ctx: _create_signature_image(ctx, doc),
+        'signature_strokes': lambda ctx: form_data.get('signature_strokes'),
+        'signature_image_base64': _get_signature_base64,  # Keep original base64 as backup
+    })
+
+def build_canopy_contexts(form_data: Dict[str, Any]) -> list:
+    """
+    Build the per-canopy template data (sections, flowrates and checklists).
+    
+    Each canopy's context is cached by a hash of its content, so regenerating
+    a report after editing one canopy only rebuilds that canopy. The contexts
+    are ``CacheableItem``s keyed by the same hash, so the template engine and
+    the report preview also reuse each unchanged canopy's rendered block.
     
-    # Process canopy data
+    Args:
+        form_data: Raw form data from session state
+        
+    Returns:
+        List of canopy contexts (shared with the cache - treat as read-only)
+    """
+    canopies = []
     canopies_data = form_data.get('canopies', [])
     for i, canopy in enumerate(canopies_data):
-        canopy_context = {
-            'index': i + 1,
-            'drawing_number': canopy.get('drawing_number', ''),
-            'canopy_location': canopy.get('canopy_location', ''),
-            'canopy_model': canopy.get('canopy_model', ''),
-            'with_marvel': canopy.get('with_marvel', False),
-            'with_uv_checks': canopy.get('with_uv_checks', False),
-            'design_airflow': canopy.get('design_airflow', 0.0),
-            'supply_airflow': canopy.get('supply_airflow', 0.0),
-            'number_of_sections': canopy.get('number_of_sections', 0),
-            'canopy_length': canopy.get('canopy_length'),  # For length-based models
-            'grill_size': canopy.get('grill_size', ''),  # For CXW models
-            'slot_length': canopy.get('slot_length', 0.0),  # For CMWF models
-            'slot_width': canopy.get('slot_width', 85.0),  # For CMWF models
-            'is_cxw': canopy.get('canopy_model') == 'CXW',
-            'is_cmwf': canopy.get('canopy_model') == 'CMWF',
-            'is_cmwi': canopy.get('canopy_model') == 'CMWI',
-            'is_uv': False,  # Will be set below
-            'has_uv_in_name': False,  # Will be set below
-            'sections': []
-        }
-        
-        # Set UV flags for this canopy
-        canopy_model = canopy.get('canopy_model', '')
-        try:
-            from src.config import is_uv_model, has_uv_in_name, is_cmw_model, is_cmwi_model
-            canopy_context['is_uv'] = is_uv_model(canopy_model)
-            canopy_context['has_uv_in_name'] = has_uv_in_name(canopy_model)
-            canopy_context['is_cmw'] = is_cmw_model(canopy_model)
-            canopy_context['is_cmwi'] = is_cmwi_model(canopy_model)
-            canopy_context['with_water_wash_checks'] = canopy.get('with_water_wash_checks', False)
-        except:
-            canopy_context['is_cmw'] = False
-            canopy_context['is_cmwi'] = False
-            canopy_context['with_water_wash_checks'] = False
-        
-        # Add UV checklist data for this canopy if it's a UV model and UV checks are enabled
-        if canopy_context['is_uv'] and canopy_context['with_uv_checks']:
-            canopy_uv_key = f'canopy_{i}_uv_checklist'
-            canopy_uv_data = form_data.get(canopy_uv_key, {})
-            canopy_context['uv_checklist'] = get_canopy_uv_checklist_summary(canopy_uv_data)
-        else:
-            canopy_context['uv_checklist'] = None
+        cache_key = canopy_cache_key(i, canopy, form_data)
+        with _canopy_cache_lock:
+            canopy_context = _canopy_cache.get(cache_key)
+            if canopy_context is not None:
+                _canopy_cache.move_to_end(cache_key)
+        
+        if canopy_context is None:
+            canopy_context = CacheableItem(build_canopy_context(i, canopy, form_data), cache_key)
+            with _canopy_cache_lock:
+                _canopy_cache[cache_key] = canopy_context
+                while len(_canopy_cache) > CANOPY_CONTEXT_CACHE_SIZE:
+                    _canopy_cache.popitem(last=False)
+        
+        canopies.append(canopy_context)
+    
+    return canopies
+
+def canopy_cache_key(index: int, canopy: Dict[str, Any], form_data: Dict[str, Any]) -> str:
+    """Hash of everything a canopy's context is built from."""
+    from src.utils.k_factor_catalogue import get_k_factor_catalogue_version
+    
+    payload = json.dumps([
+        index,
+        canopy,
+        form_data.get(f'canopy_{index}_uv_checklist'),
+        form_data.get(f'canopy_{index}_water_wash_checklist'),
+    ], sort_keys=True, default=str)
+    # K-factors come from data/k_factors.json, which can be edited while the app runs
+    return hashlib.sha1(f"{get_k_factor_catalogue_version()}:{payload}".encode('utf-8')).hexdigest()
+
+def build_canopy_context(i: int, canopy: Dict[str, Any], form_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the template data for one canopy.
+    
+    Args:
+        i: Index of the canopy
+        canopy: Canopy dict from form_data
+        form_data: Raw form data (for the canopy's checklists)
         
-        # Add Water Wash checklist data for this canopy if it's a CMW model and Water Wash checks are enabled
-        if canopy_context['is_cmw'] and canopy_context['with_water_wash_checks']:
-            canopy_wash_key = f'canopy_{i}_water_wash_checklist'
-            canopy_wash_data = form_data.get(canopy_wash_key, {})
-            canopy_context['water_wash_checklist'] = get_canopy_water_wash_checklist_summary(canopy_wash_data)
-        else:
-            canopy_context['water_wash_checklist'] = None
-        
-        # Process section data
-        sections_data = canopy.get('sections', [])
-        extract_total_flowrate = 0.0
-        supply_total_flowrate = 0.0
-        
-        for j, section in enumerate(sections_data):
-            # Handle CXW models differently
-            if canopy.get('canopy_model') == 'CXW':
-                # CXW models use anemometer reading and calculated free area from grill size
-                anemometer_reading = section.get('anemometer_reading', 0.0)
-                
-                # Calculate free area from grill size
-                grill_size = canopy.get('grill_size', '')
-                try:
-                    from src.config import calculate_free_area_from_grill_size, calculate_cxw_flowrate
-                    free_area = calculate_free_area_from_grill_size(grill_size)
-                except:
-                    free_area = 0.0
-                
-                # Calculate flowrates using CXW formula: Qv = A x m/s
-                extract_flowrate_m3h = 0.0
-                extract_flowrate_m3s = 0.0
-                if anemometer_reading and free_area:
-                    try:
-                        extract_flowrate_m3h, extract_flowrate_m3s = calculate_cxw_flowrate(free_area, anemometer_reading)
-                        extract_total_flowrate += extract_flowrate_m3s
-                    except:
-                        pass
-                
-                section_context = {
-                    'index': j + 1,
-                    'anemometer_reading': anemometer_reading,
-                    'free_area': round(free_area, 4),
-                    'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
-                    'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
-                }
-            elif canopy.get('canopy_model') == 'CMWF':
-                # CMWF models use anemometer reading and calculated free area from slot dimensions
-                anemometer_reading = section.get('anemometer_reading', 0.0)
-                supply_anemometer_reading = section.get('supply_anemometer_reading', 0.0)
-                
-                # Calculate free area from slot dimensions
-                slot_length = canopy.get('slot_length', 0.0)
-                slot_width = canopy.get('slot_width', 85.0)
-                try:
-                    from src.config import calculate_free_area_from_slot_dimensions, calculate_cmwf_flowrate
-                    free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
-                except:
-                    free_area = 0.0
-                
-                # Calculate extract flowrates using CMWF formula: Qv = A x m/s
-                extract_flowrate_m3h = 0.0
-                extract_flowrate_m3s = 0.0
-                if anemometer_reading and free_area:
-                    try:
-                        extract_flowrate_m3h, extract_flowrate_m3s = calculate_cmwf_flowrate(free_area, anemometer_reading)
-                        extract_total_flowrate += extract_flowrate_m3s
-                    except:
-                        pass
-                
-                # Calculate supply flowrates using CMWF formula: Qv = A x m/s
-                supply_flowrate_m3h = 0.0
-                supply_flowrate_m3s = 0.0
-                if supply_anemometer_reading and free_area:
-                    try:
-                        supply_flowrate_m3h, supply_flowrate_m3s = calculate_cmwf_flowrate(free_area, supply_anemometer_reading)
-                        supply_total_flowrate += supply_flowrate_m3s
-                    except:
-                        pass
-                
-                section_context = {
-                    'index': j + 1,
-                    'anemometer_reading': anemometer_reading,
-                    'supply_anemometer_reading': supply_anemometer_reading,
-                    'free_area': round(free_area, 4),
-                    'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
-                    'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
+    Returns:
+        Canopy context dict
+    """
+    canopy_context = {
+        'index': i + 1,
+        'drawing_number': canopy.get('drawing_number', ''),
+        'canopy_location': canopy.get('canopy_location', ''),
+        'canopy_model': canopy.get('canopy_model', ''),
+        'with_marvel': canopy.get('with_marvel', False),
+        'with_uv_checks': canopy.get('with_uv_checks', False),
+        'design_airflow': canopy.get('design_airflow', 0.0),
+        'supply_airflow': canopy.get('supply_airflow', 0.0),
+        'number_of_sections': canopy.get('number_of_sections', 0),
+        'canopy_length': canopy.get('canopy_length'),  # For length-based models
+        'grill_size': canopy.get('grill_size', ''),  # For CXW models
+        'slot_length': canopy.get('slot_length', 0.0),  # For CMWF models
+        'slot_width': canopy.get('slot_width', 85.0),  # For CMWF models
+        'is_cxw': canopy.get('canopy_model') == 'CXW',
+        'is_cmwf': canopy.get('canopy_model') == 'CMWF',
+        'is_cmwi': canopy.get('canopy_model') == 'CMWI',
+        'is_uv': False,  # Will be set below
+        'has_uv_in_name': False,  # Will be set below
+        'sections': []
+    }
+    
+    # Set UV flags for this canopy
+    canopy_model = canopy.get('canopy_model', '')
+    try:
+        from src.config import is_uv_model, has_uv_in_name, is_cmw_model, is_cmwi_model
+        canopy_context['is_uv'] = is_uv_model(canopy_model)
+        canopy_context['has_uv_in_name'] = has_uv_in_name(canopy_model)
+        canopy_context['is_cmw'] = is_cmw_model(canopy_model)
+        canopy_context['is_cmwi'] = is_cmwi_model(canopy_model)
+        canopy_context['with_water_wash_checks'] = canopy.get('with_water_wash_checks', False)
+    except:
+        canopy_context['is_cmw'] = False
+        canopy_context['is_cmwi'] = False
+        canopy_context['with_water_wash_checks'] = False
+    
+    # Add UV checklist data for this canopy if it's a UV model and UV checks are enabled
+    if canopy_context['is_uv'] and canopy_context['with_uv_checks']:
+        canopy_uv_key = f'canopy_{i}_uv_checklist'
+        canopy_uv_data = form_data.get(canopy_uv_key, {})
+        canopy_context['uv_checklist'] = get_canopy_uv_checklist_summary(canopy_uv_data)
+    else:
+        canopy_context['uv_checklist'] = None
+    
+    # Add Water Wash checklist data for this canopy if it's a CMW model and Water Wash checks are enabled
+    if canopy_context['is_cmw'] and canopy_context['with_water_wash_checks']:
+        canopy_wash_key = f'canopy_{i}_water_wash_checklist'
+        canopy_wash_data = form_data.get(canopy_wash_key, {})
+        canopy_context['water_wash_checklist'] = get_canopy_water_wash_checklist_summary(canopy_wash_data)
+    else:
+        canopy_context['water_wash_checklist'] = None
+    
+    # Process section data (computed values come from the derived values graph)
+    sections_data = canopy.get('sections', [])
+    canopy_model = canopy.get('canopy_model')
+    free_area = get_derived_value('free_area', i, form_data=form_data)
+    
+    for j, section in enumerate(sections_data):
+        extract_flowrate_m3h, extract_flowrate_m3s = get_derived_value('extract_flowrate', i, j, form_data=form_data)
+        
+        if canopy_model in ('CXW', 'CMWF', 'CMWI'):
+            # Anemometer models: free area from the grill size (CXW) or slot dimensions (CMWF/CMWI), Qv = A x m/s
+            section_context = {'index': j + 1, 'anemometer_reading': section.get('anemometer_reading', 0.0)}
+            if canopy_model == 'CMWF':
+                section_context['supply_anemometer_reading'] = section.get('supply_anemometer_reading', 0.0)
+            section_context.update({
+                'free_area': round(free_area, 4),
+                'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
+                'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
+            })
+            if canopy_model == 'CMWF':
+                # CMWF also measures supply with the anemometer
+                supply_flowrate_m3h, supply_flowrate_m3s = get_derived_value('supply_flowrate', i, j, form_data=form_data)
+                section_context.update({
                     'supply_flowrate_m3h': round(supply_flowrate_m3h, 2),
                     'supply_flowrate_m3s': round(supply_flowrate_m3s, 3),
-                }
-            elif canopy.get('canopy_model') == 'CMWI':
-                # CMWI models use anemometer reading and calculated free area from slot dimensions (extract only)
-                anemometer_reading = section.get('anemometer_reading', 0.0)
-                
-                # Calculate free area from slot dimensions
-                slot_length = canopy.get('slot_length', 0.0)
-                slot_width = canopy.get('slot_width', 85.0)
-                try:
-                    from src.config import calculate_free_area_from_slot_dimensions, calculate_cmwi_flowrate
-                    free_area = calculate_free_area_from_slot_dimensions(slot_length, slot_width)
-                except:
-                    free_area = 0.0
-                
-                # Calculate extract flowrates using CMWI formula: Qv = A x m/s
-                extract_flowrate_m3h = 0.0
-                extract_flowrate_m3s = 0.0
-                if anemometer_reading and free_area:
-                    try:
-                        extract_flowrate_m3h, extract_flowrate_m3s = calculate_cmwi_flowrate(free_area, anemometer_reading)
-                        extract_total_flowrate += extract_flowrate_m3s
-                    except:
-                        pass
-                
-                section_context = {
-                    'index': j + 1,
-                    'anemometer_reading': anemometer_reading,
-                    'free_area': round(free_area, 4),
-                    'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
-                    'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
-                }
-            else:
-                # Standard models use K-factor calculation
-                extract_k_factor = get_k_factor_for_section(canopy.get('canopy_model'), section.get('extract_ksa'))
-                
-                # Calculate extract flowrates
-                extract_flowrate_m3h = 0.0
-                extract_flowrate_m3s = 0.0
-                if section.get('extract_tab_reading') and extract_k_factor:
-                    try:
-                        tab_value = float(section.get('extract_tab_reading'))
-                        extract_flowrate_m3h = extract_k_factor * (tab_value ** 0.5)
-                        extract_flowrate_m3s = extract_flowrate_m3h / 3600
-                        extract_total_flowrate += extract_flowrate_m3s
-                    except:
-                        pass
-                
-                section_context = {
-                    'index': j + 1,
-                    'extract_ksa': section.get('extract_ksa'),
-                    'extract_tab_reading': section.get('extract_tab_reading', ''),
-                    'extract_k_factor': extract_k_factor,
-                    'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
-                    'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
-                }
+                })
+        else:
+            # Standard models use K-factor calculation
+            section_context = {
+                'index': j + 1,
+                'extract_ksa': section.get('extract_ksa'),
+                'extract_tab_reading': section.get('extract_tab_reading', ''),
+                'extract_k_factor': get_derived_value('extract_k_factor', i, j, form_data=form_data),
+                'extract_flowrate_m3h': round(extract_flowrate_m3h, 2),
+                'extract_flowrate_m3s': round(extract_flowrate_m3s, 3),
+            }
             
-            # Add supply fields if present (for models with 'F' in name, but not CXW, CMWF, or CMWI)
-            if 'supply_plenum_length' in section and canopy.get('canopy_model') not in ['CXW', 'CMWF', 'CMWI']:
-                # For supply air K-factor calculation:
-                # - Length-based models (CMW-F, CMW-I, KVD, KVV): use plenum length
-                # - Section-based models (KVF, UVF, etc.): use same K-factor as extract (based on KSAs)
-                canopy_model = canopy.get('canopy_model', '')
-                if is_length_based_model_for_supply(canopy_model):
-                    supply_k_factor = get_k_factor_for_section(canopy_model, section.get('supply_plenum_length'))
-                else:
-                    # For section-based models, use the same K-factor as extract air
-                    supply_k_factor = extract_k_factor
-                
-                # Calculate supply flowrates
-                supply_flowrate_m3h = 0.0
-                supply_flowrate_m3s = 0.0
-                if section.get('supply_tab_reading') and supply_k_factor:
-                    try:
-                        tab_value = float(section.get('supply_tab_reading'))
-                        supply_flowrate_m3h = supply_k_factor * (tab_value ** 0.5)
-                        supply_flowrate_m3s = supply_flowrate_m3h / 3600
-                        supply_total_flowrate += supply_flowrate_m3s
-                    except:
-                        pass
-                
+            # Add supply fields if present (for models with 'F' in name)
+            supply_flowrate = get_derived_value('supply_flowrate', i, j, form_data=form_data)
+            if supply_flowrate is not None:
+                supply_flowrate_m3h, supply_flowrate_m3s = supply_flowrate
                 section_context.update({
                     'supply_plenum_length': section.get('supply_plenum_length'),
                     'supply_tab_reading': section.get('supply_tab_reading', ''),
-                    'supply_k_factor': supply_k_factor,
+                    'supply_k_factor': get_derived_value('supply_k_factor', i, j, form_data=form_data),
                     'supply_flowrate_m3h': round(supply_flowrate_m3h, 2),
                     'supply_flowrate_m3s': round(supply_flowrate_m3s, 3),
                 })
-            
-            # Add Marvel fields if applicable
-            if canopy.get('with_marvel', False):
-                section_context.update({
-                    'min_percent': section.get('min_percent', 0.0),
-                    'idle_percent': section.get('idle_percent', 0.0),
-                    'design_m3s': section.get('design_m3s', 0.0),
-                })
-            
-            canopy_context['sections'].append(section_context)
-        
-        # Add total flowrates to canopy context
-        canopy_context.update({
-            'extract_total_flowrate_m3s': round(extract_total_flowrate, 3),
-            'supply_total_flowrate_m3s': round(supply_total_flowrate, 3),
-            'has_f_in_name': 'F' in canopy.get('canopy_model', '')
-        })
-        
-        context['canopies'].append(canopy_context)
         
-        # Also add to Marvel or Standard canopy lists
+        # Add Marvel fields if applicable
         if canopy.get('with_marvel', False):
-            context['marvel_canopies'].append(canopy_context)
-        else:
-            context['standard_canopies'].append(canopy_context)
-    
-    # Set global Marvel flag based on whether any canopies have Marvel technology
-    context['has_marvel_technology'] = len(context['marvel_canopies']) > 0
-    
-    # Set global UV flag based on whether any canopies have UV technology
-    context['has_uv_technology'] = any(canopy.get('is_uv', False) for canopy in context['canopies'])
-    
-    # Add UV checklist data if UV technology is present
-    if context['has_uv_technology']:
-        try:
-            from src.components.uv_checklist import get_uv_checklist_summary
-            context['uv_checklist'] = get_uv_checklist_summary()
-        except:
-            context['uv_checklist'] = None
-    else:
-        context['uv_checklist'] = None
-    
-    # Set global CMW flag based on whether any canopies have CMW technology
-    context['has_cmw_technology'] = any(canopy.get('is_cmw', False) for canopy in context['canopies'])
-    
-    # Add Water Wash System checklist data if CMW technology is present
-    if context['has_cmw_technology']:
-        try:
-            from src.components.water_wash_checklist import get_water_wash_checklist_summary
-            context['water_wash_checklist'] = get_water_wash_checklist_summary()
-        except:
-            context['water_wash_checklist'] = None
-    else:
-        context['water_wash_checklist'] = None
-    
-    # Generate results summary data
-    extract_results, supply_results, totals = generate_results_summary_data(context['canopies'])
-    context['extract_results'] = extract_results
-    context['supply_results'] = supply_results
-    context['extract_total_design'] = totals['extract_total_design']
-    context['extract_total_actual'] = totals['extract_total_actual']
-    context['extract_total_percentage'] = totals['extract_total_percentage']
-    context['supply_total_design'] = totals['supply_total_design']
-    context['supply_total_actual'] = totals['supply_total_actual']
-    context['supply_total_percentage'] = totals['supply_total_percentage']
-    
-    # Add Edge box data
-    edge_box_data = form_data.get('edge_box', {})
-    context['edge_box'] = {
-        'edge_installed': edge_box_data.get('edge_installed', False),
-        'edge_id': edge_box_data.get('edge_id', ''),
-        'edge_4g_status': edge_box_data.get('edge_4g_status', ''),
-        'lan_connection': edge_box_data.get('lan_connection', False),
-        'modbus_operation': edge_box_data.get('modbus_operation', False),
-        'modbus_value': edge_box_data.get('modbus_value', None),
-        'has_edge_data': any([
-            edge_box_data.get('edge_installed', False),
-            edge_box_data.get('edge_id', ''),
-            edge_box_data.get('edge_4g_status', ''),
-            edge_box_data.get('lan_connection', False),
-            edge_box_data.get('modbus_operation', False)
-        ])
-    }
-    
-    # Add signature and notes data
-    context['additional_notes'] = form_data.get('additional_notes', '')
-    context['notes_list'] = form_data.get('notes_list', [])
-    context['has_notes'] = len(form_data.get('notes_list', [])) > 0
-    context['signature_data'] = form_data.get('signature_data', '')
-    context['signature_date'] = form_data.get('signature_date', '')
-    context['print_name'] = form_data.get('print_name', '')
-    context['has_signature'] = form_data.get('has_signature', False)
-    
-    # Process signature for template if available
-    if context['has_signature']:
-        try:
-            signature_image = create_signature_inline_image_with_doc(context['signature_data'], doc)
-            if signature_image:
-                context['signature_image'] = signature_image
-                context['signature_image_base64'] = context['signature_data']  # Keep original base64 as backup
-            else:
-                context['signature_image'] = None
-                context['signature_image_base64'] = ''
-        except Exception as e:
-            st.error(f"Error processing signature for template: {e}")
-            context['signature_image'] = None
-            context['signature_image_base64'] = ''
-    else:
-        context['signature_image'] = None
-        context['signature_image_base64'] = ''
-    
-    return context
-
-def generate_results_summary_data(canopies: list) -> tuple:
-    """
-    Generate results summary data for Extract and Supply Air tables.
-    
-    Args:
-        canopies: List of processed canopy data
-        
-    Returns:
-        Tuple of (extract_results, supply_results, totals) where totals is a dict
-    """
-    extract_results = []
-    supply_results = []
-    
-    total_extract_design = 0.0
-    total_extract_actual = 0.0
-    total_supply_design = 0.0
-    total_supply_actual = 0.0
-    
-    for canopy in canopies:
-        drawing_number = canopy.get('drawing_number', '')
-        design_airflow = canopy.get('design_airflow', 0.0)
-        supply_airflow = canopy.get('supply_airflow', 0.0)
-        extract_total_flowrate = canopy.get('extract_total_flowrate_m3s', 0.0)
-        supply_total_flowrate = canopy.get('supply_total_flowrate_m3s', 0.0)
-        
-        # Calculate percentages
-        extract_percentage = (extract_total_flowrate / design_airflow * 100) if design_airflow > 0 else 0
-        supply_percentage = (supply_total_flowrate / supply_airflow * 100) if supply_airflow > 0 else 0
-        
-        # Add to extract results (without TOTAL row)
-        extract_results.append({
-            'drawing_number': drawing_number,
-            'design_flow_rate': f"{design_airflow:.2f}",
-            'actual_flowrate': f"{extract_total_flowrate:.3f}",
-            'percentage': f"{extract_percentage:.1f}%"
-        })
-        
-        # Add to supply results (only for models with supply air, without TOTAL row)
-        if canopy.get('has_f_in_name', False) and supply_airflow > 0:
-            supply_results.append({
-                'drawing_number': drawing_number,
-                'design_flow_rate': f"{supply_airflow:.2f}",
-                'actual_flowrate': f"{supply_total_flowrate:.3f}",
-                'percentage': f"{supply_percentage:.1f}%"
+            section_context.update({
+                'min_percent': section.get('min_percent', 0.0),
+                'idle_percent': section.get('idle_percent', 0.0),
+                'design_m3s': section.get('design_m3s', 0.0),
             })
         
-        # Add to totals
-        total_extract_design += design_airflow
-        total_extract_actual += extract_total_flowrate
-        if canopy.get('has_f_in_name', False):
-            total_supply_design += supply_airflow
-            total_supply_actual += supply_total_flowrate
-    
-    # Calculate total percentages
-    total_extract_percentage = (total_extract_actual / total_extract_design * 100) if total_extract_design > 0 else 0
-    total_supply_percentage = (total_supply_actual / total_supply_design * 100) if total_supply_design > 0 else 0
-    
-    # Create totals dictionary
-    totals = {
-        'extract_total_design': f"{total_extract_design:.2f}",
-        'extract_total_actual': f"{total_extract_actual:.3f}",
-        'extract_total_percentage': f"{total_extract_percentage:.1f}%",
-        'supply_total_design': f"{total_supply_design:.2f}",
-        'supply_total_actual': f"{total_supply_actual:.3f}",
-        'supply_total_percentage': f"{total_supply_percentage:.1f}%"
-    }
+        canopy_context['sections'].append(section_context)
     
-    return extract_results, supply_results, totals
-
-def get_k_factor_for_section(canopy_model: str, selected_ksa: int) -> float:
-    """
-    Get K-factor for a section (helper function for template context).
+    # Add total flowrates to canopy context
+    totals = get_derived_value('canopy_totals', i, form_data=form_data)
+    canopy_context.update({
+        'extract_total_flowrate_m3s': round(totals['extract_m3s'], 3),
+        'supply_total_flowrate_m3s': round(totals['supply_m3s'], 3),
+        'has_f_in_name': 'F' in canopy.get('canopy_model', '')
+    })
     
-    Args:
-        canopy_model: The canopy model
-        selected_ksa: Selected KSA count
-        
-    Returns:
-        K-factor value
-    """
+    return canopy_context
+
+def _get_uv_checklist_summary(context: LazyContext, form_data: Dict[str, Any]):
+    """Job-wide UV checklist summary if UV technology is present."""
+    if not context['has_uv_technology']:
+        return None
     try:
-        from src.config import get_k_factor
-        return get_k_factor(canopy_model, selected_ksa) if canopy_model and selected_ksa else 0.0
+        from src.components.uv_checklist import get_uv_checklist_summary
+        return get_uv_checklist_summary(form_data)
     except:
-        return 0.0
+        return None
 
-def is_length_based_model_for_supply(canopy_model: str) -> bool:
-    """
-    Check if a canopy model uses length-based K-factors for supply air.
-    
-    Args:
-        canopy_model: The canopy model
-        
-    Returns:
-        True if model uses length-based K-factors for supply
-    """
+def _get_water_wash_checklist_summary(context: LazyContext):
+    """Job-wide Water Wash System checklist summary if CMW technology is present."""
+    if not context['has_cmw_technology']:
+        return None
     try:
-        from src.config import is_length_based_model
-        return is_length_based_model(canopy_model)
+        from src.components.water_wash_checklist import get_water_wash_checklist_summary
+        return get_water_wash_checklist_summary()
     except:
-        return False
+        return None
+
+def _create_signature_image(context: LazyContext, doc: DocxTemplate):
+    """Create the signature InlineImage for the template, or None if there is no signature."""
+    if not context['has_signature']:
+        return None
+    try:
+        if context['signature_strokes']:
+            from src.utils.signature_vector import rasterize_signature
+            png, width_inches, height_inches = rasterize_signature(context['signature_strokes'])
+            return InlineImage(doc, io.BytesIO(png), width=Inches(width_inches), height=Inches(height_inches))
+        
+        # Raster signature saved by an older version
+        return create_signature_inline_image_with_doc(context['signature_data'], doc) or None
+    except Exception as e:
+        st.error(f"Error processing signature for template: {e}")
+        return None
+
+def _create_canopy_charts(context: LazyContext, doc: DocxTemplate) -> Dict[int, InlineImage]:
+    """Design vs actual chart per canopy, keyed by canopy index (charts are drawn in parallel)."""
+    from src.utils.airflow_charts import canopy_chart_spec, request_charts
+    from src.config import CHART_WIDTH_INCHES
+    
+    canopies = context['canopies']
+    futures = request_charts([canopy_chart_spec(canopy) for canopy in canopies])
+    return {
+        canopy['index']: InlineImage(doc, io.BytesIO(future.result()), width=Inches(CHART_WIDTH_INCHES))
+        for canopy, future in zip(canopies, futures)
+    }
+
+def _create_results_chart(context: LazyContext, doc: DocxTemplate, air: str):
+    """Design vs actual chart of the extract or supply results, or None if there are no results."""
+    from src.utils.airflow_charts import results_chart_spec, get_chart
+    from src.config import CHART_WIDTH_INCHES
+    
+    results = context[f'{air}_results']
+    if not results:
+        return None
+    spec = results_chart_spec(f"{air.capitalize()} Air - Design vs Actual", results,
+                              context[f'{air}_total_design'], context[f'{air}_total_actual'])
+    return InlineImage(doc, io.BytesIO(get_chart(spec)), width=Inches(CHART_WIDTH_INCHES))
+
+def _get_signature_base64(context: LazyContext) -> str:
+    """The signature as a base64 PNG ('' if there is none)."""
+    if not context['signature_image']:
+        return ''
+    if context['signature_strokes']:
+        from src.utils.signature_vector import rasterize_signature
+        return base64.b64encode(rasterize_signature(context['signature_strokes'])[0]).decode()
+    return context['signature_data']
+
+def _create_photo_images(photos: list, doc: DocxTemplate) -> list:
+    """Report images of processed photos, as [{'image': InlineImage, 'caption': str}] (unprocessed photos are left out)."""
+    from src.utils.photo_store import get_photo_path
+    from src.config import PHOTO_WIDTH_INCHES
+    
+    images = []
+    for photo in photos:
+        path = get_photo_path(photo['id'])
+        if path:
+            images.append({'image': InlineImage(doc, path, width=Inches(PHOTO_WIDTH_INCHES)), 'caption': photo.get('caption', '')})
+    return images
 
 def generate_filename(form_data: Dict[str, Any]) -> str:
     """
@@ -0,0 +1,185 @@
+"""
+Undo/redo history of form data with structurally shared snapshots.
+
+Each step of the history is a snapshot of the whole form data, but snapshots
+share every subtree that didn't change with the step before: recording a new
+snapshot walks the form data next to the previous snapshot and reuses the
+previous snapshot's dicts, lists and values wherever they are equal. Editing
+one T.A.B. reading therefore only adds new copies of the dicts/lists on the
+path to that reading (form data -> canopies -> canopy -> sections -> section),
+not a deep copy of the job.
+
+Snapshots are never modified; ``thaw_snapshot()`` makes the mutable copy that
+is put back into the session when a step is undone or redone.
+
+The history is bounded by a number of steps and by the memory the steps add on
+top of the oldest one (``FORM_HISTORY_STEPS``, ``FORM_HISTORY_MAX_BYTES``).
+"""
+import copy
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import FORM_HISTORY_STEPS, FORM_HISTORY_MAX_BYTES
+
+# Values that can be shared between snapshots and the live form data as they are
+IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None), tuple, frozenset)
+
+def share_snapshot(value: Any, previous: Any) -> Tuple[Any, int]:
+    """
+    Snapshot a value, sharing everything that is unchanged with the previous snapshot.
+
+    Args:
+        value: Live value (e.g. the form data)
+        previous: Snapshot of the value's previous version (anything if there is none)
+
+    Returns:
+        Tuple of (snapshot, approximate bytes of the objects not shared with ``previous``).
+        The snapshot is ``previous`` itself if nothing changed.
+    """
+    if isinstance(value, dict):
+        old = previous if isinstance(previous, dict) else {}
+        snapshot, added = {}, 0
+        for key, item in value.items():
+            snapshot[key], item_bytes = share_snapshot(item, old.get(key, _NOTHING))
+            added += item_bytes
+        if snapshot.keys() == old.keys() and isinstance(previous, dict) \
+                and all(snapshot[key] is old[key] for key in snapshot):
+            return previous, 0
+        return snapshot, added + sys.getsizeof(snapshot)
+
+    if isinstance(value, list):
+        old = previous if isinstance(previous, list) else []
+        snapshot, added = [], 0
+        for i, item in enumerate(value):
+            item_snapshot, item_bytes = share_snapshot(item, old[i] if i < len(old) else _NOTHING)
+            snapshot.append(item_snapshot)
+            added += item_bytes
+        if len(snapshot) == len(old) and isinstance(previous, list) \
+                and all(a is b for a, b in zip(snapshot, old)):
+            return previous, 0
+        return snapshot, added + sys.getsizeof(snapshot)
+
+    if value is previous or (type(value) is type(previous) and _equal(value, previous)):
+        return previous, 0
+    if isinstance(value, IMMUTABLE_TYPES):
+        return value, sys.getsizeof(value)
+    snapshot = copy.deepcopy(value)  # dates, DataFrames, ... - anything that could be changed in place
+    return snapshot, sys.getsizeof(snapshot)
+
+def thaw_snapshot(snapshot: Any) -> Any:
+    """Mutable copy of a snapshot, to put back into the session."""
+    return copy.deepcopy(snapshot)
+
+def changed_keys(snapshot: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> List[str]:
+    """Top-level form data keys whose snapshot differs between two steps."""
+    previous = previous or {}
+    return sorted(str(key) for key in snapshot.keys() | previous.keys()
+                  if snapshot.get(key, _NOTHING) is not previous.get(key, _NOTHING))
+
+class FormHistory:
+    """
+    Bounded undo/redo history of form data snapshots.
+
+    ``steps[index]`` is the snapshot of the current form data; steps before it
+    can be undone and steps after it redone. Recording a change drops the
+    steps that could be redone.
+    """
+
+    def __init__(self, max_steps: int = FORM_HISTORY_STEPS, max_bytes: int = FORM_HISTORY_MAX_BYTES):
+        self.max_steps = max(1, max_steps)
+        self.max_bytes = max_bytes
+        self.steps: List[Dict[str, Any]] = []  # {'snapshot', 'bytes' (added over the previous step), 'keys' (changed)}
+        self.index = -1
+        self.restored = False
+
+    def record(self, form_data: Dict[str, Any]) -> bool:
+        """
+        Record the current form data as a new step if it changed.
+
+        The first record after an undo or redo updates the restored step instead
+        of adding one, so the form re-initialising itself from the restored data
+        doesn't drop the steps that can still be redone.
+
+        Args:
+            form_data: Current form data
+
+        Returns:
+            True if a step was added or updated
+        """
+        current = self.steps[self.index]['snapshot'] if self.steps else _NOTHING
+        snapshot, added = share_snapshot(form_data, current)
+        restored, self.restored = self.restored, False
+        if snapshot is current:
+            return False
+
+        if restored:
+            step = self.steps[self.index]
+            step['snapshot'], step['bytes'] = snapshot, step['bytes'] + added
+            return True
+
+        previous = current if self.steps else None
+        del self.steps[self.index + 1:]
+        self.steps.append({'snapshot': snapshot, 'bytes': added, 'keys': changed_keys(snapshot, previous)})
+        self.index = len(self.steps) - 1
+        self._trim()
+        return True
+
+    def undo(self) -> Optional[Dict[str, Any]]:
+        """Step back; returns the form data to restore (a mutable copy), or None if there is nothing to undo."""
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        self.restored = True
+        return thaw_snapshot(self.steps[self.index]['snapshot'])
+
+    def redo(self) -> Optional[Dict[str, Any]]:
+        """Step forward again; returns the form data to restore, or None if there is nothing to redo."""
+        if not self.can_redo():
+            return None
+        self.index += 1
+        self.restored = True
+        return thaw_snapshot(self.steps[self.index]['snapshot'])
+
+    def can_undo(self) -> bool:
+        return self.index > 0
+
+    def can_redo(self) -> bool:
+        return self.index < len(self.steps) - 1
+
+    def undo_keys(self) -> List[str]:
+        """Top-level form data keys changed by the step that would be undone."""
+        return self.steps[self.index]['keys'] if self.can_undo() else []
+
+    def redo_keys(self) -> List[str]:
+        """Top-level form data keys changed by the step that would be redone."""
+        return self.steps[self.index + 1]['keys'] if self.can_redo() else []
+
+    def history_bytes(self) -> int:
+        """Approximate memory of all steps beyond the oldest one (which shares most of its data with the rest)."""
+        return sum(step['bytes'] for step in self.steps[1:])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Steps, position and memory of the history (for the UI and debug panels)."""
+        return {
+            'steps': len(self.steps),
+            'undo_steps': max(0, self.index),
+            'redo_steps': len(self.steps) - 1 - self.index if self.steps else 0,
+            'bytes': self.history_bytes(),
+        }
+
+    def _trim(self):
+        """Drop the oldest steps while over the step or memory limit."""
+        while len(self.steps) > 1 and (len(self.steps) > self.max_steps or
+                                       (self.max_bytes and self.history_bytes() > self.max_bytes)):
+            self.steps.pop(0)
+            self.index -= 1
+
+# Marks "no previous value" (distinct from None, which is a form value)
+_NOTHING = object()
+
+def _equal(a: Any, b: Any) -> bool:
+    """Equality that never raises (e.g. for values that compare element-wise)."""
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
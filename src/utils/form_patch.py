@@ -0,0 +1,263 @@
+"""
+Compact JSON patches of form data.
+
+Office pre-fill and technician completion sync through the job store by
+exchanging only what changed. A patch is a list of operations in the spirit of
+RFC 6902, written as short lists instead of objects to keep payloads small:
+
+    ["replace", "/canopies/3/sections/1/extract_tab_reading", 42.0]
+    ["add", "/canopies/-", {...}]       # append to a list
+    ["remove", "/canopies/19"]
+
+Paths are JSON pointers (RFC 6901). ``diff_form_data()`` produces a patch
+between two versions of the form data, ``apply_patch()`` applies one, and
+``merge_form_data()`` rebases local edits onto remote changes. Everything is
+deterministic, so both sides of a sync reach the same result.
+"""
+import copy
+import json
+from typing import Any, Dict, List, Tuple
+
+Patch = List[list]
+
+class PatchError(ValueError):
+    """A patch operation doesn't fit the document it is applied to."""
+
+def normalize_form_data(form_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Form data as stored in the job store (JSON types only, dates as strings)."""
+    return json.loads(json.dumps(form_data, default=str))
+
+def encode_patch(patch: Patch) -> str:
+    """Patch as compact JSON."""
+    return json.dumps(patch, separators=(',', ':'), default=str)
+
+def diff_form_data(old: Any, new: Any, path: str = '') -> Patch:
+    """
+    Patch that turns ``old`` into ``new``.
+
+    Dicts are compared key by key (in sorted order) and lists item by item, so
+    an edit to one section reading is a single small operation. Lists that grow
+    get "add" operations for the new items, lists that shrink get "remove"
+    operations from the end.
+
+    Args:
+        old: Previous (normalized) form data
+        new: Current (normalized) form data
+        path: JSON pointer of the values being compared (for recursion)
+
+    Returns:
+        Patch (empty if nothing changed)
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = []
+        for key in sorted(old.keys() | new.keys()):
+            child = f"{path}/{escape_pointer(key)}"
+            if key not in new:
+                patch.append(['remove', child])
+            elif key not in old:
+                patch.append(['add', child, new[key]])
+            else:
+                patch += diff_form_data(old[key], new[key], child)
+        return patch
+
+    if isinstance(old, list) and isinstance(new, list):
+        patch = []
+        for i in range(min(len(old), len(new))):
+            patch += diff_form_data(old[i], new[i], f"{path}/{i}")
+        patch += [['add', f"{path}/-", item] for item in new[len(old):]]
+        patch += [['remove', f"{path}/{i}"] for i in range(len(old) - 1, len(new) - 1, -1)]
+        return patch
+
+    if old == new and type(old) is type(new):
+        return []
+    return [['replace', path, new]]
+
+def apply_patch(document: Any, patch: Patch, lenient: bool = False) -> Tuple[Any, Patch]:
+    """
+    Apply a patch to a copy of a document.
+
+    Args:
+        document: Form data (not modified)
+        patch: Patch to apply
+        lenient: Skip operations that don't fit the document instead of raising
+            (used when rebasing local edits onto remote changes)
+
+    Returns:
+        Tuple of (patched document, skipped operations)
+
+    Raises:
+        PatchError: If an operation doesn't fit and ``lenient`` is False
+    """
+    document = copy.deepcopy(document)
+    skipped = []
+    for operation in patch:
+        try:
+            document = _apply_operation(document, operation)
+        except PatchError:
+            if not lenient:
+                raise
+            skipped.append(operation)
+    return document, skipped
+
+def merge_form_data(base: Dict[str, Any], local: Dict[str, Any], remote_patch: Patch) -> Tuple[Dict[str, Any], Dict[str, Any], Patch]:
+    """
+    Merge remote changes into locally edited form data.
+
+    The remote patch is applied to the last synced version (``base``), then
+    the local edits since ``base`` are replayed on top. Edits to different
+    paths both survive; where both sides changed the same value the local
+    edit wins, and local edits whose target was removed remotely are dropped.
+
+    Items both sides appended to the same list are paired by position and
+    merged into one (see ``merge_new_items``) - two sides adding "the next
+    canopy" mean the same canopy, not two.
+
+    Args:
+        base: Form data as of the last sync (normalized)
+        local: Current local form data (normalized)
+        remote_patch: Changes made elsewhere since ``base``
+
+    Returns:
+        Tuple of (merged form data, new base, remote operations that were applied
+        and not overridden by local edits)
+    """
+    new_base, _ = apply_patch(base, remote_patch)
+    local_patch, paired = _pair_concurrent_appends(base, new_base, diff_form_data(base, local))
+    merged, _ = apply_patch(new_base, local_patch, lenient=True)
+
+    local_paths = {operation[1] for operation in local_patch}
+    visible = [operation for operation in remote_patch if operation[1] not in local_paths]
+    visible += paired  # Paired items now hold remote values too
+    return merged, new_base, visible
+
+def merge_new_items(remote: Any, local: Any) -> Any:
+    """
+    Merge two items that were appended to the same list position on both sides.
+
+    Dicts are merged key by key and lists item by item. Of two different
+    values, a filled-in one wins over an empty one (None, '', 0, False, [],
+    {}), and the local one wins if both are filled in, so a blank item added
+    on one side doesn't wipe out the data entered on the other.
+
+    Args:
+        remote: Item appended remotely
+        local: Item appended locally
+
+    Returns:
+        The merged item
+    """
+    if isinstance(remote, dict) and isinstance(local, dict):
+        return {
+            key: merge_new_items(remote[key], local[key]) if key in remote and key in local
+            else local.get(key, remote.get(key))
+            for key in {**remote, **local}
+        }
+    if isinstance(remote, list) and isinstance(local, list):
+        longer = local if len(local) >= len(remote) else remote
+        return [merge_new_items(a, b) for a, b in zip(remote, local)] + copy.deepcopy(longer[min(len(remote), len(local)):])
+    return copy.deepcopy(local if local or not remote else remote)
+
+def escape_pointer(key: Any) -> str:
+    """Escape a dict key for use in a JSON pointer."""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+def split_pointer(path: str) -> List[str]:
+    """Split a JSON pointer into unescaped tokens ('' is the whole document)."""
+    if not path:
+        return []
+    if not path.startswith('/'):
+        raise PatchError(f"Invalid path: {path!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+def _pair_concurrent_appends(base: Any, new_base: Any, local_patch: Patch) -> Tuple[Patch, Patch]:
+    """
+    Turn local appends to lists that also grew remotely into merges with the remote items.
+
+    The n-th item appended locally to a list is paired with the n-th item the
+    remote changes added after the end of the ``base`` list; its "add" becomes
+    a "replace" of that item with both merged. Local appends beyond the remote
+    ones stay appends.
+
+    Returns:
+        Tuple of (local patch to replay, the "replace" operations of the paired items)
+    """
+    appends: Dict[str, List[int]] = {}  # list path -> positions of its local appends in the patch
+    for position, operation in enumerate(local_patch):
+        if operation[0] == 'add' and operation[1].endswith('/-'):
+            appends.setdefault(operation[1][:-2], []).append(position)
+
+    local_patch, paired = list(local_patch), []
+    for path, positions in appends.items():
+        try:
+            old, new = _resolve(base, path), _resolve(new_base, path)
+        except PatchError:
+            continue
+        if not isinstance(old, list) or not isinstance(new, list):
+            continue
+        for i, position in enumerate(positions[:max(0, len(new) - len(old))]):
+            index = len(old) + i
+            operation = ['replace', f"{path}/{index}", merge_new_items(new[index], local_patch[position][2])]
+            local_patch[position] = operation
+            paired.append(operation)
+    return local_patch, paired
+
+def _resolve(document: Any, path: str) -> Any:
+    """Value at a JSON pointer."""
+    for token in split_pointer(path):
+        document = _child(document, token, path)
+    return document
+
+def _apply_operation(document: Any, operation: list) -> Any:
+    """Apply one operation in place, returning the (possibly replaced) document."""
+    op, path = operation[0], operation[1]
+    tokens = split_pointer(path)
+    if not tokens:
+        if op in ('add', 'replace'):
+            return copy.deepcopy(operation[2])
+        raise PatchError("Cannot remove the whole document")
+
+    parent = document
+    for token in tokens[:-1]:
+        parent = _child(parent, token, path)
+    last = tokens[-1]
+
+    if isinstance(parent, dict):
+        if op == 'remove':
+            if last not in parent:
+                raise PatchError(f"Nothing to remove at {path}")
+            del parent[last]
+        elif op in ('add', 'replace'):
+            parent[last] = copy.deepcopy(operation[2])
+        else:
+            raise PatchError(f"Unknown operation: {op!r}")
+    elif isinstance(parent, list):
+        if op == 'add' and last == '-':
+            parent.append(copy.deepcopy(operation[2]))
+            return document
+        index = _index(last, path)
+        if op == 'add' and index <= len(parent):
+            parent.insert(index, copy.deepcopy(operation[2]))
+        elif op == 'replace' and index < len(parent):
+            parent[index] = copy.deepcopy(operation[2])
+        elif op == 'remove' and index < len(parent):
+            del parent[index]
+        else:
+            raise PatchError(f"Cannot {op} at {path}")
+    else:
+        raise PatchError(f"No container at {path}")
+    return document
+
+def _child(container: Any, token: str, path: str) -> Any:
+    """Step one token into a dict or list."""
+    if isinstance(container, dict) and token in container:
+        return container[token]
+    if isinstance(container, list):
+        index = _index(token, path)
+        if index < len(container):
+            return container[index]
+    raise PatchError(f"Path not found: {path}")
+
+def _index(token: str, path: str) -> int:
+    if not token.isdigit():
+        raise PatchError(f"Invalid list index in {path}")
+    return int(token)
@@ -0,0 +1,115 @@
+"""
+Import-time report for the application entry point.
+
+Runs the target module in a fresh interpreter with ``python -X importtime`` and
+summarises which modules were imported at startup and how long they took.
+
+Usage:
+    python -m src.utils.import_profiler            # report for main.py
+    python -m src.utils.import_profiler --top 30   # show more modules
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Libraries that should NOT be imported before the first page render
+HEAVY_DEPENDENCIES = [
+    'pandas',
+    'numpy',
+    'PIL',
+    'streamlit_drawable_canvas',
+    'docxtpl',
+    'docx',
+    'lxml',
+]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run_import_time_report(target: str = 'main') -> List[Dict]:
+    """
+    Import a module in a fresh interpreter and collect its ``-X importtime`` output.
+
+    Args:
+        target: Dotted module name to import (default: the ``main`` entry point)
+
+    Returns:
+        List of dicts with 'module', 'self_us' and 'cumulative_us' for every imported module
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue  # Header line
+
+        entries.append({
+            'module': parts[2].strip(),
+            'self_us': self_us,
+            'cumulative_us': cumulative_us
+        })
+
+    return entries
+
+def summarize_import_report(entries: List[Dict], top: int = 15) -> Dict:
+    """
+    Summarise an import-time report.
+
+    Args:
+        entries: Output of run_import_time_report()
+        top: Number of slowest modules to include
+
+    Returns:
+        Dict with total time, slowest modules and which heavy dependencies were loaded
+    """
+    imported = {entry['module'] for entry in entries}
+    # The top-level import of the target module is the last entry and includes everything
+    total_us = entries[-1]['cumulative_us'] if entries else 0
+
+    return {
+        'total_ms': total_us / 1000,
+        'module_count': len(entries),
+        'slowest': sorted(entries, key=lambda e: e['cumulative_us'], reverse=True)[:top],
+        'heavy_loaded': [name for name in HEAVY_DEPENDENCIES if name in imported],
+    }
+
+def main():
+    """Print the import-time report for the application entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show what is imported when the app starts")
+    parser.add_argument('--target', default='main', help="Module to import (default: main)")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest modules to list")
+    args = parser.parse_args()
+
+    summary = summarize_import_report(run_import_time_report(args.target), args.top)
+
+    print(f"Import of '{args.target}': {summary['total_ms']:.1f} ms, {summary['module_count']} modules")
+    print()
+    print(f"{'cumulative (ms)':>16}  {'self (ms)':>10}  module")
+    for entry in summary['slowest']:
+        print(f"{entry['cumulative_us'] / 1000:>16.1f}  {entry['self_us'] / 1000:>10.1f}  {entry['module']}")
+    print()
+
+    if summary['heavy_loaded']:
+        print("⚠️  Heavy dependencies loaded at startup: " + ", ".join(summary['heavy_loaded']))
+    else:
+        print("✅ No heavy dependencies loaded at startup")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Portable job files.
+
+A job can be exported to a single file and opened again later, on any machine.
+The file is a small binary container::
+
+    b"CCJOB" + msgpack({
+        'schema': 1,
+        'created_at': <unix time>,
+        'form_data': zlib(msgpack(form data)),
+        'blobs': {'signature': <strokes or PNG>, 'photo/<id>': <JPEG>, 'photo/<id>/thumb': <JPEG>},
+    })
+
+Binary payloads (signature, photos) are stored as msgpack ``bin`` values - not
+base64 - and are not compressed again (JPEG/PNG already are); only the form data
+is deflated. Dates keep their type (msgpack extension types) instead of turning
+into strings as they do in JSON.
+
+Every file records its schema version. Files from older versions are migrated
+step by step when they are loaded (``MIGRATIONS``); files from a newer version
+are refused. Version 0 is the plain JSON form data used by share links and the
+job store, so those can be opened as job files too.
+
+Run ``python -m src.utils.job_file`` to compare saving and loading a large job
+with the JSON + base64 equivalent.
+"""
+import base64
+import datetime
+import json
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import JOB_FILE_COMPRESSION_LEVEL
+
+JOB_FILE_MAGIC = b"CCJOB"
+SCHEMA_VERSION = 1
+
+# msgpack extension types
+EXT_DATE = 1
+EXT_DATETIME = 2
+
+class JobFileError(ValueError):
+    """The file isn't a job file, is damaged, or was written by a newer version of the app."""
+
+def encode_job_file(form_data: Dict[str, Any], blobs: Dict[str, bytes]) -> bytes:
+    """
+    Encode form data and its binary attachments as a job file.
+
+    Args:
+        form_data: Form data (the signature moved out into ``blobs``, see ``export_job``)
+        blobs: Binary attachments by name
+
+    Returns:
+        Job file contents
+    """
+    import msgpack
+
+    packed_form_data = msgpack.packb(form_data, default=_encode_ext, use_bin_type=True)
+    envelope = {
+        'schema': SCHEMA_VERSION,
+        'created_at': time.time(),
+        'form_data': zlib.compress(packed_form_data, JOB_FILE_COMPRESSION_LEVEL),
+        'blobs': blobs,
+    }
+    return JOB_FILE_MAGIC + msgpack.packb(envelope, use_bin_type=True)
+
+def decode_job_file(data: bytes) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """
+    Decode a job file, migrating it to the current schema if it is older.
+
+    Args:
+        data: Job file contents (or plain JSON form data - schema version 0)
+
+    Returns:
+        Tuple of (form data, blobs)
+
+    Raises:
+        JobFileError: If the file can't be read
+    """
+    import msgpack
+
+    try:
+        if data.startswith(JOB_FILE_MAGIC):
+            envelope = msgpack.unpackb(data[len(JOB_FILE_MAGIC):], raw=False)
+        elif data.lstrip()[:1] == b'{':
+            envelope = {'schema': 0, 'form_data': json.loads(data.decode('utf-8'))}
+        else:
+            raise JobFileError("Not a job file")
+    except JobFileError:
+        raise
+    except Exception as e:
+        raise JobFileError(f"The job file is damaged: {str(e) or type(e).__name__}")
+
+    if not isinstance(envelope, dict):
+        raise JobFileError("The job file is damaged: no job data")
+    schema = envelope.get('schema')
+    if not isinstance(schema, int) or schema < 0:
+        raise JobFileError("The job file has no schema version")
+    if schema > SCHEMA_VERSION:
+        raise JobFileError(f"The job file was saved by a newer version of the app (schema {schema}, "
+                           f"this version reads up to {SCHEMA_VERSION})")
+
+    try:
+        # Lazy migration: older files are brought up to date in memory, one version at a time
+        while envelope['schema'] < SCHEMA_VERSION:
+            envelope = MIGRATIONS[envelope['schema']](envelope)
+
+        form_data = msgpack.unpackb(zlib.decompress(envelope['form_data']), raw=False,
+                                    ext_hook=_decode_ext, strict_map_key=False)
+    except Exception as e:
+        raise JobFileError(f"The job file is damaged: {str(e) or type(e).__name__}")
+
+    blobs = envelope.get('blobs') or {}
+    if not isinstance(form_data, dict):
+        raise JobFileError("The job file is damaged: the form data isn't a map")
+    if not isinstance(blobs, dict) or not all(isinstance(name, str) and isinstance(blob, bytes)
+                                              for name, blob in blobs.items()):
+        raise JobFileError("The job file is damaged: invalid attachments")
+    return form_data, blobs
+
+def export_job(form_data: Dict[str, Any], photo_timeout: float = 30.0) -> bytes:
+    """
+    Build a job file for the given form data, with its signature and photos.
+
+    Args:
+        form_data: Form data to export (not modified)
+        photo_timeout: Seconds to wait for photos that are still being processed
+
+    Returns:
+        Job file contents
+    """
+    from src.utils.photo_store import form_photo_ids, read_photo, wait_for_photos
+
+    form_data, blobs = split_signature(form_data)
+
+    photo_ids = form_photo_ids(form_data)
+    wait_for_photos(photo_ids, timeout=photo_timeout)
+    for photo_id in photo_ids:
+        photo = read_photo(photo_id)
+        if photo:
+            blobs[f"photo/{photo_id}"], blobs[f"photo/{photo_id}/thumb"] = photo
+    return encode_job_file(form_data, blobs)
+
+def import_job(data: bytes) -> Dict[str, Any]:
+    """
+    Read a job file, storing its photos and putting its signature back into the form data.
+
+    Photos that aren't valid report JPEGs are not stored; the report leaves them out.
+
+    Args:
+        data: Job file contents
+
+    Returns:
+        Form data of the job
+
+    Raises:
+        JobFileError: If the file can't be read
+    """
+    from src.utils.photo_store import store_photo
+
+    form_data, blobs = decode_job_file(data)
+    for name, image in blobs.items():
+        parts = name.split('/')
+        if len(parts) == 2 and parts[0] == 'photo':
+            store_photo(parts[1], image, blobs.get(f"{name}/thumb") or image)
+    return join_signature(form_data, blobs)
+
+def split_signature(form_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """
+    Move the signature out of the form data into blobs.
+
+    Vector signatures become the 'signature' blob (the encoded strokes), raster
+    signatures from older jobs the 'signature.png' blob (decoded from base64).
+
+    Returns:
+        Tuple of (form data with the signature fields emptied - a shallow copy, blobs)
+    """
+    form_data, blobs = dict(form_data), {}
+    if form_data.get('signature_strokes'):
+        blobs['signature'] = form_data['signature_strokes'].encode('utf-8')
+        form_data['signature_strokes'] = None
+    if form_data.get('signature_data'):
+        blobs['signature.png'] = base64.b64decode(form_data['signature_data'])
+        form_data['signature_data'] = None
+    return form_data, blobs
+
+def join_signature(form_data: Dict[str, Any], blobs: Dict[str, bytes]) -> Dict[str, Any]:
+    """Put a signature split off by ``split_signature`` back into the form data."""
+    if 'signature' in blobs:
+        form_data['signature_strokes'] = blobs['signature'].decode('utf-8')
+    if 'signature.png' in blobs:
+        form_data['signature_data'] = base64.b64encode(blobs['signature.png']).decode('ascii')
+    return form_data
+
+def job_file_name(form_data: Dict[str, Any]) -> str:
+    """File name for a job file, from the project number/name."""
+    from src.config import JOB_FILE_EXTENSION
+
+    parts = [str(form_data.get(key) or '').strip() for key in ('project_number', 'project_name')]
+    name = '_'.join(part for part in parts if part) or 'canopy_job'
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name) + JOB_FILE_EXTENSION
+
+def _migrate_v0(envelope: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema 0 (plain JSON form data) -> 1: pack the form data and split off the signature."""
+    import msgpack
+
+    form_data, blobs = split_signature(envelope['form_data'])
+    return {
+        'schema': 1,
+        'created_at': None,
+        'form_data': zlib.compress(msgpack.packb(form_data, use_bin_type=True), JOB_FILE_COMPRESSION_LEVEL),
+        'blobs': blobs,
+    }
+
+# Schema version -> function turning an envelope of that version into one of the next version
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    0: _migrate_v0,
+}
+
+def _encode_ext(value: Any):
+    """msgpack hook for values it can't pack itself."""
+    import msgpack
+
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode('ascii'))
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(EXT_DATE, value.isoformat().encode('ascii'))
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)  # Same as json.dumps(default=str) for the job store
+
+def _decode_ext(code: int, data: bytes):
+    import msgpack
+
+    if code == EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode('ascii'))
+    if code == EXT_DATE:
+        return datetime.date.fromisoformat(data.decode('ascii'))
+    return msgpack.ExtType(code, data)
+
+def _benchmark_job(canopies: int, sections: int, photos: int, photo_bytes: int) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """A large synthetic job (form data with vector signature, and photo blobs of random bytes)."""
+    import os
+    import random
+
+    from src.config import UV_SYSTEM_CHECKLIST
+
+    rng = random.Random(0)
+    form_data = {
+        'report_type': 'Canopy Commissioning', 'client_name': 'Benchmark Client', 'project_name': 'Benchmark',
+        'project_number': 'BM-001', 'engineer_name': 'Engineer', 'date_of_visit': datetime.date(2024, 1, 1),
+        'signature_date': datetime.date(2024, 1, 1), 'num_canopies': canopies,
+        'notes_list': [f"Note {n}: " + 'filters cleaned and checked ' * 5 for n in range(10)],
+        'signature_strokes': '600x200;' + ';'.join(
+            ','.join(str(rng.randint(-20, 20)) for _ in range(120)) for _ in range(6)),
+        'canopies': [],
+    }
+    photo_ids = [f"{n:064x}" for n in range(photos)]
+    for i in range(canopies):
+        form_data['canopies'].append({
+            'drawing_number': f"DWG-{i:03d}", 'canopy_location': f"Kitchen {i}", 'canopy_model': 'KVF',
+            'with_marvel': i % 2 == 0, 'design_airflow': round(rng.uniform(0.5, 3), 3),
+            'supply_airflow': round(rng.uniform(0.5, 3), 3), 'number_of_sections': sections,
+            'photos': [{'id': photo_id, 'caption': f"Canopy {i} photo"} for photo_id in photo_ids[i::canopies]],
+            'sections': [{
+                'extract_ksa': rng.choice([None, 1.2, 1.5]), 'extract_tab_reading': f"{rng.uniform(50, 300):.1f}",
+                'supply_plenum_length': 1000, 'supply_tab_reading': f"{rng.uniform(50, 300):.1f}",
+                'min_percent': 30.0, 'idle_percent': 50.0, 'design_percent': 100.0,
+            } for _ in range(sections)],
+        })
+        form_data[f"canopy_{i}_uv_checklist"] = {item: rng.random() < 0.5 for item in UV_SYSTEM_CHECKLIST}
+
+    blobs = {}
+    for photo_id in photo_ids:
+        blobs[f"photo/{photo_id}"] = os.urandom(photo_bytes)  # JPEG data doesn't compress either
+        blobs[f"photo/{photo_id}/thumb"] = os.urandom(photo_bytes // 20)
+    return form_data, blobs
+
+def run_benchmark(canopies: int = 50, sections: int = 12, photos: int = 40, photo_bytes: int = 250_000,
+                  repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    Time saving and loading a large job as a job file and as JSON (+ base64 blobs, with and without zlib).
+
+    Returns:
+        One dict per format with 'format', 'bytes', 'save_ms' and 'load_ms' (best of ``repeat``)
+    """
+    form_data, blobs = _benchmark_job(canopies, sections, photos, photo_bytes)
+
+    def encode_json(compress: bool) -> bytes:
+        data = json.dumps({'form_data': form_data, 'blobs': {name: base64.b64encode(blob).decode('ascii')
+                                                             for name, blob in blobs.items()}}, default=str).encode('utf-8')
+        return zlib.compress(data, JOB_FILE_COMPRESSION_LEVEL) if compress else data
+
+    def decode_json(data: bytes, compress: bool):
+        document = json.loads(zlib.decompress(data) if compress else data)
+        return document['form_data'], {name: base64.b64decode(blob) for name, blob in document['blobs'].items()}
+
+    def encode_binary() -> bytes:
+        stripped, signature = split_signature(form_data)
+        return encode_job_file(stripped, {**signature, **blobs})
+
+    formats = [
+        ('job file (msgpack + zlib)', encode_binary, decode_job_file),
+        ('JSON + base64', lambda: encode_json(False), lambda data: decode_json(data, False)),
+        ('JSON + base64 + zlib', lambda: encode_json(True), lambda data: decode_json(data, True)),
+    ]
+    results = []
+    for name, encode, decode in formats:
+        save_times, load_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = encode()
+            save_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            decode(data)
+            load_times.append(time.perf_counter() - start)
+        results.append({'format': name, 'bytes': len(data),
+                        'save_ms': min(save_times) * 1000, 'load_ms': min(load_times) * 1000})
+    return results
+
+def main():
+    """Print the job file vs JSON benchmark."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare job files with JSON for a large job")
+    parser.add_argument('--canopies', type=int, default=50)
+    parser.add_argument('--sections', type=int, default=12, help="Sections per canopy")
+    parser.add_argument('--photos', type=int, default=40)
+    parser.add_argument('--photo-kb', type=int, default=250, help="Size of each photo")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.canopies, args.sections, args.photos, args.photo_kb * 1000)
+    print(f"Job: {args.canopies} canopies x {args.sections} sections, {args.photos} photos of {args.photo_kb} KB")
+    print()
+    print(f"{'format':<28}{'size (KB)':>12}{'save (ms)':>12}{'load (ms)':>12}")
+    for result in results:
+        print(f"{result['format']:<28}{result['bytes'] / 1000:>12.0f}{result['save_ms']:>12.1f}{result['load_ms']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
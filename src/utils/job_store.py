@@ -0,0 +1,295 @@
+"""
+Shared job store.
+
+Form data, share tokens and generated documents are kept in a store that every
+app process can reach, so any process behind a load balancer can resume any
+job - no sticky sessions needed. ``JobStore`` is the interface; ``SQLiteJobStore``
+implements it on a SQLite file (WAL mode) that several local processes can share.
+A networked backend (e.g. Redis) only needs to implement the same methods and be
+added to ``get_job_store()``.
+
+Besides full saves, a job keeps a log of form data patches (see ``form_patch``):
+each ``append_patch()`` bumps the revision by one, so a session that knows
+revision N fetches only the patches after N instead of the whole form.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import JOB_STORE_URL, JOB_PATCH_HISTORY
+from src.utils.form_patch import Patch, apply_patch, encode_patch
+
+class JobStore(ABC):
+    """Storage for jobs (form data), share tokens and generated artifacts."""
+
+    @abstractmethod
+    def save_job(self, job_id: str, form_data: Dict[str, Any]) -> int:
+        """
+        Save a job's form data.
+
+        Args:
+            job_id: Job ID
+            form_data: Form data (must be JSON-serializable, dates are stored as strings)
+
+        Returns:
+            The job's new revision number
+        """
+
+    @abstractmethod
+    def load_job(self, job_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Load a job's form data.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Tuple of (form_data, revision), or None if the job doesn't exist
+        """
+
+    @abstractmethod
+    def append_patch(self, job_id: str, base_revision: int, patch: Patch, author: str) -> Optional[int]:
+        """
+        Apply a form data patch to a job, if nobody else changed the job since ``base_revision``.
+
+        Args:
+            job_id: Job ID
+            base_revision: Revision the patch was made against (0 for a job that doesn't exist yet)
+            patch: Form data patch
+            author: Who made the change ('office' or 'technician')
+
+        Returns:
+            The job's new revision, or None if the job is no longer at ``base_revision``
+            (pull the newer patches, merge and try again)
+
+        Raises:
+            PatchError: If the patch doesn't apply to the stored form data
+        """
+
+    @abstractmethod
+    def load_patches(self, job_id: str, since_revision: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Load the patches made to a job after a revision.
+
+        Args:
+            job_id: Job ID
+            since_revision: Last revision the caller has
+
+        Returns:
+            Patches in order, as dicts with 'revision', 'patch', 'author', 'created_at'
+            and 'size' (bytes), or None if the log no longer reaches back to
+            ``since_revision`` (load the whole job instead)
+        """
+
+    @abstractmethod
+    def create_share_token(self, job_id: str) -> str:
+        """
+        Get the share token for a job, creating one if needed.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Share token (URL-safe)
+        """
+
+    @abstractmethod
+    def resolve_share_token(self, token: str) -> Optional[str]:
+        """
+        Look up the job a share token belongs to.
+
+        Args:
+            token: Share token
+
+        Returns:
+            Job ID, or None if the token is unknown
+        """
+
+    @abstractmethod
+    def save_artifact(self, job_id: str, name: str, data: bytes, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Save a generated artifact (e.g. the report document), replacing any previous one with the same name.
+
+        Args:
+            job_id: Job ID
+            name: Artifact name
+            data: Artifact contents
+            metadata: Optional JSON-serializable metadata (file name, mime type, ...)
+        """
+
+    @abstractmethod
+    def load_artifact(self, job_id: str, name: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Load a generated artifact.
+
+        Args:
+            job_id: Job ID
+            name: Artifact name
+
+        Returns:
+            Tuple of (data, metadata), or None if not found
+        """
+
+class SQLiteJobStore(JobStore):
+    """Job store on a SQLite database file, safe to share between processes on one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()  # One connection per thread
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    form_data TEXT NOT NULL,
+                    revision INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS job_patches (
+                    job_id TEXT NOT NULL,
+                    revision INTEGER NOT NULL,
+                    patch TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, revision)
+                );
+                CREATE TABLE IF NOT EXISTS share_tokens (
+                    token TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL UNIQUE,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    job_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    metadata TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, name)
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save_job(self, job_id: str, form_data: Dict[str, Any]) -> int:
+        payload = json.dumps(form_data, default=str)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, form_data, revision, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET form_data = excluded.form_data, "
+                "revision = jobs.revision + 1, updated_at = excluded.updated_at",
+                (job_id, payload, time.time())
+            )
+            return conn.execute("SELECT revision FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+    def load_job(self, job_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        row = self._connect().execute("SELECT form_data, revision FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def append_patch(self, job_id: str, base_revision: int, patch: Patch, author: str) -> Optional[int]:
+        payload = encode_patch(patch)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Hold the write lock between the revision check and the update
+            row = conn.execute("SELECT form_data, revision FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            form_data, revision = (json.loads(row[0]), row[1]) if row else ({}, 0)
+            if revision != base_revision:
+                return None
+
+            form_data, _ = apply_patch(form_data, patch)
+            revision += 1
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, form_data, revision, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET form_data = excluded.form_data, "
+                "revision = excluded.revision, updated_at = excluded.updated_at",
+                (job_id, json.dumps(form_data, default=str), revision, now)
+            )
+            conn.execute("INSERT OR REPLACE INTO job_patches (job_id, revision, patch, author, created_at) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, revision, payload, author, now))
+            conn.execute("DELETE FROM job_patches WHERE job_id = ? AND revision <= ?", (job_id, revision - JOB_PATCH_HISTORY))
+            return revision
+
+    def load_patches(self, job_id: str, since_revision: int) -> Optional[List[Dict[str, Any]]]:
+        conn = self._connect()
+        row = conn.execute("SELECT revision FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute(
+            "SELECT revision, patch, author, created_at FROM job_patches WHERE job_id = ? AND revision > ? ORDER BY revision",
+            (job_id, since_revision)
+        ).fetchall()
+        # Full saves don't log a patch - a gap means the caller needs the whole job
+        if len(rows) != row[0] - since_revision:
+            return None
+        return [{'revision': revision, 'patch': json.loads(patch), 'author': author, 'created_at': created_at, 'size': len(patch)}
+                for revision, patch, author, created_at in rows]
+
+    def create_share_token(self, job_id: str) -> str:
+        with self._connect() as conn:
+            row = conn.execute("SELECT token FROM share_tokens WHERE job_id = ?", (job_id,)).fetchone()
+            if row:
+                return row[0]
+            token = secrets.token_urlsafe(16)
+            conn.execute("INSERT INTO share_tokens (token, job_id, created_at) VALUES (?, ?, ?)",
+                         (token, job_id, time.time()))
+            return token
+
+    def resolve_share_token(self, token: str) -> Optional[str]:
+        row = self._connect().execute("SELECT job_id FROM share_tokens WHERE token = ?", (token,)).fetchone()
+        return row[0] if row else None
+
+    def save_artifact(self, job_id: str, name: str, data: bytes, metadata: Optional[Dict[str, Any]] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (job_id, name, data, metadata, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, name, sqlite3.Binary(data), json.dumps(metadata or {}), time.time())
+            )
+
+    def load_artifact(self, job_id: str, name: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        row = self._connect().execute(
+            "SELECT data, metadata FROM artifacts WHERE job_id = ? AND name = ?", (job_id, name)
+        ).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]), json.loads(row[1])
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """
+    Get the process-wide job store configured by ``JOB_STORE_URL``.
+
+    Supported URLs: ``sqlite:///<path>``.
+
+    Returns:
+        The job store
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if JOB_STORE_URL.startswith('sqlite:///'):
+                    _store = SQLiteJobStore(JOB_STORE_URL[len('sqlite:///'):])
+                else:
+                    raise ValueError(f"Unsupported job store URL: {JOB_STORE_URL}")
+    return _store
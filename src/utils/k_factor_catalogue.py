@@ -0,0 +1,233 @@
+"""
+K-factor catalogue loading.
+
+The catalogue lives in ``data/k_factors.json`` so models can be added or corrected
+without a code change. On first load the JSON is validated and compiled into a
+pickle cache under ``.cache/``; later startups load the pickle directly as long as
+the source file's mtime/size (or, failing that, its SHA-256) still match.
+
+The compiled catalogue is held in a single module-level reference. Reloading builds
+a complete new table and swaps the reference in one assignment, so a render that
+grabbed the catalogue with ``get_k_factor_catalogue()`` keeps a consistent view
+even if the file is reloaded while it runs. ``get_k_factor_catalogue_version``
+returns a hash of the catalogue's content, for caches of data computed from it.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.config import K_FACTOR_CATALOGUE_PATH, K_FACTOR_CATALOGUE_CHECK_INTERVAL, CACHE_DIR
+
+# Bump when the compiled format changes so old caches are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Version of the catalogue file format (its "version" field) this code reads
+CATALOGUE_VERSION = 1
+
+VALID_MODEL_TYPES = {'section_based', 'length_based', 'cxw_special', 'cmwf_special', 'cmwi_special'}
+
+_lock = threading.Lock()
+_catalogue: Optional[Dict[str, Any]] = None
+_catalogue_version: Optional[str] = None
+_source_signature: Optional[tuple] = None
+_last_checked = 0.0
+
+def get_k_factor_catalogue() -> Dict[str, Any]:
+    """
+    Get the current K-factor catalogue (same format as the old ``K_FACTOR_DATA`` literal).
+
+    The source file is checked for changes at most once every
+    ``K_FACTOR_CATALOGUE_CHECK_INTERVAL`` seconds and reloaded if it was edited.
+
+    Returns:
+        Dict mapping canopy model to its K-factor data. Treat it as read-only.
+    """
+    global _last_checked
+
+    catalogue = _catalogue
+    if catalogue is None:
+        return reload_k_factor_catalogue(K_FACTOR_CATALOGUE_PATH)
+
+    now = time.monotonic()
+    if now - _last_checked >= K_FACTOR_CATALOGUE_CHECK_INTERVAL:
+        _last_checked = now
+        if _file_signature(K_FACTOR_CATALOGUE_PATH) != _source_signature:
+            try:
+                return reload_k_factor_catalogue(K_FACTOR_CATALOGUE_PATH)
+            except (OSError, ValueError):
+                pass  # Keep serving the last good catalogue if the edited file is invalid
+
+    return catalogue
+
+def get_k_factor_catalogue_version() -> str:
+    """
+    Get a hash of the current catalogue's content.
+
+    It changes when an edit changes any K-factor and stays the same when the
+    file is only touched or reformatted.
+
+    Returns:
+        Hex digest identifying the catalogue content
+    """
+    get_k_factor_catalogue()  # Picks up an edited file
+    return _catalogue_version
+
+def reload_k_factor_catalogue(path: str = K_FACTOR_CATALOGUE_PATH) -> Dict[str, Any]:
+    """
+    Load the catalogue from disk (via the compiled cache when valid) and swap it in.
+
+    Args:
+        path: Path to the catalogue JSON file
+
+    Returns:
+        The newly loaded catalogue
+
+    Raises:
+        ValueError: If the catalogue file is invalid (the previous catalogue stays active)
+    """
+    global _catalogue, _catalogue_version, _source_signature, _last_checked
+
+    with _lock:
+        signature = _file_signature(path)
+        catalogue = load_k_factor_catalogue(path)
+        version = hashlib.sha256(json.dumps(catalogue, sort_keys=True).encode('utf-8')).hexdigest()
+
+        # Atomic swap - readers see either the old or the new table, never a mix
+        # (the version follows the table, so a reader seeing a new version also sees the new table)
+        _catalogue = catalogue
+        _catalogue_version = version
+        _source_signature = signature
+        _last_checked = time.monotonic()
+
+    return catalogue
+
+def load_k_factor_catalogue(path: str = K_FACTOR_CATALOGUE_PATH) -> Dict[str, Any]:
+    """
+    Load a catalogue file, using and refreshing the compiled pickle cache.
+
+    Args:
+        path: Path to the catalogue JSON file
+
+    Returns:
+        Compiled catalogue dict
+    """
+    stat = os.stat(path)
+    cache_path = _cache_path(path)
+    cached = _read_cache(cache_path)
+
+    # Fast path: file untouched since the cache was written
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return cached['catalogue']
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    sha256 = hashlib.sha256(raw).hexdigest()
+
+    # File touched but content unchanged - reuse the compiled data
+    if cached and cached['sha256'] == sha256:
+        catalogue = cached['catalogue']
+    else:
+        catalogue = compile_k_factor_catalogue(json.loads(raw.decode('utf-8')))
+
+    _write_cache(cache_path, {
+        'format': CACHE_FORMAT_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': sha256,
+        'catalogue': catalogue,
+    })
+
+    return catalogue
+
+def compile_k_factor_catalogue(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a parsed catalogue file and convert it to the lookup format.
+
+    JSON object keys are always strings, so KSA counts and lengths are converted
+    back to ints and K-factors to floats.
+
+    Args:
+        raw: Parsed JSON content ({"version": 1, "models": {...}})
+
+    Returns:
+        Dict mapping canopy model to its K-factor data
+
+    Raises:
+        ValueError: If the file has another version, is missing required fields or has invalid values
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("K-factor catalogue must be a JSON object")
+    if raw.get('version') != CATALOGUE_VERSION:
+        raise ValueError(f"Unsupported K-factor catalogue version {raw.get('version')!r} (expected {CATALOGUE_VERSION})")
+
+    models = raw.get('models')
+    if not isinstance(models, dict) or not models:
+        raise ValueError("K-factor catalogue must contain a non-empty 'models' object")
+
+    catalogue = {}
+    for model, model_data in models.items():
+        if not isinstance(model_data, dict):
+            raise ValueError(f"Model '{model}' must be an object")
+        model_type = model_data.get('type')
+        if model_type not in VALID_MODEL_TYPES:
+            raise ValueError(f"Model '{model}' has invalid type '{model_type}'")
+
+        entry = {'type': model_type}
+
+        try:
+            if model_type == 'section_based':
+                entry['sections'] = {int(k): float(v) for k, v in model_data['sections'].items()}
+            elif model_type == 'length_based':
+                entry['length_ranges'] = {int(k): float(v) for k, v in model_data['length_ranges'].items()}
+            else:
+                entry['calculation'] = model_data.get('calculation', 'Qv = A x m/s')
+        except (KeyError, AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"Model '{model}' has invalid K-factor data: {e}")
+
+        if model_type in ('section_based', 'length_based') and not entry.get('sections', entry.get('length_ranges')):
+            raise ValueError(f"Model '{model}' has no K-factor values")
+
+        catalogue[model] = entry
+
+    return catalogue
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """Cheap change-detection signature (mtime, size) for a file."""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def _cache_path(path: str) -> str:
+    """Cache file location for a catalogue source file."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{name}-{path_hash}.pickle")
+
+def _read_cache(cache_path: str) -> Optional[Dict[str, Any]]:
+    """Read a compiled cache file, or None if it is missing, stale-format or corrupt."""
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if isinstance(cached, dict) and cached.get('format') == CACHE_FORMAT_VERSION:
+            return cached
+    except Exception:
+        pass
+    return None
+
+def _write_cache(cache_path: str, payload: Dict[str, Any]):
+    """Write the compiled cache atomically (temp file + rename). Failures are ignored."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Read-only filesystem etc. - we just lose the cache
@@ -0,0 +1,173 @@
+"""
+Vectorized K-factor lookup.
+
+The K-factor catalogue is compiled into NumPy arrays when this module is imported
+(and again whenever the catalogue file is reloaded), so whole batches of
+(model, KSA count or plenum length) pairs can be mapped to K-factors in a single call. Length-based
+models (CMW-F, CMW-I, KVD, KVV) support linear interpolation for lengths that
+are not in the catalogue.
+
+This module is kept separate from ``src.config`` so that NumPy is only imported
+by the code paths that actually do batch calculations.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from src.config import MAX_SECTIONS, get_k_factor_data
+
+def compile_k_factor_tables(k_factor_data: Dict) -> Dict:
+    """
+    Compile K-factor catalogue data into NumPy lookup tables.
+
+    Args:
+        k_factor_data: K-factor catalogue in the ``K_FACTOR_DATA`` format
+
+    Returns:
+        Dict with:
+            'model_index': model name -> row index
+            'section_table': 2D array [model, ksa_count] of K-factors (0.0 where undefined)
+            'length_tables': row index -> (sorted lengths, K-factors) for length-based models
+    """
+    model_index = {model: i for i, model in enumerate(k_factor_data)}
+    section_table = np.zeros((len(model_index), MAX_SECTIONS + 1), dtype=np.float64)
+    length_tables = {}
+
+    for model, model_data in k_factor_data.items():
+        row = model_index[model]
+
+        if model_data['type'] == 'section_based':
+            for ksa_count, k_factor in model_data['sections'].items():
+                if 0 <= int(ksa_count) <= MAX_SECTIONS:
+                    section_table[row, int(ksa_count)] = k_factor
+
+        elif model_data['type'] == 'length_based':
+            lengths = np.array(sorted(model_data['length_ranges']), dtype=np.float64)
+            k_factors = np.array([model_data['length_ranges'][length] for length in sorted(model_data['length_ranges'])],
+                                 dtype=np.float64)
+            length_tables[row] = (lengths, k_factors)
+
+    return {
+        'model_index': model_index,
+        'section_table': section_table,
+        'length_tables': length_tables,
+    }
+
+# Compiled tables and the catalogue object they were built from
+_compiled = (None, None)
+
+def get_k_factor_tables() -> Dict:
+    """
+    Get the compiled lookup tables for the current K-factor catalogue.
+    
+    The tables are rebuilt only when the catalogue has been reloaded.
+    
+    Returns:
+        Compiled tables (see compile_k_factor_tables)
+    """
+    global _compiled
+    
+    catalogue = get_k_factor_data()
+    source, tables = _compiled
+    if source is not catalogue:
+        tables = compile_k_factor_tables(catalogue)
+        _compiled = (catalogue, tables)  # Single assignment keeps source and tables in step
+    return tables
+
+get_k_factor_tables()  # Compile at import
+
+def lookup_k_factors(canopy_models: Sequence[str], values: Sequence[float], interpolate: bool = True) -> np.ndarray:
+    """
+    Look up K-factors for many sections in one call.
+
+    Args:
+        canopy_models: Canopy model per section (e.g. ['KVF', 'KVD', ...])
+        values: Number of KSAs for section-based models, or length in mm for length-based models
+        interpolate: For length-based models, interpolate linearly between catalogue lengths.
+            If False, the closest catalogue length is used (same as ``config.get_k_factor``).
+
+    Returns:
+        Array of K-factors, 0.0 where the model or value is unknown
+    """
+    tables = get_k_factor_tables()
+    models = np.asarray(canopy_models, dtype=object)
+    values = np.asarray(_to_floats(values), dtype=np.float64)
+
+    if models.shape != values.shape:
+        raise ValueError("canopy_models and values must have the same length")
+
+    rows = np.array([tables['model_index'].get(model, -1) for model in models], dtype=np.int64)
+    result = np.zeros(values.shape, dtype=np.float64)
+    valid = (rows >= 0) & np.isfinite(values)
+
+    # Section-based models: direct table lookup for whole-number KSA counts in range
+    ksa_counts = np.where(valid, values, -1)
+    is_section_lookup = valid & (ksa_counts == np.round(ksa_counts)) & (ksa_counts >= 0) & (ksa_counts <= MAX_SECTIONS)
+    result[is_section_lookup] = tables['section_table'][rows[is_section_lookup], ksa_counts[is_section_lookup].astype(np.int64)]
+
+    # Length-based models: one interpolation per model present in the batch
+    for row in np.unique(rows[valid]):
+        if row not in tables['length_tables']:
+            continue
+
+        lengths, k_factors = tables['length_tables'][row]
+        mask = valid & (rows == row)
+
+        if interpolate:
+            # np.interp clamps to the end values outside the catalogue range
+            result[mask] = np.interp(values[mask], lengths, k_factors)
+        else:
+            result[mask] = k_factors[_closest_index(lengths, values[mask])]
+
+    return result
+
+def get_interpolated_k_factor(canopy_model: str, value: float) -> float:
+    """
+    Get a single K-factor, interpolating for non-standard plenum lengths.
+
+    Args:
+        canopy_model: The canopy model
+        value: Number of KSAs or length in mm
+
+    Returns:
+        K-factor value or 0.0 if not found
+    """
+    return float(lookup_k_factors([canopy_model], [value])[0])
+
+def calculate_flowrates(k_factors: Sequence[float], tab_readings: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate flowrates for many sections using Qv = Kf x √Pa.
+
+    Args:
+        k_factors: K-factor per section
+        tab_readings: T.A.B pressure reading per section in Pa (blank/invalid readings give 0)
+
+    Returns:
+        Tuple of (flowrates_m3h, flowrates_m3s) arrays
+    """
+    k_factors = np.asarray(k_factors, dtype=np.float64)
+    pressures = np.asarray(_to_floats(tab_readings), dtype=np.float64)
+    pressures = np.where(np.isfinite(pressures) & (pressures > 0), pressures, 0.0)
+
+    flowrates_m3h = k_factors * np.sqrt(pressures)
+    return flowrates_m3h, flowrates_m3h / 3600
+
+def _to_floats(values: Sequence) -> list:
+    """Convert raw form values (numbers, numeric strings, blanks, None) to floats, NaN if invalid."""
+    converted = []
+    for value in values:
+        try:
+            converted.append(float(value) if value not in (None, '') else np.nan)
+        except (ValueError, TypeError):
+            converted.append(np.nan)
+    return converted
+
+def _closest_index(lengths: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the closest catalogue length for each value (lower length wins ties)."""
+    if len(lengths) == 1:
+        return np.zeros(values.shape, dtype=np.int64)
+    
+    upper = np.clip(np.searchsorted(lengths, values), 1, len(lengths) - 1)
+    lower = upper - 1
+    pick_upper = np.abs(lengths[upper] - values) < np.abs(values - lengths[lower])
+    return np.where(pick_upper, upper, lower)
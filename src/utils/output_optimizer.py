@@ -0,0 +1,264 @@
+"""
+Post-render optimization of generated reports.
+
+python-docx writes reports at zlib's default level and keeps every image at
+whatever resolution it was inserted with. Technicians download reports over
+site 4G, so ``optimize_docx()`` rewrites the finished document:
+
+- parts no relationship reaches are dropped
+- images shown at more than ``OUTPUT_IMAGE_MAX_DPI`` are downsized to it
+  (the on-page size is unchanged - only surplus pixels go)
+- XML parts are recompressed at ``OUTPUT_DEFLATE_LEVEL``; images, already
+  compressed, are stored
+- every zip entry gets the same fixed timestamp, so the same report rendered
+  twice gives the same bytes (the PDF cache and the report archive are keyed
+  by the document's SHA-256)
+
+If the result is still over ``OUTPUT_MAX_BYTES``, images are downsized further
+through ``OUTPUT_BUDGET_DPI_STEPS`` until it fits (or the steps run out).
+"""
+import io
+import posixpath
+import re
+import time
+import zipfile
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import (
+    OUTPUT_DEFLATE_LEVEL, OUTPUT_IMAGE_MAX_DPI, OUTPUT_MAX_BYTES, OUTPUT_BUDGET_DPI_STEPS, OUTPUT_JPEG_QUALITY
+)
+
+EMU_PER_INCH = 914400
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.emf', '.wmf')
+
+# Already compressed - stored rather than deflated again
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+# Timestamp of every zip entry (the earliest a zip can hold) instead of the time of rendering
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+DRAWING_PATTERN = re.compile(r'<wp:(inline|anchor)\b.*?</wp:\1>', re.DOTALL)
+EXTENT_PATTERN = re.compile(r'<wp:extent\b[^>]*?\bcx="(\d+)"[^>]*?\bcy="(\d+)"')
+EMBED_PATTERN = re.compile(r'\br:embed="([^"]+)"')
+
+def optimize_docx(
+    data: bytes,
+    deflate_level: int = OUTPUT_DEFLATE_LEVEL,
+    max_dpi: int = OUTPUT_IMAGE_MAX_DPI,
+    max_bytes: Optional[int] = OUTPUT_MAX_BYTES
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Shrink a generated .docx for download.
+
+    Args:
+        data: The generated document
+        deflate_level: zlib level (0-9) for the XML parts
+        max_dpi: Highest resolution images are kept at, relative to their on-page size
+        max_bytes: Size budget; images are downsized further until the document fits (None or 0 for no budget)
+
+    Returns:
+        Tuple of (optimized document, report dict with 'input_bytes', 'output_bytes',
+        'seconds', 'dropped_parts', 'resized_images', 'dpi' (final image cap) and
+        'within_budget')
+    """
+    start = time.perf_counter()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as source:
+        names = source.namelist()
+        members = {name: source.read(name) for name in names}
+
+    dropped = drop_unreachable_parts(members)
+    display_sizes = get_image_display_sizes(members)
+
+    dpi_steps = [max_dpi] + [dpi for dpi in OUTPUT_BUDGET_DPI_STEPS if dpi < max_dpi]
+    for dpi in dpi_steps:
+        images = {}
+        for name, size in display_sizes.items():
+            resized = downsize_image(name, members[name], size, dpi)
+            if resized is not members[name]:
+                images[name] = resized
+        output = _write_zip(names, {**members, **images}, deflate_level)
+        if not max_bytes or len(output) <= max_bytes or not display_sizes:
+            break
+
+    if len(output) >= len(data):
+        output = normalize_docx(data)  # Nothing worth saving
+
+    return output, {
+        'input_bytes': len(data),
+        'output_bytes': len(output),
+        'seconds': time.perf_counter() - start,
+        'dropped_parts': dropped,
+        'resized_images': sorted(images),
+        'dpi': dpi,
+        'within_budget': not max_bytes or len(output) <= max_bytes,
+    }
+
+def normalize_docx(data: bytes) -> bytes:
+    """
+    Rewrite a document with fixed zip timestamps, keeping its parts and their compression.
+
+    Args:
+        data: A .docx (returned as it is if its timestamps are already fixed)
+
+    Returns:
+        The document with every zip entry at ``ZIP_DATE_TIME``
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as source:
+        infos = source.infolist()
+        if all(info.date_time == ZIP_DATE_TIME for info in infos):
+            return data
+        members = {info.filename: source.read(info) for info in infos}
+    return _write_zip([info.filename for info in infos], members, None,
+                      {info.filename: info.compress_type for info in infos})
+
+def drop_unreachable_parts(members: Dict[str, bytes]) -> list:
+    """
+    Remove parts no relationship chain from the package root reaches.
+
+    Also removes their content type overrides. Modifies ``members`` in place.
+
+    Args:
+        members: Zip member name -> contents
+
+    Returns:
+        Names of the removed parts
+    """
+    reachable = {'[Content_Types].xml', '_rels/.rels'}
+    pending = ['']  # '' is the package itself (its rels are _rels/.rels)
+    while pending:
+        part = pending.pop()
+        rels_name = _rels_name(part)
+        if rels_name not in members:
+            continue
+        reachable.add(rels_name)
+        for target in _relationship_targets(part, members[rels_name]).values():
+            if target not in reachable and target in members:
+                reachable.add(target)
+                pending.append(target)
+
+    dropped = [name for name in members if name not in reachable]
+    for name in dropped:
+        del members[name]
+
+    if dropped and '[Content_Types].xml' in members:
+        content_types = members['[Content_Types].xml'].decode('utf-8')
+        for name in dropped:
+            content_types = re.sub(rf'<Override\b[^>]*\bPartName="/{re.escape(name)}"[^>]*/>', '', content_types)
+        members['[Content_Types].xml'] = content_types.encode('utf-8')
+
+    return dropped
+
+def get_image_display_sizes(members: Dict[str, bytes]) -> Dict[str, Tuple[float, float]]:
+    """
+    Largest size (in inches) each image is shown at in the document.
+
+    Args:
+        members: Zip member name -> contents
+
+    Returns:
+        Image member name -> (width, height) in inches; images used only
+        outside DrawingML (e.g. VML) are not included
+    """
+    sizes = {}
+    for name, value in members.items():
+        if not name.endswith('.xml') or _rels_name(name) not in members:
+            continue
+        targets = _relationship_targets(name, members[_rels_name(name)])
+        xml = value.decode('utf-8', errors='ignore')
+        for drawing in DRAWING_PATTERN.finditer(xml):
+            extent = EXTENT_PATTERN.search(drawing.group(0))
+            if not extent:
+                continue
+            width, height = int(extent.group(1)) / EMU_PER_INCH, int(extent.group(2)) / EMU_PER_INCH
+            for rel_id in EMBED_PATTERN.findall(drawing.group(0)):
+                image = targets.get(rel_id)
+                if image and image.lower().endswith(IMAGE_EXTENSIONS):
+                    current = sizes.get(image, (0.0, 0.0))
+                    sizes[image] = (max(current[0], width), max(current[1], height))
+    return sizes
+
+def downsize_image(name: str, data: bytes, display_size: Tuple[float, float], max_dpi: int) -> bytes:
+    """
+    Downsize an image to at most ``max_dpi`` at its display size, keeping its format.
+
+    Args:
+        name: Zip member name (its extension gives the format)
+        data: Image contents
+        display_size: (width, height) in inches
+        max_dpi: Resolution cap
+
+    Returns:
+        The resized image, or ``data`` itself if it is already within the cap,
+        can't be resized or would not get smaller
+    """
+    extension = posixpath.splitext(name)[1].lower()
+    if extension not in ('.png', '.jpg', '.jpeg') or not display_size[0] or not display_size[1]:
+        return data
+
+    try:
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        scale = min(max_dpi * display_size[0] / image.width, max_dpi * display_size[1] / image.height)
+        if scale >= 1:
+            return data
+
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        resized = image.resize(size, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        if extension == '.png':
+            resized.save(output, 'PNG', optimize=True, dpi=(max_dpi, max_dpi))
+        else:
+            resized.convert('RGB').save(output, 'JPEG', quality=OUTPUT_JPEG_QUALITY, optimize=True, dpi=(max_dpi, max_dpi))
+    except Exception:
+        return data
+
+    return output.getvalue() if output.tell() < len(data) else data
+
+def _write_zip(names: list, members: Dict[str, bytes], deflate_level: Optional[int],
+               compress_types: Optional[Dict[str, int]] = None) -> bytes:
+    """
+    Write the members (in their original order) to a new zip with fixed timestamps.
+
+    Args:
+        names: Member names, in order
+        members: Member name -> contents
+        deflate_level: zlib level for deflated members (None for zlib's default)
+        compress_types: Compression per member; by default images are stored and everything else deflated
+    """
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as target:
+        for name in names:
+            if name not in members:
+                continue
+            if compress_types is not None:
+                compress_type = compress_types.get(name, zipfile.ZIP_DEFLATED)
+            else:
+                compress_type = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+            info.external_attr = 0o600 << 16  # As zipfile sets for entries written by name
+            target.writestr(info, members[name], compress_type=compress_type, compresslevel=deflate_level)
+    return output.getvalue()
+
+def _rels_name(part: str) -> str:
+    """Relationships member of a part ('' for the package root)."""
+    directory, filename = posixpath.split(part)
+    return posixpath.join(directory, '_rels', f"{filename}.rels")
+
+def _relationship_targets(part: str, rels_xml: bytes) -> Dict[str, str]:
+    """Internal relationship ID -> target member name for a part."""
+    targets = {}
+    base = posixpath.dirname(part)
+    for relationship in re.findall(r'<Relationship\b[^>]*>', rels_xml.decode('utf-8')):
+        rel_id = re.search(r'\bId="([^"]*)"', relationship)
+        target = re.search(r'\bTarget="([^"]*)"', relationship)
+        if not rel_id or not target or 'TargetMode="External"' in relationship:
+            continue
+        target = target.group(1)
+        targets[rel_id.group(1)] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base, target))
+    return targets
@@ -0,0 +1,476 @@
+"""
+PDF export through a pool of long-lived converter processes.
+
+Starting an office suite for every conversion takes seconds, so
+``PdfConverterPool`` keeps ``PDF_CONVERTERS`` converter processes running and
+feeds them from a bounded queue - which also caps how many conversions run at
+once. A conversion that takes longer than ``PDF_TIMEOUT`` (queueing and, after a
+restart, the converter's start-up included) is abandoned and its process
+killed; a converter that crashes (or has done
+``PDF_CONVERTER_MAX_JOBS`` conversions) is restarted before its next job.
+
+``PdfConverter`` is the interface; ``OfficeConverter`` drives a headless
+LibreOffice instance over UNO, and ``StubConverter`` is a small Python process
+that writes a plain-text PDF of the report, for tests and machines without
+LibreOffice. ``PDF_CONVERTER`` selects one.
+
+Converted PDFs are cached in ``PDF_CACHE_DIR`` by the SHA-256 of the .docx, so
+downloading the same report again doesn't convert it twice.
+"""
+import hashlib
+import io
+import os
+import queue
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from src.config import (
+    PDF_CONVERTER, PDF_CONVERTERS, PDF_QUEUE_SIZE, PDF_TIMEOUT, PDF_CONVERTER_MAX_JOBS,
+    PDF_OFFICE_BINARY, PDF_OFFICE_START_TIMEOUT, PDF_CACHE_DIR, PROJECT_ROOT
+)
+
+class PdfConversionError(Exception):
+    """A document couldn't be converted to PDF."""
+
+class PdfConverter(ABC):
+    """One long-lived converter process, used by one pool worker at a time."""
+
+    @abstractmethod
+    def start(self):
+        """Start the converter process (blocks until it is ready for work, or ``kill`` is called)."""
+
+    @abstractmethod
+    def convert(self, docx_bytes: bytes) -> bytes:
+        """
+        Convert a document.
+
+        Args:
+            docx_bytes: The .docx document
+
+        Returns:
+            The PDF
+        """
+
+    @abstractmethod
+    def is_alive(self) -> bool:
+        """Whether the converter process is still running."""
+
+    @abstractmethod
+    def kill(self):
+        """Stop the converter process immediately (safe to call from another thread)."""
+
+class OfficeConverter(PdfConverter):
+    """Headless LibreOffice instance with its own profile, driven over a UNO pipe."""
+
+    def __init__(self, index: int):
+        self.pipe_name = f"canopy_pdf_{os.getpid()}_{index}"
+        self.process: Optional[subprocess.Popen] = None
+        self.profile_dir: Optional[str] = None
+        self.desktop = None
+        self.killed = False
+        self._lock = threading.Lock()  # kill() may run on another thread while start() is launching
+
+    def start(self):
+        try:
+            import uno
+        except ImportError:
+            raise PdfConversionError("LibreOffice's Python UNO bindings (uno) are not installed")
+
+        binary = shutil.which(PDF_OFFICE_BINARY)
+        if not binary:
+            raise PdfConversionError(f"LibreOffice ({PDF_OFFICE_BINARY}) was not found")
+
+        with self._lock:
+            if self.killed:
+                raise PdfConversionError("LibreOffice was stopped while starting")
+            # A separate profile per instance, so the instances don't share (and lock) one
+            self.profile_dir = tempfile.mkdtemp(prefix='canopy_pdf_')
+            self.process = subprocess.Popen(
+                [binary, '--headless', '--invisible', '--nologo', '--nodefault', '--norestore', '--nolockcheck',
+                 f"-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}",
+                 f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.time() + PDF_OFFICE_START_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if not self.is_alive() or time.time() > deadline:
+                    self.kill()
+                    raise PdfConversionError("LibreOffice didn't start")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = PropertyValue()
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        work_dir = tempfile.mkdtemp(dir=self.profile_dir)
+        try:
+            source = os.path.join(work_dir, 'report.docx')
+            target = os.path.join(work_dir, 'report.pdf')
+            with open(source, 'wb') as f:
+                f.write(docx_bytes)
+
+            document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(source), '_blank', 0, properties(Hidden=True))
+            try:
+                document.storeToURL(uno.systemPathToFileUrl(target), properties(FilterName='writer_pdf_Export'))
+            finally:
+                document.close(True)
+
+            with open(target, 'rb') as f:
+                return f.read()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self):
+        with self._lock:
+            self.killed = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            self.desktop = None
+            if self.profile_dir:
+                shutil.rmtree(self.profile_dir, ignore_errors=True)
+                self.profile_dir = None
+
+class StubConverter(PdfConverter):
+    """
+    Python process that writes the report's text as a plain PDF.
+
+    Speaks the same length-prefixed protocol over stdin/stdout as a real
+    converter would, so the pool's queueing, timeouts and restarts are exercised.
+    """
+
+    def __init__(self, index: int):
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'src.utils.pdf_converter', '--stub-worker'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=PROJECT_ROOT
+        )
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        _write_message(self.process.stdin, docx_bytes)
+        pdf_bytes = _read_message(self.process.stdout)
+        if pdf_bytes is None:
+            raise PdfConversionError("The converter process exited")
+        return pdf_bytes
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+CONVERTERS = {'office': OfficeConverter, 'stub': StubConverter}
+
+class PdfConverterPool:
+    """
+    Fixed set of converter processes fed from a bounded queue.
+
+    Each worker thread owns one converter and takes jobs from the shared queue,
+    so at most ``size`` conversions run at once.
+    """
+
+    def __init__(self, converter: str = PDF_CONVERTER, size: int = PDF_CONVERTERS, queue_size: int = PDF_QUEUE_SIZE):
+        if converter not in CONVERTERS:
+            raise ValueError(f"Unknown PDF converter: {converter}")
+        self.converter = converter
+        self.jobs: 'queue.Queue' = queue.Queue(maxsize=queue_size)
+        self.converters: List[Optional[PdfConverter]] = [None] * size
+        self.stats = {'conversions': 0, 'failures': 0, 'timeouts': 0, 'restarts': 0}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        for index in range(size):
+            threading.Thread(target=self._worker, args=(index,), name=f"pdf-converter-{index}", daemon=True).start()
+
+    def convert(self, docx_bytes: bytes, timeout: float = PDF_TIMEOUT) -> bytes:
+        """
+        Convert a document on the next free converter.
+
+        Args:
+            docx_bytes: The .docx document
+            timeout: Seconds to wait for the conversion (queueing included)
+
+        Returns:
+            The PDF
+
+        Raises:
+            PdfConversionError: If the queue is full, the conversion fails or times out
+        """
+        if self._closed:
+            raise PdfConversionError("The PDF converter pool is shut down")
+
+        job = {'data': docx_bytes, 'future': Future(), 'converter': None, 'timed_out': False}
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            raise PdfConversionError("All PDF converters are busy - please try again shortly")
+
+        try:
+            return job['future'].result(timeout=timeout)
+        except FutureTimeoutError:
+            job['future'].cancel()
+            job['timed_out'] = True
+            self._count('timeouts')
+            # Kill a stuck converter - its worker restarts it before the next job
+            converter = job['converter']
+            if converter is not None:
+                converter.kill()
+            raise PdfConversionError(f"PDF conversion timed out after {timeout:.0f} s")
+
+    def shutdown(self):
+        """Stop the worker threads and their converter processes."""
+        self._closed = True
+        for _ in self.converters:
+            self.jobs.put(None)
+        for converter in self.converters:
+            if converter is not None:
+                converter.kill()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Converter kind, process count and liveness, queue length and counters."""
+        return {
+            'converter': self.converter,
+            'processes': len(self.converters),
+            'alive': sum(1 for converter in self.converters if converter is not None and converter.is_alive()),
+            'queued': self.jobs.qsize(),
+            **self.stats,
+        }
+
+    def _worker(self, index: int):
+        """Worker thread: keep converter ``index`` running and feed it jobs."""
+        converter = None
+        jobs_done = 0
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if not job['future'].set_running_or_notify_cancel():
+                continue  # Timed out while queued
+
+            try:
+                restart = converter is None or not converter.is_alive() or jobs_done >= PDF_CONVERTER_MAX_JOBS
+                if restart:
+                    if converter is not None:
+                        converter.kill()
+                        self._count('restarts')
+                    converter = CONVERTERS[self.converter](index)
+                    self.converters[index] = converter
+                    jobs_done = 0
+
+                # Published before the converter starts, so a timed-out job kills a start-up
+                # that hangs as well as a conversion. The caller sets 'timed_out' before it
+                # reads 'converter', so one of the two always sees the other.
+                job['converter'] = converter
+                if job['timed_out']:
+                    job['future'].set_exception(PdfConversionError("PDF conversion timed out"))
+                    continue
+                if restart:
+                    converter.start()
+
+                pdf_bytes = converter.convert(job['data'])
+                jobs_done += 1
+                self._count('conversions')
+                job['future'].set_result(pdf_bytes)
+            except Exception as e:
+                self._count('failures')
+                # Don't trust a converter after an error - restart it for the next job
+                if converter is not None:
+                    converter.kill()
+                job['future'].set_exception(e if isinstance(e, PdfConversionError) else PdfConversionError(str(e)))
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+_pool: Optional[PdfConverterPool] = None
+_pool_lock = threading.Lock()
+
+def get_pdf_converter_pool() -> PdfConverterPool:
+    """Get the app process's converter pool (created on first use)."""
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PdfConverterPool()
+    return _pool
+
+def convert_to_pdf(docx_bytes: bytes) -> bytes:
+    """
+    Convert a generated report to PDF, using the cached PDF if this exact document was converted before.
+
+    Args:
+        docx_bytes: The .docx document
+
+    Returns:
+        The PDF
+
+    Raises:
+        PdfConversionError: If the document couldn't be converted
+    """
+    cache_path = os.path.join(PDF_CACHE_DIR, f"{hashlib.sha256(docx_bytes).hexdigest()}.pdf")
+    try:
+        with open(cache_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    pdf_bytes = get_pdf_converter_pool().convert(docx_bytes)
+
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # Caching is only an optimization
+
+    return pdf_bytes
+
+def pdf_filename(docx_filename: str) -> str:
+    """Download name of the PDF for a .docx report."""
+    return os.path.splitext(docx_filename)[0] + '.pdf'
+
+def docx_text_lines(docx_bytes: bytes) -> List[str]:
+    """
+    Paragraph text of a document body, one line per paragraph (table cells included).
+
+    Args:
+        docx_bytes: The .docx document
+
+    Returns:
+        List of lines
+    """
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as archive:
+        xml = archive.read('word/document.xml').decode('utf-8')
+
+    lines = []
+    for paragraph in re.findall(r'<w:p\b.*?</w:p>', xml, re.DOTALL):
+        text = ''.join(re.findall(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>', paragraph))
+        text = text.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'").replace('&amp;', '&')
+        lines.append(text)
+    return lines
+
+def text_pdf(lines: List[str], lines_per_page: int = 60) -> bytes:
+    """
+    Minimal PDF (Helvetica 9pt, A4) showing the given lines.
+
+    Args:
+        lines: Text lines (characters outside Latin-1 are replaced)
+        lines_per_page: Lines per page
+
+    Returns:
+        The PDF
+    """
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+
+    page_ids = []
+    for page_lines in pages:
+        text = ''.join(
+            '(' + line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ') Tj T* '
+            for line in page_lines
+        )
+        stream = f"BT /F1 9 Tf 12 TL 50 800 Td {text}ET".encode('latin-1', errors='replace')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % i for i in page_ids), len(page_ids))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+def _write_message(stream, data: bytes):
+    """Write one length-prefixed message."""
+    stream.write(struct.pack('>I', len(data)) + data)
+    stream.flush()
+
+def _read_message(stream) -> Optional[bytes]:
+    """Read one length-prefixed message (None at end of stream)."""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    return stream.read(struct.unpack('>I', header)[0])
+
+def _run_stub_worker():
+    """Stub converter process: read .docx messages from stdin, answer with text PDFs."""
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        docx_bytes = _read_message(stdin)
+        if docx_bytes is None:
+            break
+        _write_message(stdout, text_pdf(docx_text_lines(docx_bytes)))
+
+def main():
+    """Convert a .docx with the configured converter pool (or run as a stub converter process)."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('docx', nargs='?', help="Document to convert")
+    parser.add_argument('--output', help="PDF path (default: next to the document)")
+    parser.add_argument('--stub-worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub_worker:
+        _run_stub_worker()
+        return
+    if not args.docx:
+        parser.error("a document is required")
+
+    with open(args.docx, 'rb') as f:
+        docx_bytes = f.read()
+
+    start = time.perf_counter()
+    pdf_bytes = get_pdf_converter_pool().convert(docx_bytes)
+    output = args.output or pdf_filename(args.docx)
+    with open(output, 'wb') as f:
+        f.write(pdf_bytes)
+    print(f"Wrote {output} ({len(pdf_bytes) / 1024:.0f} KB) in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"with the {PDF_CONVERTER} converter")
+    get_pdf_converter_pool().shutdown()
+
+if __name__ == '__main__':
+    main()
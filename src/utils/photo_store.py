@@ -0,0 +1,209 @@
+"""
+Site photo processing and storage.
+
+Uploaded photos are processed once, in a background thread pool: the EXIF
+orientation is applied, the photo is downscaled to ``PHOTO_MAX_PIXELS`` (long
+edge) for the report and to ``PHOTO_THUMBNAIL_PIXELS`` for the UI, and both
+are re-encoded as JPEG into ``PHOTO_DIR``. Files are named by the SHA-256 of
+the original upload, so the same photo uploaded twice (or to two canopies) is
+processed and stored once.
+
+Form data only holds photo IDs (the hash) and captions - raw uploads are never
+kept in session state, and nothing is decoded again on reruns.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from src.config import PHOTO_DIR, PHOTO_WORKERS, PHOTO_MAX_PIXELS, PHOTO_THUMBNAIL_PIXELS, PHOTO_JPEG_QUALITY
+
+# Photo ID -> processing future (this process), and IDs that couldn't be decoded
+_pending: Dict[str, Future] = {}
+_failed: Dict[str, str] = {}
+_photo_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def submit_photo(data: bytes) -> str:
+    """
+    Queue an uploaded photo for processing (no-op if it was processed before).
+
+    Args:
+        data: The uploaded file's contents
+
+    Returns:
+        Photo ID (SHA-256 of the upload)
+    """
+    global _executor
+
+    photo_id = hashlib.sha256(data).hexdigest()
+    with _photo_lock:
+        if photo_id in _pending or _is_stored(photo_id):
+            return photo_id
+        _failed.pop(photo_id, None)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PHOTO_WORKERS, thread_name_prefix='photo')
+        _pending[photo_id] = _executor.submit(_process_and_store, photo_id, data)
+    return photo_id
+
+def get_photo_status(photo_id: str) -> str:
+    """'ready', 'processing', 'failed' or 'missing' (not stored and not being processed)."""
+    with _photo_lock:
+        if photo_id in _pending:
+            return 'processing'
+        if photo_id in _failed:
+            return 'failed'
+    return 'ready' if _is_stored(photo_id) else 'missing'
+
+def get_photo_path(photo_id: str, thumbnail: bool = False) -> Optional[str]:
+    """
+    Path of a processed photo.
+
+    Args:
+        photo_id: Photo ID
+        thumbnail: Get the thumbnail instead of the report image
+
+    Returns:
+        Path of the JPEG, or None if the photo isn't (yet) stored
+    """
+    path = _path(photo_id, thumbnail)
+    return path if os.path.exists(path) else None
+
+def wait_for_photos(photo_ids: List[str], timeout: Optional[float] = None):
+    """
+    Wait until the given photos (if being processed in this process) are stored.
+
+    Args:
+        photo_ids: Photo IDs
+        timeout: Seconds to wait at most (None waits until all are done)
+    """
+    with _photo_lock:
+        futures = [_pending[photo_id] for photo_id in photo_ids if photo_id in _pending]
+    if futures:
+        wait(futures, timeout=timeout)
+
+def read_photo(photo_id: str) -> Optional[Tuple[bytes, bytes]]:
+    """
+    Read a processed photo's files.
+
+    Args:
+        photo_id: Photo ID
+
+    Returns:
+        Tuple of (report JPEG, thumbnail JPEG), or None if the photo isn't stored
+    """
+    try:
+        with open(_path(photo_id), 'rb') as f:
+            image = f.read()
+        with open(_path(photo_id, thumbnail=True), 'rb') as f:
+            thumbnail = f.read()
+    except OSError:
+        return None
+    return image, thumbnail
+
+def store_photo(photo_id: str, image: bytes, thumbnail: bytes) -> bool:
+    """
+    Store an already processed photo (e.g. from a job file) under its ID.
+
+    Both files are checked with PIL first - they must be JPEGs no larger than
+    ``process_photo()`` makes them - so a damaged or crafted file is never
+    stored and later inserted in a report.
+
+    Args:
+        photo_id: Photo ID (SHA-256 of the original upload)
+        image: Report JPEG
+        thumbnail: Thumbnail JPEG
+
+    Returns:
+        True if the photo is stored (now or before), False if it was refused
+    """
+    if len(photo_id) != 64 or not all(c in '0123456789abcdef' for c in photo_id):
+        return False
+    if _is_stored(photo_id):
+        return True
+    if not _is_valid_jpeg(image, PHOTO_MAX_PIXELS) or not _is_valid_jpeg(thumbnail, PHOTO_MAX_PIXELS):
+        return False
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+    _write_atomically(_path(photo_id, thumbnail=True), thumbnail)
+    _write_atomically(_path(photo_id), image)
+    return True
+
+def form_photo_ids(form_data: dict) -> List[str]:
+    """IDs of all photos attached in the form data (canopies and Edge box)."""
+    photo_ids = [photo['id'] for canopy in form_data.get('canopies', []) for photo in canopy.get('photos', [])]
+    photo_ids += [photo['id'] for photo in form_data.get('edge_box', {}).get('photos', [])]
+    return photo_ids
+
+def process_photo(data: bytes) -> Tuple[bytes, bytes]:
+    """
+    Orient, downscale and re-encode a photo.
+
+    Args:
+        data: Image file contents (any format PIL reads)
+
+    Returns:
+        Tuple of (report JPEG, thumbnail JPEG)
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        # Draft mode lets the JPEG decoder scale down while decoding - much faster for phone photos
+        original.draft('RGB', (PHOTO_MAX_PIXELS, PHOTO_MAX_PIXELS))
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+    outputs = []
+    for max_pixels in (PHOTO_MAX_PIXELS, PHOTO_THUMBNAIL_PIXELS):
+        resized = image.copy()
+        resized.thumbnail((max_pixels, max_pixels), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, 'JPEG', quality=PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+        outputs.append(output.getvalue())
+    return outputs[0], outputs[1]
+
+def _process_and_store(photo_id: str, data: bytes):
+    """Pool task: process a photo and write both versions."""
+    try:
+        image, thumbnail = process_photo(data)
+        os.makedirs(PHOTO_DIR, exist_ok=True)
+        # Thumbnail first - the report image's presence marks the photo as stored
+        _write_atomically(_path(photo_id, thumbnail=True), thumbnail)
+        _write_atomically(_path(photo_id), image)
+    except Exception as e:
+        with _photo_lock:
+            _failed[photo_id] = str(e)
+    finally:
+        with _photo_lock:
+            _pending.pop(photo_id, None)
+
+def _is_valid_jpeg(data: bytes, max_pixels: int) -> bool:
+    """Whether data is an intact JPEG whose long edge is at most max_pixels."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format != 'JPEG' or max(image.size) > max_pixels:
+                return False
+            image.verify()
+        # verify() only checks the structure - decoding catches truncated image data
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+    except Exception:
+        return False
+    return True
+
+def _is_stored(photo_id: str) -> bool:
+    return os.path.exists(_path(photo_id))
+
+def _path(photo_id: str, thumbnail: bool = False) -> str:
+    return os.path.join(PHOTO_DIR, f"{photo_id}{'_thumb' if thumbnail else ''}.jpg")
+
+def _write_atomically(path: str, data: bytes):
+    """Write a file via a temporary file and rename, so readers never see it half-written."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
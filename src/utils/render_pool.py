@@ -0,0 +1,298 @@
+"""
+Pre-warmed render worker pool.
+
+The first render in a fresh process pays for importing docxtpl, python-docx,
+lxml, jinja2 and PIL and for preprocessing, compiling and analysing the
+templates. ``start_render_pool()`` moves that cost to app startup: a fork
+server imports everything and warms the template caches once
+(``render_warmup``), and every render worker is forked from it, so the
+modules and parsed templates are shared copy-on-write instead of being
+rebuilt per worker.
+
+The fork server must not have any other threads when it forks (a worker
+would inherit their locks but not the threads), so the warm-up stops the
+thread pools it used and records an error if any thread is left; workers
+report it and the pool isn't used.
+
+Workers are replaced after ``RENDER_WORKER_MAX_RENDERS`` renders to bound
+their memory growth; replacements are forked from the same warm server, so
+they start warm too. Until the pool is warm - or if it fails, or the platform
+has no fork server (Windows) - ``render_report()`` renders in the app process.
+A render that doesn't finish in ``RENDER_TIMEOUT`` is done in the app process
+and the pool, with its stuck worker, is terminated and started again.
+A report that fails to render in a worker raises the worker's error, as it
+would in-process. ``get_render_pool_status()`` is the health check; it never
+sends workers a task, so checking it doesn't use up their renders.
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import RENDER_WORKERS, RENDER_WORKER_MAX_RENDERS, RENDER_TIMEOUT, REPORT_TEMPLATES, TEMPLATES_DIR
+
+WARMUP_MODULE = 'src.utils.render_warmup'
+
+# Pool state, shared by all sessions in the app process
+_pool = None
+_state = 'cold'  # cold -> starting -> warm (or failed / disabled)
+_started_at: Optional[float] = None
+_warm_seconds: Optional[float] = None
+_error: Optional[str] = None
+_renders = 0
+_fallback_renders = 0
+_busy = 0  # Pooled renders in progress
+_restarts = 0  # Pools restarted after a render timed out
+_last_worker: Optional[Dict[str, Any]] = None  # Status of the worker that did the last pooled render
+_pool_lock = threading.Lock()
+
+# Renders done by this worker process (in a worker)
+_worker_renders = 0
+_worker_warmed: List[str] = []
+_worker_warmup_error: Optional[str] = None  # Set by the warm-up if the fork server isn't safe to fork
+
+def start_render_pool():
+    """
+    Start the render worker pool in the background (once per app process).
+
+    Returns immediately; renders go to the pool once its workers are warm.
+    """
+    global _state, _started_at
+
+    with _pool_lock:
+        if _state != 'cold':
+            return
+        if RENDER_WORKERS <= 0:
+            _state = 'disabled'
+            return
+
+        import multiprocessing
+        if 'forkserver' not in multiprocessing.get_all_start_methods():
+            _state = 'disabled'
+            return
+
+        _state = 'starting'
+        _started_at = time.time()
+
+    threading.Thread(target=_start_pool, name='render-pool-start', daemon=True).start()
+
+def _start_pool():
+    """Create the pool and wait until every worker has answered (run in a background thread)."""
+    global _pool, _state, _warm_seconds, _error
+
+    try:
+        import multiprocessing
+
+        # Forking the multi-threaded server process itself isn't safe - workers
+        # come from a fork server that has loaded and warmed everything first
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([WARMUP_MODULE])
+
+        pool = context.Pool(processes=RENDER_WORKERS, maxtasksperchild=RENDER_WORKER_MAX_RENDERS)
+        statuses = [pool.apply_async(_worker_status) for _ in range(RENDER_WORKERS)]
+        for status in statuses:
+            warmup_error = status.get(timeout=RENDER_TIMEOUT * 5)['warmup_error']
+            if warmup_error:
+                pool.terminate()
+                raise RuntimeError(warmup_error)
+    except Exception as e:
+        with _pool_lock:
+            _state = 'failed'
+            _error = str(e)
+        return
+
+    with _pool_lock:
+        _pool = pool
+        _state = 'warm'
+        _warm_seconds = time.time() - _started_at
+        _error = None
+    atexit.register(stop_render_pool)
+
+def stop_render_pool():
+    """Terminate the worker pool (the app then renders in-process)."""
+    global _pool, _state
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+        if _state in ('starting', 'warm'):
+            _state = 'cold'
+    if pool is not None:
+        pool.terminate()
+
+def render_report(template_path: str, form_data: Dict[str, Any]) -> bytes:
+    """
+    Render a report, in a warm worker if the pool is running.
+
+    Falls back to rendering in this process if the pool isn't warm yet, isn't
+    running any more or the worker times out (the pool is then restarted).
+    Errors raised by the render itself are raised here, not retried in-process.
+
+    Args:
+        template_path: Path to the Word template file
+        form_data: Form data to render
+
+    Returns:
+        bytes: Generated document as bytes
+    """
+    global _renders, _fallback_renders, _busy, _last_worker
+
+    pool = _pool
+    if pool is not None:
+        import multiprocessing
+        from multiprocessing.pool import RemoteTraceback
+
+        with _pool_lock:
+            _busy += 1
+        try:
+            result = pool.apply_async(_render_in_worker, (os.path.abspath(template_path), form_data))
+            doc_bytes, worker = result.get(timeout=RENDER_TIMEOUT)
+            with _pool_lock:
+                _renders += 1
+                _last_worker = worker
+            return doc_bytes
+        except multiprocessing.TimeoutError:
+            _restart_pool(pool)
+        except Exception as e:
+            # Errors raised in the worker carry its traceback; anything else is the pool failing
+            if isinstance(e.__cause__, RemoteTraceback):
+                raise
+        finally:
+            with _pool_lock:
+                _busy -= 1
+
+    from src.utils.document_generator import render_document
+
+    with _pool_lock:
+        _fallback_renders += 1
+    return render_document(template_path, form_data)
+
+def _restart_pool(pool):
+    """Replace a pool whose worker didn't finish a render: terminate it and start a new one."""
+    global _pool, _state, _error, _restarts
+
+    with _pool_lock:
+        if _pool is not pool:
+            return  # Already replaced (another render timed out on it too)
+        _pool = None
+        _state = 'cold'
+        _restarts += 1
+        _error = f"A worker didn't finish a render in {RENDER_TIMEOUT:.0f} s; the pool was restarted"
+    threading.Thread(target=pool.terminate, name='render-pool-terminate', daemon=True).start()
+    start_render_pool()
+
+def get_render_pool_status() -> Dict[str, Any]:
+    """
+    Health check for the render pool.
+
+    Workers aren't pinged - a ping would count towards their
+    ``RENDER_WORKER_MAX_RENDERS`` and wait behind renders in progress - so the
+    worker details are those reported with the last pooled render.
+
+    Returns:
+        Dict with 'state' ('warm', 'starting', 'cold', 'failed' or 'disabled'),
+        'workers', 'busy' (pooled renders in progress), 'max_renders_per_worker',
+        'renders' (done by workers), 'fallback_renders' (done in the app process),
+        'restarts' (after a render timed out), 'warm_seconds' (startup to warm),
+        'error' and 'worker' (pid, renders and warmed templates of the worker
+        that did the last pooled render, or None)
+    """
+    with _pool_lock:
+        return {
+            'state': _state,
+            'workers': RENDER_WORKERS if _state in ('starting', 'warm') else 0,
+            'busy': _busy,
+            'max_renders_per_worker': RENDER_WORKER_MAX_RENDERS,
+            'renders': _renders,
+            'fallback_renders': _fallback_renders,
+            'restarts': _restarts,
+            'warm_seconds': _warm_seconds,
+            'error': _error,
+            'worker': _last_worker,
+        }
+
+def warm_render_caches() -> List[str]:
+    """
+    Import the rendering libraries and fill the template caches.
+
+    Renders every report template once with sample data, which preprocesses,
+    compiles and analyses it and exercises the jinja/lxml code paths. The
+    chart drawing threads are stopped afterwards; if any other thread is still
+    running, the error is recorded for the workers to report.
+
+    Returns:
+        Paths of the templates that were warmed
+    """
+    global _worker_warmup_error
+
+    from src.utils.airflow_charts import stop_chart_workers
+    from src.utils.document_generator import render_document
+    from src.utils.template_engine import BENCHMARK_FORM_DATA
+
+    warmed = []
+    for file_name in REPORT_TEMPLATES.values():
+        template_path = os.path.join(TEMPLATES_DIR, file_name)
+        if not os.path.exists(template_path):
+            continue
+        try:
+            render_document(template_path, BENCHMARK_FORM_DATA)
+            warmed.append(template_path)
+        except Exception:
+            pass
+    stop_chart_workers()
+
+    threads = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+    if threads:
+        _worker_warmup_error = f"The render warm-up left threads running in the fork server: {', '.join(threads)}"
+    _worker_warmed[:] = warmed
+    return warmed
+
+def _render_in_worker(template_path: str, form_data: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+    """Pool task: render one report in a worker; returns the document and the worker's status."""
+    global _worker_renders
+
+    from src.utils.document_generator import render_document
+
+    doc_bytes = render_document(template_path, form_data)
+    _worker_renders += 1
+    return doc_bytes, _worker_status()
+
+def _worker_status() -> Dict[str, Any]:
+    """Pool task: report the worker's pid, render count, warmed templates and any warm-up error."""
+    return {
+        'pid': os.getpid(),
+        'renders': _worker_renders,
+        'warmed_templates': [os.path.basename(path) for path in _worker_warmed],
+        'warmup_error': _worker_warmup_error,
+    }
+
+def main():
+    """Start the pool, wait for it to warm up and compare a pooled render with a cold one."""
+    import argparse
+    import json
+
+    from src.utils.template_engine import BENCHMARK_FORM_DATA
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('template', nargs='?', default=os.path.join(TEMPLATES_DIR, REPORT_TEMPLATES["Canopy Commissioning"]))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from src.utils.document_generator import render_document
+    render_document(args.template, BENCHMARK_FORM_DATA)
+    print(f"Cold render in this process: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    start_render_pool()
+    while _state == 'starting':
+        time.sleep(0.1)
+    print(f"Pool {_state} after {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    render_report(args.template, BENCHMARK_FORM_DATA)
+    print(f"Pooled render: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(json.dumps(get_render_pool_status(), indent=1))
+    stop_render_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""
+Render pool warm-up, imported by the pool's fork server before it forks any worker.
+
+Importing this module loads the rendering libraries and fills the template
+caches, so every worker starts with them already in (shared) memory.
+"""
+from src.utils.render_pool import warm_render_caches
+
+warm_render_caches()
@@ -0,0 +1,251 @@
+"""
+Archive of generated reports.
+
+Every generated report (.docx, and its PDF if one was made) is kept in a local
+content-addressed archive: files are stored once under their SHA-256 in
+``REPORT_ARCHIVE_DIR/objects``, so generating the same report again - or
+archiving it from another session - stores nothing new. Documents are stored
+with fixed zip timestamps (``output_optimizer.normalize_docx``), as the time
+a report was rendered would otherwise make every copy distinct.
+
+A SQLite index (WAL mode, safe to share between app processes on one host)
+records each report's metadata - client, project number, report type, file
+name, engineer, date of visit and the canopy models - so the archive can be
+listed and searched without opening any file.
+
+Reports older than ``REPORT_ARCHIVE_RETENTION_DAYS`` are removed, and the oldest
+reports are removed while the archive is over ``REPORT_ARCHIVE_MAX_BYTES``.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config import REPORT_ARCHIVE_DIR, REPORT_ARCHIVE_RETENTION_DAYS, REPORT_ARCHIVE_MAX_BYTES
+
+INDEX_FILE = 'index.sqlite3'
+
+# Index columns returned by list_reports/get_report
+REPORT_COLUMNS = [
+    'sha256', 'file_name', 'size', 'pdf_sha256', 'pdf_size', 'client_name', 'project_number', 'project_name',
+    'report_type', 'engineer_name', 'date_of_visit', 'models', 'job_id', 'created_at', 'generated_at', 'generations'
+]
+
+_local = threading.local()  # One connection per thread
+_init_lock = threading.Lock()
+_initialized = False
+
+def archive_report(docx: bytes, form_data: Dict[str, Any], file_name: str, pdf: Optional[bytes] = None,
+                   job_id: Optional[str] = None) -> str:
+    """
+    Store a generated report and index its metadata.
+
+    A report whose .docx is already archived isn't stored again; its entry is
+    updated (last generated time, and the PDF if one is given now).
+
+    Args:
+        docx: The report document
+        form_data: Form data the report was generated from (for the metadata)
+        file_name: Download file name (``generate_filename``)
+        pdf: The report as PDF, if it was converted
+        job_id: Job the report belongs to
+
+    Returns:
+        SHA-256 of the .docx (the report's archive ID)
+    """
+    docx = _normalize_docx(docx)
+    sha256 = _store_object(docx, '.docx')
+    pdf_sha256 = _store_object(pdf, '.pdf') if pdf else None
+    now = time.time()
+
+    models = sorted({canopy.get('canopy_model') for canopy in form_data.get('canopies', []) if canopy.get('canopy_model')})
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO reports (sha256, file_name, size, pdf_sha256, pdf_size, client_name, project_number, project_name, "
+            "report_type, engineer_name, date_of_visit, models, job_id, created_at, generated_at, generations) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT(sha256) DO UPDATE SET generated_at = excluded.generated_at, generations = reports.generations + 1, "
+            "pdf_sha256 = COALESCE(excluded.pdf_sha256, reports.pdf_sha256), pdf_size = COALESCE(excluded.pdf_size, reports.pdf_size)",
+            (sha256, file_name, len(docx), pdf_sha256, len(pdf) if pdf else None,
+             str(form_data.get('client_name') or ''), str(form_data.get('project_number') or ''),
+             str(form_data.get('project_name') or ''), str(form_data.get('report_type') or ''),
+             str(form_data.get('engineer_name') or ''), str(form_data.get('date_of_visit') or ''),
+             ', '.join(models), job_id, now, now)
+        )
+
+    prune_archive()
+    return sha256
+
+def list_reports(search: str = '', limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    List archived reports, newest first.
+
+    Args:
+        search: Text to look for in the client, project number/name, file name, engineer or models
+        limit: Maximum number of reports
+        offset: Number of reports to skip (for paging)
+
+    Returns:
+        Report metadata dicts (see ``REPORT_COLUMNS``)
+    """
+    query = f"SELECT {', '.join(REPORT_COLUMNS)} FROM reports"
+    params: list = []
+    if search.strip():
+        pattern = f"%{search.strip()}%"
+        query += (" WHERE client_name LIKE ? OR project_number LIKE ? OR project_name LIKE ? "
+                  "OR file_name LIKE ? OR engineer_name LIKE ? OR models LIKE ?")
+        params += [pattern] * 6
+    query += " ORDER BY generated_at DESC LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    return [dict(zip(REPORT_COLUMNS, row)) for row in _connect().execute(query, params).fetchall()]
+
+def get_report(sha256: str) -> Optional[Dict[str, Any]]:
+    """Metadata of an archived report, or None if it isn't in the archive."""
+    row = _connect().execute(f"SELECT {', '.join(REPORT_COLUMNS)} FROM reports WHERE sha256 = ?", (sha256,)).fetchone()
+    return dict(zip(REPORT_COLUMNS, row)) if row else None
+
+def read_report(sha256: str, pdf: bool = False) -> Optional[bytes]:
+    """
+    Read an archived report's file.
+
+    Args:
+        sha256: Report ID (SHA-256 of the .docx)
+        pdf: Read the PDF instead of the .docx
+
+    Returns:
+        File contents, or None if the report (or its PDF) isn't archived
+    """
+    report = get_report(sha256)
+    if report is None or (pdf and not report['pdf_sha256']):
+        return None
+    path = _object_path(report['pdf_sha256'], '.pdf') if pdf else _object_path(sha256, '.docx')
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def prune_archive(now: Optional[float] = None) -> int:
+    """
+    Apply the retention settings: remove reports past the retention period, then
+    the oldest reports while the archive is over its size limit.
+
+    Args:
+        now: Current time (for testing)
+
+    Returns:
+        Number of reports removed
+    """
+    now = time.time() if now is None else now
+    conn = _connect()
+    expired = []
+    if REPORT_ARCHIVE_RETENTION_DAYS:
+        cutoff = now - REPORT_ARCHIVE_RETENTION_DAYS * 86400
+        expired = [row[0] for row in conn.execute("SELECT sha256 FROM reports WHERE generated_at < ?", (cutoff,))]
+
+    if REPORT_ARCHIVE_MAX_BYTES:
+        total = get_archive_stats()['bytes']
+        for sha256, size in conn.execute(
+                "SELECT sha256, size + COALESCE(pdf_size, 0) FROM reports ORDER BY generated_at"):
+            if total <= REPORT_ARCHIVE_MAX_BYTES:
+                break
+            if sha256 not in expired:
+                expired.append(sha256)
+            total -= size
+
+    for sha256 in expired:
+        delete_report(sha256)
+    return len(expired)
+
+def delete_report(sha256: str) -> bool:
+    """Remove a report from the index, and its files unless another report uses them."""
+    with _connect() as conn:
+        row = conn.execute("SELECT pdf_sha256 FROM reports WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM reports WHERE sha256 = ?", (sha256,))
+        pdf_in_use = row[0] and conn.execute("SELECT 1 FROM reports WHERE pdf_sha256 = ?", (row[0],)).fetchone()
+
+    _remove_object(sha256, '.docx')
+    if row[0] and not pdf_in_use:
+        _remove_object(row[0], '.pdf')
+    return True
+
+def get_archive_stats() -> Dict[str, Any]:
+    """Number of archived reports and the bytes their files take."""
+    count, total = _connect().execute("SELECT COUNT(*), COALESCE(SUM(size + COALESCE(pdf_size, 0)), 0) FROM reports").fetchone()
+    return {'reports': count, 'bytes': total}
+
+def _connect() -> sqlite3.Connection:
+    """Get this thread's index connection, creating the index on first use."""
+    global _initialized
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(REPORT_ARCHIVE_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(REPORT_ARCHIVE_DIR, INDEX_FILE), timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+
+    if not _initialized:
+        with _init_lock, conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    sha256 TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    pdf_sha256 TEXT,
+                    pdf_size INTEGER,
+                    client_name TEXT NOT NULL,
+                    project_number TEXT NOT NULL,
+                    project_name TEXT NOT NULL,
+                    report_type TEXT NOT NULL,
+                    engineer_name TEXT NOT NULL,
+                    date_of_visit TEXT NOT NULL,
+                    models TEXT NOT NULL,
+                    job_id TEXT,
+                    created_at REAL NOT NULL,
+                    generated_at REAL NOT NULL,
+                    generations INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS reports_generated_at ON reports (generated_at);
+                CREATE INDEX IF NOT EXISTS reports_client_name ON reports (client_name);
+                CREATE INDEX IF NOT EXISTS reports_project_number ON reports (project_number);
+                CREATE INDEX IF NOT EXISTS reports_pdf_sha256 ON reports (pdf_sha256);
+            """)
+            _initialized = True
+    return conn
+
+def _normalize_docx(docx: bytes) -> bytes:
+    """The document with fixed zip timestamps, so each render of the same report gets the same ID."""
+    try:
+        from src.utils.output_optimizer import normalize_docx
+        return normalize_docx(docx)
+    except Exception:
+        return docx  # Not a zip - archived as it is
+
+def _store_object(data: bytes, extension: str) -> str:
+    """Store a file under its SHA-256 (no-op if it is already stored)."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = _object_path(sha256, extension)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Via a temporary file and rename, so readers never see it half-written
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return sha256
+
+def _remove_object(sha256: str, extension: str):
+    try:
+        os.remove(_object_path(sha256, extension))
+    except OSError:
+        pass
+
+def _object_path(sha256: str, extension: str) -> str:
+    # Two-level fan-out keeps directories small
+    return os.path.join(REPORT_ARCHIVE_DIR, 'objects', sha256[:2], sha256 + extension)
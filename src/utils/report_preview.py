@@ -0,0 +1,196 @@
+"""
+HTML preview of a report, built from the template context.
+
+Checking a report used to mean rendering, downloading and opening the .docx.
+``build_report_preview()`` renders the same computed values (section
+flowrates, K-factors, results tables and percentages) as HTML instead, which
+takes milliseconds. Each canopy's HTML is cached under the same content hash
+as its template context (see ``build_canopy_contexts``), so after an edit only
+the canopies whose data changed are rendered again.
+"""
+import threading
+import time
+from collections import OrderedDict
+from html import escape
+from typing import Any, Dict, List, Tuple
+
+from src.config import CANOPY_CONTEXT_CACHE_SIZE
+
+# Canopy content hash -> canopy HTML (LRU, shared by all sessions in a process)
+_canopy_html_cache: 'OrderedDict[str, str]' = OrderedDict()
+_canopy_html_lock = threading.Lock()
+
+# Section table columns, in report order: section context key -> heading
+SECTION_COLUMNS = [
+    ('index', 'Section'),
+    ('extract_ksa', 'KSA'),
+    ('extract_tab_reading', 'T.A.B. (Pa)'),
+    ('extract_k_factor', 'K-factor'),
+    ('anemometer_reading', 'Anemometer (m/s)'),
+    ('free_area', 'Free area (m²)'),
+    ('extract_flowrate_m3h', 'Extract (m³/h)'),
+    ('extract_flowrate_m3s', 'Extract (m³/s)'),
+    ('supply_plenum_length', 'Supply plenum'),
+    ('supply_tab_reading', 'Supply T.A.B. (Pa)'),
+    ('supply_anemometer_reading', 'Supply anemometer (m/s)'),
+    ('supply_flowrate_m3s', 'Supply (m³/s)'),
+    ('min_percent', 'Min %'),
+    ('idle_percent', 'Idle %'),
+    ('design_m3s', 'Design (m³/s)'),
+]
+
+PREVIEW_STYLE = """
+<style>
+.report-preview { font-family: sans-serif; font-size: 0.9rem; }
+.report-preview h3 { margin: 1.2em 0 0.4em; }
+.report-preview table { border-collapse: collapse; margin-bottom: 0.8em; }
+.report-preview th, .report-preview td { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }
+.report-preview th { background: #f0f2f6; }
+.report-preview td:first-child, .report-preview th:first-child { text-align: left; }
+.report-preview .total td { font-weight: bold; }
+</style>
+"""
+
+def build_report_preview(form_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Render an HTML preview of the report for the given form data.
+
+    Args:
+        form_data: Form data to preview
+
+    Returns:
+        Tuple of (HTML, stats dict with 'canopies', 'rendered' (canopies rendered
+        this time, the rest came from the cache) and 'seconds')
+    """
+    from src.utils.document_generator import prepare_template_context
+
+    start = time.perf_counter()
+    context = prepare_template_context(form_data, None)
+
+    parts = [PREVIEW_STYLE, '<div class="report-preview">', render_job_html(context)]
+
+    rendered = 0
+    canopies_data = form_data.get('canopies', [])
+    for canopy_context in context['canopies']:
+        cache_key = canopy_context.cache_key
+        with _canopy_html_lock:
+            canopy_html = _canopy_html_cache.get(cache_key)
+            if canopy_html is not None:
+                _canopy_html_cache.move_to_end(cache_key)
+
+        if canopy_html is None:
+            canopy_html = render_canopy_html(canopy_context)
+            rendered += 1
+            with _canopy_html_lock:
+                _canopy_html_cache[cache_key] = canopy_html
+                while len(_canopy_html_cache) > CANOPY_CONTEXT_CACHE_SIZE:
+                    _canopy_html_cache.popitem(last=False)
+        parts.append(canopy_html)
+
+    parts.append(render_results_html(context))
+    parts.append('</div>')
+
+    return ''.join(parts), {
+        'canopies': len(canopies_data),
+        'rendered': rendered,
+        'seconds': time.perf_counter() - start,
+    }
+
+def render_job_html(context) -> str:
+    """Job details table (client, project, visit date, engineer)."""
+    rows = [
+        ('Report type', context['report_type']),
+        ('Client', context['client_name']),
+        ('Project', context['project_name']),
+        ('Project number', context['project_number']),
+        ('Date of visit', context['date_of_visit']),
+        ('Engineer(s)', context['engineer_name']),
+    ]
+    return '<h3>Job</h3>' + _table(None, [[label, value] for label, value in rows])
+
+def render_canopy_html(canopy: Dict[str, Any]) -> str:
+    """
+    Preview of one canopy: its details, section readings and totals.
+
+    Args:
+        canopy: Canopy context (from build_canopy_context)
+
+    Returns:
+        HTML fragment
+    """
+    title = f"Canopy {canopy['index']}"
+    if canopy.get('drawing_number'):
+        title += f" - {canopy['drawing_number']}"
+
+    details = [
+        ['Model', canopy.get('canopy_model', '')],
+        ['Location', canopy.get('canopy_location', '')],
+        ['Design extract (m³/s)', _format(canopy.get('design_airflow'))],
+        ['Actual extract (m³/s)', _format(canopy.get('extract_total_flowrate_m3s'))],
+        ['Extract', _percentage(canopy.get('extract_total_flowrate_m3s'), canopy.get('design_airflow'))],
+    ]
+    if canopy.get('has_f_in_name') and canopy.get('supply_airflow'):
+        details += [
+            ['Design supply (m³/s)', _format(canopy.get('supply_airflow'))],
+            ['Actual supply (m³/s)', _format(canopy.get('supply_total_flowrate_m3s'))],
+            ['Supply', _percentage(canopy.get('supply_total_flowrate_m3s'), canopy.get('supply_airflow'))],
+        ]
+    for checklist_key, label in (('uv_checklist', 'UV checklist'), ('water_wash_checklist', 'Water wash checklist')):
+        checklist = canopy.get(checklist_key)
+        if checklist:
+            details.append([label, f"{checklist['completed_items']}/{checklist['total_items']} "
+                                   f"({checklist['completion_percentage']:.0f}%)"])
+
+    sections = canopy.get('sections', [])
+    columns = [(key, heading) for key, heading in SECTION_COLUMNS if any(key in section for section in sections)]
+    section_rows = [[_format(section.get(key)) for key, _ in columns] for section in sections]
+
+    html = f"<h3>{escape(title)}</h3>" + _table(None, details)
+    if section_rows:
+        html += _table([heading for _, heading in columns], section_rows)
+    return html
+
+def render_results_html(context) -> str:
+    """Results summary tables (extract and supply) with totals."""
+    html = '<h3>Results Summary</h3>'
+    headings = ['Drawing number', 'Design (m³/s)', 'Actual (m³/s)', '%']
+
+    extract_rows = [[row['drawing_number'], row['design_flow_rate'], row['actual_flowrate'], row['percentage']]
+                    for row in context['extract_results']]
+    html += '<b>Extract air</b>' + _table(headings, extract_rows, [
+        'TOTAL', context['extract_total_design'], context['extract_total_actual'], context['extract_total_percentage']
+    ])
+
+    supply_rows = [[row['drawing_number'], row['design_flow_rate'], row['actual_flowrate'], row['percentage']]
+                   for row in context['supply_results']]
+    if supply_rows:
+        html += '<b>Supply air</b>' + _table(headings, supply_rows, [
+            'TOTAL', context['supply_total_design'], context['supply_total_actual'], context['supply_total_percentage']
+        ])
+    return html
+
+def _table(headings, rows: List[list], total: list = None) -> str:
+    """HTML table (values are escaped)."""
+    html = '<table>'
+    if headings:
+        html += '<tr>' + ''.join(f"<th>{escape(str(heading))}</th>" for heading in headings) + '</tr>'
+    for row in rows:
+        html += '<tr>' + ''.join(f"<td>{escape(str(value))}</td>" for value in row) + '</tr>'
+    if total:
+        html += '<tr class="total">' + ''.join(f"<td>{escape(str(value))}</td>" for value in total) + '</tr>'
+    return html + '</table>'
+
+def _format(value: Any) -> str:
+    """Display a context value ('' for missing, floats without trailing zeros)."""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.3f}".rstrip('0').rstrip('.')
+    return str(value)
+
+def _percentage(actual: Any, design: Any) -> str:
+    """Actual as a percentage of design, like the results summary ('' without a design value)."""
+    try:
+        return f"{float(actual) / float(design) * 100:.1f}%" if design else ''
+    except (TypeError, ValueError):
+        return ''
@@ -0,0 +1,248 @@
+"""
+Canopy schedule import.
+
+Reads the canopy schedule exported from the design drawings (CSV or Excel),
+validates every row against ``CANOPY_MODELS`` and the K-factor catalogue in one
+vectorized pass, and converts the rows into ``form_data['canopies']`` entries.
+"""
+import io
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.config import (
+    CANOPY_MODELS, MAX_CANOPIES, MAX_SECTIONS, get_k_factor_data,
+    calculate_free_area_from_grill_size
+)
+from src.utils.k_factor_tables import lookup_k_factors
+from src.utils.session_manager import get_form_data, update_form_data, clear_canopy_widget_keys
+
+# Accepted column headings (normalised: lowercase, non-alphanumerics -> '_') per field
+COLUMN_ALIASES = {
+    'drawing_number': ['drawing_number', 'drawing_no', 'drawing', 'dwg_no', 'dwg'],
+    'canopy_location': ['canopy_location', 'location', 'area'],
+    'canopy_model': ['canopy_model', 'model', 'canopy_type', 'type'],
+    'number_of_sections': ['number_of_sections', 'sections', 'no_of_sections', 'quantity_of_sections',
+                           'quantity_of_grills', 'grills'],
+    'design_airflow': ['design_airflow', 'design_airflow_m3_s', 'design_flowrate', 'design_flowrate_m3_s',
+                       'extract_design', 'extract_airflow'],
+    'supply_airflow': ['supply_airflow', 'supply_airflow_m3_s', 'supply_design', 'supply_flowrate'],
+    'canopy_length': ['canopy_length', 'canopy_length_mm', 'length', 'length_mm'],
+    'grill_size': ['grill_size', 'grill_size_mm'],
+    'slot_length': ['slot_length', 'length_of_slot', 'length_of_slot_mm', 'slot_length_mm'],
+    'slot_width': ['slot_width', 'width_of_slot', 'width_of_slot_mm', 'slot_width_mm'],
+    'with_marvel': ['with_marvel', 'marvel'],
+}
+
+REQUIRED_COLUMNS = ['drawing_number', 'canopy_model']
+
+NUMERIC_DEFAULTS = {
+    'number_of_sections': 1,
+    'design_airflow': 0.0,
+    'supply_airflow': 0.0,
+    'canopy_length': 1000,
+    'slot_length': 0.0,
+    'slot_width': 85.0,
+}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', '✓'}
+
+def read_schedule(file_name: str, data: bytes) -> pd.DataFrame:
+    """
+    Read a canopy schedule file into a DataFrame with normalised column names.
+
+    Args:
+        file_name: Original file name (used to pick CSV or Excel parsing)
+        data: Raw file contents
+
+    Returns:
+        DataFrame with columns renamed to form field names (unknown columns dropped)
+
+    Raises:
+        ValueError: If the file cannot be parsed or required columns are missing
+    """
+    try:
+        if file_name.lower().endswith(('.xlsx', '.xlsm', '.xls')):
+            df = pd.read_excel(io.BytesIO(data), dtype=str)  # Needs openpyxl for .xlsx
+        else:
+            # Blank lines are kept (and dropped below) so the index still matches the file's rows
+            df = pd.read_csv(io.BytesIO(data), dtype=str, sep=None, engine='python', encoding='utf-8-sig',
+                             skip_blank_lines=False)
+    except ImportError as e:
+        raise ValueError(f"Excel support is not installed ({e}). Save the schedule as CSV or install openpyxl.")
+    except Exception as e:
+        raise ValueError(f"Could not read schedule: {e}")
+
+    rename = {}
+    for column in df.columns:
+        normalised = re.sub(r'[^a-z0-9]+', '_', str(column).strip().lower()).strip('_')
+        for field, aliases in COLUMN_ALIASES.items():
+            if normalised in aliases and field not in rename.values():
+                rename[column] = field
+                break
+
+    df = df.rename(columns=rename)[list(rename.values())]
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Schedule is missing required column(s): {', '.join(missing)}")
+
+    # Drop completely blank rows (common at the end of exported spreadsheets). The original
+    # index is kept, so errors still name the right spreadsheet row after a blank line
+    return df.dropna(how='all')
+
+def validate_schedule(df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Validate all schedule rows in one pass and convert them to canopy dicts.
+
+    Args:
+        df: Schedule DataFrame from read_schedule()
+
+    Returns:
+        Tuple of (canopies, errors). Canopies are only returned when there are no errors.
+    """
+    errors = []
+    df = df.copy()
+    row_numbers = df.index.to_numpy() + 2  # Spreadsheet row (1-based, after the header)
+
+    if len(df) == 0:
+        return [], ["Schedule has no canopy rows"]
+    if len(df) > MAX_CANOPIES:
+        errors.append(f"Schedule has {len(df)} canopies - the maximum is {MAX_CANOPIES}")
+
+    for column in ('drawing_number', 'canopy_location', 'canopy_model', 'grill_size', 'with_marvel'):
+        if column not in df.columns:
+            df[column] = ''
+        df[column] = df[column].fillna('').astype(str).str.strip()
+    df['canopy_model'] = df['canopy_model'].str.upper()
+
+    for column, default in NUMERIC_DEFAULTS.items():
+        raw = df[column] if column in df.columns else pd.Series([None] * len(df), index=df.index)
+        numeric = pd.to_numeric(raw, errors='coerce')
+        bad = raw.notna() & (raw.astype(str).str.strip() != '') & numeric.isna()
+        for row in row_numbers[bad.to_numpy()]:
+            errors.append(f"Row {row}: '{column}' is not a number")
+        df[column] = numeric.fillna(default)
+
+    k_factor_data = get_k_factor_data()
+    model_types = df['canopy_model'].map(lambda model: k_factor_data.get(model, {}).get('type', ''))
+
+    # Model must be a known canopy model
+    unknown_model = ~df['canopy_model'].isin(CANOPY_MODELS)
+    for row, model in zip(row_numbers[unknown_model.to_numpy()], df.loc[unknown_model, 'canopy_model']):
+        errors.append(f"Row {row}: unknown canopy model '{model}'" if model else f"Row {row}: canopy model is blank")
+
+    # Section count must be within range for models that use sections
+    sections = df['number_of_sections']
+    uses_sections = ~unknown_model & (model_types != 'length_based')
+    bad_sections = uses_sections & ((sections < 1) | (sections > MAX_SECTIONS) | (sections != np.round(sections)))
+    for row in row_numbers[bad_sections.to_numpy()]:
+        errors.append(f"Row {row}: number of sections must be a whole number from 1 to {MAX_SECTIONS}")
+
+    # K-factor tables must cover the model (section-based) or the canopy length (length-based)
+    is_section_based = (model_types == 'section_based').to_numpy()
+    is_length_based = (model_types == 'length_based').to_numpy()
+    lookup_values = np.where(is_length_based, df['canopy_length'].to_numpy(dtype=float), 1.0)
+    k_factors = lookup_k_factors(df['canopy_model'].tolist(), lookup_values)
+    missing_k_factor = (is_section_based | is_length_based) & (k_factors <= 0)
+    for row, model in zip(row_numbers[missing_k_factor], df['canopy_model'].to_numpy()[missing_k_factor]):
+        errors.append(f"Row {row}: no K-factor data for model '{model}'")
+
+    for model in set(df.loc[is_length_based, 'canopy_model']):
+        lengths = sorted(k_factor_data[model]['length_ranges'])
+        out_of_range = is_length_based & (df['canopy_model'] == model).to_numpy() & (
+            (df['canopy_length'] < lengths[0]) | (df['canopy_length'] > lengths[-1])).to_numpy()
+        for row in row_numbers[out_of_range]:
+            errors.append(f"Row {row}: canopy length for {model} must be {lengths[0]}-{lengths[-1]}mm")
+
+    # Airflows can't be negative
+    for column in ('design_airflow', 'supply_airflow'):
+        for row in row_numbers[(df[column] < 0).to_numpy()]:
+            errors.append(f"Row {row}: '{column}' can't be negative")
+
+    # CXW models need a parseable grill size for the free area calculation
+    is_cxw = (df['canopy_model'] == 'CXW').to_numpy()
+    for row, grill_size in zip(row_numbers[is_cxw], df.loc[is_cxw, 'grill_size']):
+        if calculate_free_area_from_grill_size(grill_size) <= 0:
+            errors.append(f"Row {row}: CXW canopies need a grill size like '600x600'")
+
+    if errors:
+        return [], errors
+
+    df['with_marvel'] = df['with_marvel'].str.lower().isin(TRUE_VALUES)
+    return [_row_to_canopy(row) for row in df.to_dict('records')], []
+
+def _row_to_canopy(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a validated schedule row to a canopy dict in the form_data format."""
+    canopy_model = row['canopy_model']
+    model_type = get_k_factor_data().get(canopy_model, {}).get('type', '')
+
+    canopy = {
+        'drawing_number': row['drawing_number'],
+        'canopy_location': row['canopy_location'],
+        'canopy_model': canopy_model,
+        'with_marvel': bool(row['with_marvel']),
+        'with_uv_checks': False,
+        'with_water_wash_checks': False,
+        'design_airflow': float(row['design_airflow']),
+        'supply_airflow': 0.0 if canopy_model in ('CXW', 'CMWI') else float(row['supply_airflow']),
+        'number_of_sections': 1 if model_type == 'length_based' else int(row['number_of_sections'])
+    }
+
+    if model_type == 'length_based':
+        canopy['canopy_length'] = int(row['canopy_length'])
+    if canopy_model == 'CXW':
+        canopy['grill_size'] = row['grill_size']
+    if canopy_model in ('CMWF', 'CMWI'):
+        canopy['slot_length'] = float(row['slot_length'])
+        canopy['slot_width'] = float(row['slot_width'])
+
+    return canopy
+
+def apply_schedule(canopies: List[Dict[str, Any]]):
+    """
+    Replace the job's canopies with imported ones in a single update.
+
+    Sets ``form_data['canopies']``/``num_canopies`` and the matching widget keys,
+    and drops widget state left over from the previous canopies so the widgets
+    pick up the imported values. Must run before the canopy widgets are created
+    in the current script run.
+
+    Args:
+        canopies: Validated canopy dicts from validate_schedule()
+    """
+    # Widget state from the previous canopies would otherwise override the import
+    clear_canopy_widget_keys()
+
+    widget_values = {'num_canopies': len(canopies)}
+    for i, canopy in enumerate(canopies):
+        widget_values.update({
+            f"drawing_number_{i}": canopy['drawing_number'],
+            f"canopy_location_{i}": canopy['canopy_location'],
+            f"canopy_model_{i}": canopy['canopy_model'],
+            f"with_marvel_{i}": canopy['with_marvel'],
+            f"design_airflow_{i}": canopy['design_airflow'],
+        })
+        if canopy['canopy_model'] == 'CXW':
+            widget_values[f"grill_size_{i}"] = canopy['grill_size']
+            widget_values[f"number_of_grills_{i}"] = canopy['number_of_sections']
+        elif 'canopy_length' in canopy:
+            widget_values[f"canopy_length_{i}"] = canopy['canopy_length']
+            widget_values[f"supply_airflow_{i}"] = canopy['supply_airflow']
+        else:
+            widget_values[f"number_of_sections_{i}"] = canopy['number_of_sections']
+            widget_values[f"supply_airflow_{i}"] = canopy['supply_airflow']
+        if canopy['canopy_model'] in ('CMWF', 'CMWI'):
+            widget_values[f"slot_length_{i}"] = canopy['slot_length']
+            widget_values[f"slot_width_{i}"] = canopy['slot_width']
+
+    # Per-canopy checklists belong to the replaced canopies
+    form_data = get_form_data()
+    for key in [key for key in form_data if re.match(r'^canopy_\d+_(?:uv|water_wash)_checklist$', key)]:
+        del form_data[key]
+
+    st.session_state.update(widget_values)
+    update_form_data({'num_canopies': len(canopies), 'canopies': canopies})
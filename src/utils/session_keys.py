@@ -0,0 +1,153 @@
+"""
+Per-canopy widget key registry.
+
+Canopy and section widgets use flat ``st.session_state`` keys
+(``drawing_number_{canopy}``, ``min_percent_{canopy}_{section}``, ...). Building
+those keys through this module records which canopy/section owns each key, so
+that when the number of canopies or sections drops, the keys (and the canopy's
+checklist data) can be removed instead of lingering in the session and
+repopulating old values if the count goes back up.
+"""
+import pickle
+import sys
+from typing import Any, Dict, Optional
+
+import streamlit as st
+
+REGISTRY_KEY = '_key_registry'
+
+# form_data entries stored per canopy outside form_data['canopies']
+CANOPY_FORM_DATA_KEYS = ['canopy_{canopy}_uv_checklist', 'canopy_{canopy}_water_wash_checklist']
+
+def _get_registry() -> Dict[int, Dict[str, Any]]:
+    """Registry: canopy index -> {'keys': set of canopy keys, 'sections': {section index: set of keys}}."""
+    if REGISTRY_KEY not in st.session_state:
+        st.session_state[REGISTRY_KEY] = {}
+    return st.session_state[REGISTRY_KEY]
+
+def register_key(key: str, canopy_index: int, section_idx: Optional[int] = None) -> str:
+    """
+    Record that a widget key belongs to a canopy (or one of its sections).
+
+    Args:
+        key: The session state key
+        canopy_index: Index of the owning canopy
+        section_idx: Index of the owning section, or None for canopy-level keys
+
+    Returns:
+        The key, so calls can be used inline
+    """
+    owner = _get_registry().setdefault(canopy_index, {'keys': set(), 'sections': {}})
+    if section_idx is None:
+        owner['keys'].add(key)
+    else:
+        owner['sections'].setdefault(section_idx, set()).add(key)
+    return key
+
+def canopy_key(field: str, canopy_index: int) -> str:
+    """Widget key for a canopy-level field, e.g. ``canopy_key('canopy_model', 0)`` -> ``'canopy_model_0'``."""
+    return register_key(f"{field}_{canopy_index}", canopy_index)
+
+def section_key(field: str, canopy_index: int, section_idx: int) -> str:
+    """Widget key for a section field, e.g. ``section_key('min_percent', 0, 2)`` -> ``'min_percent_0_2'``."""
+    return register_key(f"{field}_{canopy_index}_{section_idx}", canopy_index, section_idx)
+
+def checklist_key(checklist: str, canopy_index: int, item_index: int) -> str:
+    """Widget key for a per-canopy checklist item, e.g. ``checklist_key('uv', 0, 3)`` -> ``'canopy_0_uv_check_3'``."""
+    return register_key(f"canopy_{canopy_index}_{checklist}_check_{item_index}", canopy_index)
+
+def collect_orphaned_keys(num_canopies: int) -> int:
+    """
+    Remove all keys owned by canopies at or beyond ``num_canopies``.
+
+    Also drops the per-canopy checklist entries from form_data, so a canopy
+    added back later starts empty.
+
+    Args:
+        num_canopies: Current number of canopies
+
+    Returns:
+        Number of keys removed
+    """
+    registry = _get_registry()
+    form_data = st.session_state.get('form_data', {})
+    removed = 0
+
+    for canopy_index in [index for index in registry if index >= num_canopies]:
+        owner = registry.pop(canopy_index)
+        keys = set(owner['keys']).union(*owner['sections'].values())
+        removed += _delete_keys(keys)
+
+        for template in CANOPY_FORM_DATA_KEYS:
+            form_data.pop(template.format(canopy=canopy_index), None)
+
+    return removed
+
+def collect_orphaned_section_keys(canopy_index: int, num_sections: int) -> int:
+    """
+    Remove keys owned by a canopy's sections at or beyond ``num_sections``.
+
+    Args:
+        canopy_index: Index of the canopy
+        num_sections: Current number of sections for that canopy
+
+    Returns:
+        Number of keys removed
+    """
+    owner = _get_registry().get(canopy_index)
+    if not owner:
+        return 0
+
+    removed = 0
+    for section_idx in [index for index in owner['sections'] if index >= num_sections]:
+        removed += _delete_keys(owner['sections'].pop(section_idx))
+    return removed
+
+def get_session_key_stats() -> Dict[str, Any]:
+    """
+    Report how many session state keys this session holds and roughly how big they are.
+
+    Sizes are the pickled size of each value (falling back to ``sys.getsizeof``),
+    which is a reasonable estimate of the memory and serialization cost.
+
+    Returns:
+        Dict with 'total_keys', 'total_bytes', 'registered_keys', 'canopies'
+        (canopy index -> {'keys', 'sections', 'bytes'}) and 'largest' (top 10 (key, bytes))
+    """
+    sizes = {str(key): estimate_size(value) for key, value in st.session_state.items()}
+
+    canopies = {}
+    registered = 0
+    for canopy_index, owner in sorted(_get_registry().items()):
+        keys = set(owner['keys']).union(*owner['sections'].values())
+        live_keys = [key for key in keys if key in sizes]
+        registered += len(live_keys)
+        canopies[canopy_index] = {
+            'keys': len(live_keys),
+            'sections': len(owner['sections']),
+            'bytes': sum(sizes[key] for key in live_keys),
+        }
+
+    return {
+        'total_keys': len(sizes),
+        'total_bytes': sum(sizes.values()),
+        'registered_keys': registered,
+        'canopies': canopies,
+        'largest': sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:10],
+    }
+
+def _delete_keys(keys) -> int:
+    """Delete keys from session state, returning how many were present."""
+    removed = 0
+    for key in keys:
+        if key in st.session_state:
+            del st.session_state[key]
+            removed += 1
+    return removed
+
+def estimate_size(value: Any) -> int:
+    """Approximate size of a session value in bytes."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
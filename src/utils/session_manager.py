@@ -1,9 +1,15 @@
 import streamlit as st
 import json
+import hashlib
 import base64
 import urllib.parse
+import re
+import time
 from typing import Dict, Any, List
 
+from src.utils.form_patch import PatchError, diff_form_data, encode_patch, merge_form_data, normalize_form_data, split_pointer
+from src.utils.session_memory import session_callback
+
 def initialize_session_state():
     """Initialize session state for form data if not exists."""
     if 'form_data' not in st.session_state:
@@ -19,9 +25,14 @@ def get_form_data(key: str = None, default: Any = None):
         return st.session_state.form_data
     return st.session_state.form_data.get(key, default)
 
+def form_data_fingerprint(form_data: Dict[str, Any]) -> str:
+    """Hash of the form data's content (independent of key order), e.g. to tell whether a generated report is current."""
+    return hashlib.sha256(json.dumps(normalize_form_data(form_data), sort_keys=True).encode('utf-8')).hexdigest()
+
 def clear_form_data():
     """Clear all form data from session state."""
     st.session_state.form_data = {}
+    st.session_state.pop('generated_document', None)
 
 def serialize_form_data_to_url() -> str:
     """Serialize current form data to a URL-safe string."""
@@ -101,6 +112,287 @@ def load_data_from_url_params():
     
     return False
 
+def is_debug_mode() -> bool:
+    """Check if debug panels are enabled (the DEBUG_ENV_VAR environment variable is set on the server)."""
+    import os
+    from src.config import DEBUG_ENV_VAR
+    
+    return os.environ.get(DEBUG_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
+def get_job_id() -> str:
+    """Get the ID of the job this session is working on, starting a new job if needed."""
+    if 'job_id' not in st.session_state:
+        import uuid
+        st.session_state.job_id = uuid.uuid4().hex
+    return st.session_state.job_id
+
+def load_job_from_url_params() -> bool:
+    """Resume a job from the shared job store if the URL has a ``job`` share token."""
+    try:
+        token = st.query_params.get("job")
+        if not token:
+            return False
+        
+        from src.utils.job_store import get_job_store
+        store = get_job_store()
+        job_id = store.resolve_share_token(token)
+        
+        # Already working on this job in this session
+        if job_id is None or job_id == st.session_state.get('job_id'):
+            return False
+        
+        job = store.load_job(job_id)
+        if job is None:
+            return False
+        
+        form_data, revision = job
+        st.session_state.form_data = form_data
+        st.session_state.pop('form_history', None)  # Undo shouldn't go back to the previous job
+        st.session_state.job_id = job_id
+        st.session_state.job_base = normalize_form_data(form_data)
+        st.session_state.job_revision = revision
+        
+        # Bring back the last generated report so it can be downloaded on this node too
+        artifact = store.load_artifact(job_id, 'report')
+        if artifact:
+            st.session_state.generated_document = {'data': artifact[0], 'file_name': artifact[1].get('file_name', 'report.docx'),
+                                                    'form_fingerprint': artifact[1].get('form_fingerprint')}
+            
+            # ...and its PDF, if one was made from this exact report
+            pdf_artifact = store.load_artifact(job_id, 'report_pdf')
+            if pdf_artifact and pdf_artifact[1].get('docx_sha256') == hashlib.sha256(artifact[0]).hexdigest():
+                st.session_state.generated_document['pdf'] = {'data': pdf_artifact[0], 'file_name': pdf_artifact[1].get('file_name', 'report.pdf')}
+        return True
+    except Exception as e:
+        st.error(f"Error loading shared job: {e}")
+        return False
+
+def get_sync_author() -> str:
+    """Who this session's changes are recorded as: 'technician' if it was opened from a share link, else 'office'."""
+    try:
+        return 'technician' if st.query_params.get("role") == 'technician' else 'office'
+    except Exception:
+        return 'office'
+
+def pull_job_changes() -> int:
+    """
+    Merge changes made to this session's job elsewhere (e.g. by the technician) into the form data.
+    
+    Only the patches since the session's revision are fetched. They are applied
+    to the last synced form data and this session's unsaved edits are replayed
+    on top (see ``merge_form_data``), so edits to different fields both survive
+    and this session's edit wins if both changed the same field. Widgets showing
+    remotely changed values are reset so they pick up the new values.
+    
+    Returns:
+        Number of revisions merged
+    """
+    if 'job_base' not in st.session_state:
+        return 0
+    
+    try:
+        from src.utils.job_store import get_job_store
+        store = get_job_store()
+        job_id = get_job_id()
+        base = st.session_state.job_base
+        
+        patches = store.load_patches(job_id, st.session_state.job_revision)
+        if patches == []:
+            return 0
+        
+        try:
+            if patches is None:
+                raise PatchError("Patch history doesn't reach this revision")
+            remote_patch = [operation for patch in patches for operation in patch['patch']]
+            revision, merged_count = patches[-1]['revision'], len(patches)
+            merged, new_base, visible = merge_form_data(base, normalize_form_data(get_form_data()), remote_patch)
+        except PatchError:
+            # Resync from the full form data
+            job = store.load_job(job_id)
+            if job is None:
+                return 0
+            remote_form_data, revision = job
+            remote_patch = diff_form_data(base, remote_form_data)
+            merged_count = max(1, revision - st.session_state.job_revision)
+            merged, new_base, visible = merge_form_data(base, normalize_form_data(get_form_data()), remote_patch)
+            patches = [{'revision': revision, 'author': None, 'created_at': None, 'size': len(encode_patch(remote_patch))}]
+        
+        st.session_state.form_data = merged
+        st.session_state.job_base = new_base
+        st.session_state.job_revision = revision
+        _record_sync(patches[-1]['author'], patches[-1]['created_at'], pulled_bytes=sum(patch['size'] for patch in patches))
+        
+        for key in _patch_widget_keys(visible):
+            st.session_state.pop(key, None)
+        return merged_count
+    except Exception:
+        return 0  # Sync is best effort - the session keeps working from memory
+
+def autosave_form_data():
+    """
+    Push this run's changes to the shared job store.
+    
+    Only a patch of the fields changed since the last sync is sent. If the job
+    was changed elsewhere in the meantime, those changes are pulled and merged
+    first and the push is retried.
+    
+    The job's share token is put in the URL, so a refresh - served by any app
+    process - resumes the same job.
+    """
+    from src.config import JOB_SYNC_RETRIES
+    
+    form_data = get_form_data()
+    if not any(form_data.values()):
+        return
+    
+    try:
+        from src.utils.job_store import get_job_store
+        store = get_job_store()
+        job_id = get_job_id()
+        
+        for _ in range(JOB_SYNC_RETRIES):
+            current = normalize_form_data(get_form_data())
+            patch = diff_form_data(st.session_state.get('job_base', {}), current)
+            if not patch:
+                break
+            
+            author = get_sync_author()
+            revision = store.append_patch(job_id, st.session_state.get('job_revision', 0), patch, author)
+            if revision is not None:
+                st.session_state.job_base = current
+                st.session_state.job_revision = revision
+                _record_sync(author, time.time(), pushed_bytes=len(encode_patch(patch)))
+                break
+            
+            # Changed elsewhere since our revision - merge and try again
+            st.session_state.setdefault('job_base', {})
+            st.session_state.setdefault('job_revision', 0)
+            pull_job_changes()
+        
+        if "data" not in st.query_params and st.query_params.get("job") is None:
+            st.query_params["job"] = store.create_share_token(job_id)
+    except Exception:
+        pass  # Autosave is best effort - the session keeps working from memory
+
+def _record_sync(author: str, changed_at: float, pulled_bytes: int = 0, pushed_bytes: int = 0):
+    """Remember the last change seen by this session's sync (shown in the Save & Share section)."""
+    sync = st.session_state.setdefault('job_sync', {'pulled_bytes': 0, 'pushed_bytes': 0})
+    sync.update({'author': author, 'changed_at': changed_at})
+    sync['pulled_bytes'] += pulled_bytes
+    sync['pushed_bytes'] += pushed_bytes
+    if pulled_bytes:
+        sync['last_pull_bytes'] = pulled_bytes
+    if pushed_bytes:
+        sync['last_push_bytes'] = pushed_bytes
+
+def _patch_widget_keys(patch: List[list]) -> List[str]:
+    """
+    Widget keys showing the values a patch changes.
+    
+    Top-level and edge box fields use the field name as key, canopy fields
+    ``<field>_{canopy}`` and section fields ``<field>_{canopy}_{section}``
+    (see ``session_keys``); the canopy's section grid is reset too.
+    """
+    keys = set()
+    for operation in patch:
+        tokens = split_pointer(operation[1])
+        if not tokens:
+            continue
+        if tokens[0] == 'canopies':
+            if len(tokens) == 2 and tokens[1].isdigit():
+                # The whole canopy was replaced - reset all of its widgets
+                canopy_keys = re.compile(rf'^(?:\D+_{tokens[1]}(?:_\d+)?|canopy_{tokens[1]}_\D+_\d+)$')
+                keys.add(f"section_grid_{tokens[1]}")
+                keys.update(key for key in st.session_state.keys()
+                            if CANOPY_WIDGET_KEY_PATTERN.match(str(key)) and canopy_keys.match(str(key)))
+            elif len(tokens) >= 3 and tokens[1].isdigit():
+                canopy = tokens[1]
+                keys.add(f"section_grid_{canopy}")
+                if len(tokens) >= 5 and tokens[2] == 'sections' and tokens[3].isdigit():
+                    keys.add(f"{tokens[4]}_{canopy}_{tokens[3]}")
+                else:
+                    keys.add(f"{tokens[2]}_{canopy}")
+            else:
+                keys.add('num_canopies')
+        elif tokens[0] == 'edge_box' and len(tokens) >= 2:
+            keys.add(tokens[1])
+        elif CHECKLIST_FORM_DATA_PATTERN.match(tokens[0]):
+            # Checklist items are shown by `canopy_{canopy}_<uv|wash>_check_{item}` widgets
+            canopy, checklist = CHECKLIST_FORM_DATA_PATTERN.match(tokens[0]).groups()
+            prefix = f"canopy_{canopy}_{'uv' if checklist == 'uv' else 'wash'}_check_"
+            keys.update(key for key in st.session_state.keys() if str(key).startswith(prefix))
+        else:
+            keys.add(tokens[0])
+    return sorted(keys)
+
+def get_form_history():
+    """Get this session's undo/redo history of form data (see ``form_history``)."""
+    if 'form_history' not in st.session_state:
+        from src.utils.form_history import FormHistory
+        st.session_state.form_history = FormHistory()
+    return st.session_state.form_history
+
+def record_form_history() -> bool:
+    """
+    Record this run's form data changes as an undo step.
+    
+    Call once per run, after every component has updated form_data.
+    
+    Returns:
+        True if the history changed
+    """
+    try:
+        return get_form_history().record(get_form_data())
+    except Exception:
+        return False  # Undo is best effort - the form keeps working without it
+
+@session_callback
+def undo_form_data() -> bool:
+    """Restore the form data from before the last recorded change (button callback)."""
+    form_data = get_form_history().undo()
+    if form_data is None:
+        return False
+    _restore_form_data(form_data)
+    return True
+
+@session_callback
+def redo_form_data() -> bool:
+    """Re-apply the last undone change (button callback)."""
+    form_data = get_form_history().redo()
+    if form_data is None:
+        return False
+    _restore_form_data(form_data)
+    return True
+
+def open_job_file(data: bytes):
+    """
+    Replace the form data with a job file's (see ``job_file``).
+    
+    The opened job starts as a new job in the job store - a copy, not linked to
+    the job the file was exported from - with a fresh undo history.
+    
+    Args:
+        data: Job file contents
+    
+    Raises:
+        JobFileError: If the file can't be read
+    """
+    from src.utils.job_file import import_job
+    
+    form_data = import_job(data)
+    _restore_form_data(form_data)
+    for key in ('job_id', 'job_base', 'job_revision', 'job_sync', 'form_history', 'generated_document', 'shareable_url',
+                'signature_canvas', 'signature_drawn'):
+        st.session_state.pop(key, None)
+    st.query_params.pop("job", None)
+
+def _restore_form_data(form_data: Dict[str, Any]):
+    """Replace the form data, resetting the widgets showing values that change so they pick up the restored ones."""
+    patch = diff_form_data(normalize_form_data(get_form_data()), normalize_form_data(form_data))
+    st.session_state.form_data = form_data
+    for key in _patch_widget_keys(patch):
+        st.session_state.pop(key, None)
+
 def has_marvel_technology() -> bool:
     """Check if any canopy in the project has Marvel technology enabled."""
     canopies = get_form_data('canopies', [])
@@ -198,4 +490,29 @@ def initialize_section_data(canopy_index: int, num_sections: int, with_marvel: b
         elif not with_marvel and 'min_percent' in section:
             # Remove Marvel fields if Marvel was disabled
             for key in ['min_percent', 'idle_percent', 'design_percent']:
-                section.pop(key, None) 
\ No newline at end of file
+                section.pop(key, None) 
+
+
+# Per-canopy checklist entries in form_data (`canopy_{canopy}_uv_checklist`, `canopy_{canopy}_water_wash_checklist`)
+CHECKLIST_FORM_DATA_PATTERN = re.compile(r'^canopy_(\d+)_(uv|water_wash)_checklist$')
+
+# Widget keys created per canopy (`<field>_{canopy}`) or per section (`<field>_{canopy}_{section}`)
+CANOPY_WIDGET_KEY_PATTERN = re.compile(
+    r'^(?:drawing_number|canopy_location|canopy_model|with_marvel|with_uv_checks|with_water_wash_checks'
+    r'|grill_size|number_of_grills|design_airflow|supply_airflow|slot_length|slot_width|number_of_sections'
+    r'|canopy_length|anemometer_reading|supply_anemometer_reading|extract_ksa|extract_tab_reading'
+    r'|supply_plenum_length|supply_tab_reading|min_percent|idle_percent|design_m3s)_\d+(?:_\d+)?$'
+    r'|^canopy_\d+_(?:uv|wash)_check_\d+$'
+)
+
+def clear_canopy_widget_keys():
+    """Remove all per-canopy and per-section widget keys so widgets re-initialise from form_data."""
+    for key in [key for key in st.session_state.keys() if CANOPY_WIDGET_KEY_PATTERN.match(str(key))]:
+        del st.session_state[key]
+
+def clear_section_widget_keys(canopy_index: int):
+    """Remove the per-section widget keys of one canopy so its section widgets re-initialise from form_data."""
+    section_suffix = re.compile(rf'_{canopy_index}_\d+$')
+    for key in [key for key in st.session_state.keys()
+                if CANOPY_WIDGET_KEY_PATTERN.match(str(key)) and section_suffix.search(str(key))]:
+        del st.session_state[key]
@@ -0,0 +1,318 @@
+"""
+Per-session memory accounting and idle-session spill.
+
+Every script run registers its session here (``with track_session():`` around
+``main()`` and around fragment runs). That gives a server-wide view of how much state each open session
+holds, and lets a throttled sweep - run from whichever session happens to be
+active - move the heavy payloads of idle sessions (signature images, generated
+documents, large form_data entries, DataFrames) to ``SESSION_SPILL_DIR``.
+
+A spilled value is replaced in place by a small ``SpilledPayload`` placeholder.
+The next run of that session restores everything before any component reads
+the state, so spilling is invisible to the rest of the app. Streamlit runs
+widget callbacks before the script body, so callbacks that read session state
+are decorated with ``@session_callback``, which restores the payloads first.
+A session is never spilled while one of its runs is in progress, and a spill
+that fails part-way is rolled back.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import SESSION_SPILL_DIR, SESSION_IDLE_SPILL_SECONDS, SESSION_SWEEP_INTERVAL, SESSION_SPILL_MIN_BYTES
+from src.utils.session_keys import estimate_size
+
+# Top-level session keys that hold heavy payloads (besides bytes/DataFrame values).
+# Widget callbacks that read them (or form_data) must be decorated with @session_callback.
+SESSION_SPILL_KEYS = ['generated_document', 'job_base', 'form_history', 'job_file']
+
+class SpilledPayload:
+    """Placeholder left in session state for a value that was moved to the spill directory."""
+    __slots__ = ('path', 'size')
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def __repr__(self):
+        return f"<spilled {self.size} bytes>"
+
+# session_id -> {'state': weakref to the session's SessionState, 'lock' (held while the session runs),
+# 'last_seen', 'spilled_bytes'}
+_sessions: Dict[str, Dict[str, Any]] = {}
+_sessions_lock = threading.Lock()
+_last_sweep = 0.0
+
+@contextmanager
+def track_session():
+    """
+    Register the current session, restore any spilled payloads and run the idle sweep.
+
+    Use as ``with track_session():`` around the whole script run (and fragment
+    runs), before components read session state. The session's lock is held
+    until the run ends, so the sweep can't spill a session that is running.
+    """
+    from streamlit.runtime.scriptrunner_utils.script_run_context import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        yield
+        return
+
+    entry = _register_session(ctx)
+    with entry['lock']:
+        _restore_session(ctx, entry)
+        sweep_idle_sessions()
+        try:
+            yield
+        finally:
+            entry['last_seen'] = time.monotonic()
+
+def session_callback(callback: Callable) -> Callable:
+    """
+    Decorator for widget callbacks (``on_click``/``on_change``) that read session state.
+
+    Streamlit runs callbacks before the script body, so before ``track_session()``
+    has restored spilled payloads; the decorated callback restores them first.
+    """
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        from streamlit.runtime.scriptrunner_utils.script_run_context import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            entry = _register_session(ctx)
+            with entry['lock']:
+                _restore_session(ctx, entry)
+        return callback(*args, **kwargs)
+    return wrapper
+
+def _register_session(ctx) -> Dict[str, Any]:
+    """The session's tracking entry (created on its first run), marked as seen now."""
+    # ctx.session_state is a wrapper that is created for every run; the
+    # SessionState inside it lives as long as the session does
+    state = getattr(ctx.session_state, '_state', ctx.session_state)
+    with _sessions_lock:
+        entry = _sessions.get(ctx.session_id)
+        if entry is None or entry['state']() is not state:
+            entry = {'state': weakref.ref(state), 'lock': threading.RLock(), 'spilled_bytes': 0}
+            _sessions[ctx.session_id] = entry
+        entry['last_seen'] = time.monotonic()
+    return entry
+
+def _restore_session(ctx, entry: Dict[str, Any]):
+    """Restore the session's spilled payloads, if it has any (with its lock held)."""
+    if entry['spilled_bytes']:
+        restore_session_payloads(ctx.session_state)
+        entry['spilled_bytes'] = 0
+
+def sweep_idle_sessions(force: bool = False) -> int:
+    """
+    Spill the heavy payloads of sessions idle for ``SESSION_IDLE_SPILL_SECONDS``.
+
+    Runs at most once every ``SESSION_SWEEP_INTERVAL`` seconds unless forced.
+    Sessions that have been closed are forgotten and their spill files removed.
+
+    Args:
+        force: Run even if the last sweep was recent
+
+    Returns:
+        Number of bytes spilled
+    """
+    global _last_sweep
+
+    now = time.monotonic()
+    if not force and now - _last_sweep < SESSION_SWEEP_INTERVAL:
+        return 0
+    _last_sweep = now
+
+    with _sessions_lock:
+        entries = list(_sessions.items())
+
+    spilled = 0
+    for session_id, entry in entries:
+        state = entry['state']()
+
+        if state is None:
+            with _sessions_lock:
+                _sessions.pop(session_id, None)
+            shutil.rmtree(_spill_dir(session_id), ignore_errors=True)
+            continue
+
+        if entry['spilled_bytes'] or now - entry['last_seen'] < SESSION_IDLE_SPILL_SECONDS:
+            continue
+
+        # Skip sessions that are running right now
+        if not entry['lock'].acquire(blocking=False):
+            continue
+        try:
+            entry['spilled_bytes'] = spill_session_payloads(state, session_id)
+            spilled += entry['spilled_bytes']
+        except Exception:
+            pass  # Spilling is best effort - the session just keeps its payloads in memory
+        finally:
+            entry['lock'].release()
+
+    return spilled
+
+def spill_session_payloads(state, session_id: str) -> int:
+    """
+    Move a session's heavy payloads to disk, leaving SpilledPayload placeholders.
+
+    Spills form_data entries of at least ``SESSION_SPILL_MIN_BYTES`` plus top-level
+    keys in ``SESSION_SPILL_KEYS`` or holding bytes/DataFrames of that size.
+    Widget values are never touched.
+
+    If writing a payload fails, the payloads already spilled are restored
+    before the error is raised, so the session is never left half spilled.
+
+    Args:
+        state: The session's state object
+        session_id: Session ID (names the spill directory)
+
+    Returns:
+        Number of bytes spilled
+    """
+    directory = _spill_dir(session_id)
+    spilled = 0
+
+    try:
+        form_data = state['form_data'] if 'form_data' in state else {}
+        for key, value in list(form_data.items()):
+            size = estimate_size(value)
+            if not isinstance(value, SpilledPayload) and size >= SESSION_SPILL_MIN_BYTES:
+                form_data[key] = _write_payload(directory, f"form_data.{key}", value)
+                spilled += size
+
+        for key, value in list(state.filtered_state.items()):
+            if key == 'form_data' or isinstance(value, SpilledPayload) or not _is_spillable(key, value):
+                continue
+            size = estimate_size(value)
+            if size >= SESSION_SPILL_MIN_BYTES:
+                state[key] = _write_payload(directory, key, value)
+                spilled += size
+    except Exception:
+        restore_session_payloads(state)
+        raise
+
+    return spilled
+
+def restore_session_payloads(state) -> int:
+    """
+    Load all spilled payloads of a session back into its state and delete the spill files.
+
+    A payload whose file has gone missing is restored as None.
+
+    Args:
+        state: The session's state object
+
+    Returns:
+        Number of payloads restored
+    """
+    restored = 0
+
+    form_data = state['form_data'] if 'form_data' in state else {}
+    for key, value in list(form_data.items()):
+        if isinstance(value, SpilledPayload):
+            form_data[key] = _read_payload(value)
+            restored += 1
+
+    for key, value in list(state.filtered_state.items()):
+        if isinstance(value, SpilledPayload):
+            state[key] = _read_payload(value)
+            restored += 1
+
+    return restored
+
+def get_memory_report() -> Dict[str, Any]:
+    """
+    Memory usage of all open sessions in this server process.
+
+    Returns:
+        Dict with 'process_rss' (bytes, or None if unavailable) and 'sessions':
+        list of {'session_id', 'keys', 'bytes', 'spilled_bytes', 'idle_seconds'},
+        largest first
+    """
+    now = time.monotonic()
+    with _sessions_lock:
+        entries = list(_sessions.items())
+
+    sessions = []
+    for session_id, entry in entries:
+        state = entry['state']()
+        if state is None:
+            continue
+        values = state.filtered_state
+        sessions.append({
+            'session_id': session_id,
+            'keys': len(values),
+            'bytes': sum(estimate_size(value) for value in values.values()),
+            'spilled_bytes': entry['spilled_bytes'],
+            'idle_seconds': now - entry['last_seen'],
+        })
+
+    return {
+        'process_rss': _process_rss(),
+        'sessions': sorted(sessions, key=lambda session: session['bytes'], reverse=True),
+    }
+
+def get_form_data_sizes(form_data: Dict[str, Any], limit: int = 10) -> List[tuple]:
+    """
+    Largest form_data entries of a session.
+
+    Args:
+        form_data: The session's form data
+        limit: Maximum number of entries returned
+
+    Returns:
+        List of (key, bytes), largest first
+    """
+    sizes = [(key, estimate_size(value)) for key, value in form_data.items()]
+    return sorted(sizes, key=lambda item: item[1], reverse=True)[:limit]
+
+def _is_spillable(key: str, value: Any) -> bool:
+    """Whether a top-level session value is a heavy payload (not a widget value)."""
+    if key in SESSION_SPILL_KEYS or isinstance(value, (bytes, bytearray)):
+        return True
+    return type(value).__name__ == 'DataFrame'  # Avoid importing pandas just for the check
+
+def _spill_dir(session_id: str) -> str:
+    """Spill directory for a session."""
+    return os.path.join(SESSION_SPILL_DIR, session_id)
+
+def _write_payload(directory: str, label: str, value: Any) -> SpilledPayload:
+    """Pickle a value to the spill directory and return its placeholder."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha1(label.encode('utf-8')).hexdigest()[:16] + '.pickle')
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return SpilledPayload(path, len(data))
+
+def _read_payload(payload: SpilledPayload) -> Any:
+    """Load a spilled value and delete its file."""
+    try:
+        with open(payload.path, 'rb') as f:
+            value = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    try:
+        os.remove(payload.path)
+    except OSError:
+        pass
+    return value
+
+def _process_rss() -> Optional[int]:
+    """Current resident set size of this process in bytes (Linux only)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
@@ -0,0 +1,186 @@
+"""
+Vector signatures.
+
+The signature canvas used to be stored as a base64 PNG of the whole canvas -
+tens of KB in every autosave, share link and session. Instead, the canvas's
+freehand strokes are simplified (Ramer-Douglas-Peucker, tolerance
+``SIGNATURE_SIMPLIFY_TOLERANCE``) and stored as a compact, delta-encoded path
+string of a few hundred bytes:
+
+    "600x200;x0,y0,dx1,dy1,dx2,dy2,...;x0,y0,..."
+
+(canvas size, then one stroke per ';' - integer canvas pixels, first point
+absolute and the rest relative to the previous point).
+
+The signature is only rasterized when a document is rendered, at the size the
+report shows it, and the result is cached.
+"""
+import functools
+import io
+from typing import List, Optional, Tuple
+
+from src.config import (
+    SIGNATURE_SIMPLIFY_TOLERANCE, SIGNATURE_MAX_WIDTH_INCHES, SIGNATURE_MAX_HEIGHT_INCHES,
+    SIGNATURE_DPI, SIGNATURE_STROKE_WIDTH
+)
+
+Point = Tuple[float, float]
+
+def strokes_from_canvas(json_data: Optional[dict]) -> List[List[Point]]:
+    """
+    Extract the freehand strokes from the drawable canvas's JSON.
+
+    Args:
+        json_data: ``canvas_result.json_data`` (fabric.js objects)
+
+    Returns:
+        One list of (x, y) canvas points per stroke
+    """
+    strokes = []
+    for obj in (json_data or {}).get('objects', []):
+        if obj.get('type') != 'path':
+            continue
+        # Freehand paths are M/Q/L commands in canvas coordinates; the last pair is the end point
+        points = [(command[-2], command[-1]) for command in obj.get('path', []) if len(command) >= 3]
+        if points:
+            strokes.append(points)
+    return strokes
+
+def simplify_stroke(points: List[Point], tolerance: float = SIGNATURE_SIMPLIFY_TOLERANCE) -> List[Point]:
+    """
+    Drop points that deviate less than ``tolerance`` from the simplified line (Ramer-Douglas-Peucker).
+
+    Args:
+        points: Stroke points
+        tolerance: Maximum deviation in canvas pixels
+
+    Returns:
+        The kept points (always including both ends)
+    """
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    pending = [(0, len(points) - 1)]
+    while pending:
+        first, last = pending.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = (dx * dx + dy * dy) ** 0.5
+
+        farthest, distance = None, tolerance
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                d = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                d = ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+            if d > distance:
+                farthest, distance = i, d
+
+        if farthest is not None:
+            keep[farthest] = True
+            pending += [(first, farthest), (farthest, last)]
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+def encode_signature(strokes: List[List[Point]], canvas_size: Tuple[int, int]) -> Optional[str]:
+    """
+    Simplify strokes and encode them as a compact path string.
+
+    Args:
+        strokes: Strokes from strokes_from_canvas
+        canvas_size: (width, height) of the canvas
+
+    Returns:
+        Encoded signature, or None if there are no strokes
+    """
+    parts = [f"{canvas_size[0]}x{canvas_size[1]}"]
+    for stroke in strokes:
+        points = [(round(x), round(y)) for x, y in simplify_stroke(stroke)]
+        values = [points[0][0], points[0][1]]
+        for (px, py), (x, y) in zip(points, points[1:]):
+            if (x, y) != (px, py):
+                values += [x - px, y - py]
+        parts.append(','.join(str(value) for value in values))
+    return ';'.join(parts) if len(parts) > 1 else None
+
+def decode_signature(encoded: str) -> Tuple[Tuple[int, int], List[List[Point]]]:
+    """
+    Decode a signature path string.
+
+    Args:
+        encoded: Output of encode_signature
+
+    Returns:
+        Tuple of ((canvas width, canvas height), strokes)
+    """
+    size, *stroke_parts = encoded.split(';')
+    width, height = (int(value) for value in size.split('x'))
+
+    strokes = []
+    for part in stroke_parts:
+        values = [int(value) for value in part.split(',')]
+        x, y = values[0], values[1]
+        stroke = [(x, y)]
+        for i in range(2, len(values) - 1, 2):
+            x, y = x + values[i], y + values[i + 1]
+            stroke.append((x, y))
+        strokes.append(stroke)
+    return (width, height), strokes
+
+@functools.lru_cache(maxsize=32)
+def rasterize_signature(
+    encoded: str,
+    max_width_inches: float = SIGNATURE_MAX_WIDTH_INCHES,
+    max_height_inches: float = SIGNATURE_MAX_HEIGHT_INCHES,
+    dpi: int = SIGNATURE_DPI
+) -> Tuple[bytes, float, float]:
+    """
+    Draw a signature as a PNG, cropped to its strokes and fitted into the given box.
+
+    Results are cached, so rendering the same signature again costs nothing.
+
+    Args:
+        encoded: Encoded signature
+        max_width_inches: Width of the box the signature is shown in
+        max_height_inches: Height of the box
+        dpi: Resolution of the image
+
+    Returns:
+        Tuple of (PNG bytes, width in inches, height in inches)
+    """
+    from PIL import Image, ImageDraw
+
+    _, strokes = decode_signature(encoded)
+    xs = [x for stroke in strokes for x, _ in stroke]
+    ys = [y for stroke in strokes for _, y in stroke]
+    margin = SIGNATURE_STROKE_WIDTH * 2
+    left, top = min(xs) - margin, min(ys) - margin
+    box_width, box_height = max(xs) + margin - left, max(ys) + margin - top
+
+    # Scale from canvas pixels to output pixels, fitting the strokes' bounding box
+    scale = min(max_width_inches * dpi / box_width, max_height_inches * dpi / box_height)
+    size = (max(1, round(box_width * scale)), max(1, round(box_height * scale)))
+
+    # Draw at 4x and scale down, for smooth (anti-aliased) strokes
+    supersample = 4
+    image = Image.new('L', (size[0] * supersample, size[1] * supersample), 255)
+    draw = ImageDraw.Draw(image)
+    factor = scale * supersample
+    line_width = max(1, round(SIGNATURE_STROKE_WIDTH * factor))
+    for stroke in strokes:
+        points = [((x - left) * factor, (y - top) * factor) for x, y in stroke]
+        if len(points) == 1:
+            x, y = points[0]
+            draw.ellipse([x - line_width / 2, y - line_width / 2, x + line_width / 2, y + line_width / 2], fill=0)
+        else:
+            draw.line(points, fill=0, width=line_width, joint='curve')
+            for x, y in (points[0], points[-1]):  # Round line caps
+                draw.ellipse([x - line_width / 2, y - line_width / 2, x + line_width / 2, y + line_width / 2], fill=0)
+    image = image.resize(size, Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=True, dpi=(dpi, dpi))
+    return output.getvalue(), size[0] / dpi, size[1] / dpi
@@ -0,0 +1,140 @@
+"""
+Template variable analysis and lazy template context.
+
+Each Word template only uses part of the context that ``prepare_template_context``
+can build (the supply air template, for example, has no signature or Edge box
+fields). ``get_template_variables`` parses a template's XML once and caches the
+top-level Jinja variables it references; ``LazyContext`` computes each context
+key only when it is asked for, so rendering resolves just those variables.
+"""
+import os
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional
+
+# abspath -> ((mtime_ns, size), variables)
+_variables_cache: Dict[str, tuple] = {}
+_variables_lock = threading.Lock()
+
+def get_template_variables(template_path: str) -> Optional[FrozenSet[str]]:
+    """
+    Get the top-level Jinja variables a template references.
+
+    The result is cached per file and recomputed when the file changes.
+
+    Args:
+        template_path: Path to the Word template
+
+    Returns:
+        Set of variable names, or None if the template could not be analysed
+        (callers should then supply the full context)
+    """
+    path = os.path.abspath(template_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _variables_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _variables_lock:
+        cached = _variables_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            variables = extract_template_variables(path)
+        except Exception:
+            return None
+        _variables_cache[path] = (signature, variables)
+        return variables
+
+def extract_template_variables(template_path: str) -> FrozenSet[str]:
+    """
+    Parse a template and collect the undeclared Jinja variables from every part docxtpl renders.
+
+    Covers the body, headers and footers (via docxtpl), footnotes and the
+    document properties.
+
+    Args:
+        template_path: Path to the Word template
+
+    Returns:
+        Set of variable names
+    """
+    from docxtpl import DocxTemplate
+    from jinja2 import Environment, meta
+
+    doc = DocxTemplate(template_path)
+    variables = set(doc.get_undeclared_template_variables())
+
+    doc.init_docx()
+    env = Environment()
+    sources = []
+
+    for part in doc.docx.part.package.iter_parts():
+        if part.partname.endswith('/footnotes.xml'):
+            sources.append(doc.patch_xml(part.blob.decode('utf-8')))
+
+    properties = doc.docx.core_properties
+    for name in ('author', 'category', 'comments', 'content_status', 'identifier', 'keywords',
+                 'language', 'last_modified_by', 'subject', 'title', 'version'):
+        value = getattr(properties, name, None)
+        if isinstance(value, str) and '{' in value:
+            sources.append(value)
+
+    for source in sources:
+        variables |= meta.find_undeclared_variables(env.parse(source))
+
+    return frozenset(variables)
+
+class LazyContext(Mapping):
+    """
+    Template context whose values are computed on first access.
+
+    Built from a dict of factories (``key -> callable(context)``); factories can
+    read other keys from the context they are given. Keys starting with an
+    underscore are shared intermediates - they can be looked up but are not
+    listed as context keys.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[['LazyContext'], Any]]):
+        self._factories = factories
+        self._values: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._values:
+            if key not in self._factories:
+                raise KeyError(key)
+            self._values[key] = self._factories[key](self)
+        return self._values[key]
+
+    def __iter__(self):
+        return (key for key in self._factories if not key.startswith('_'))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        return key in self._factories and not str(key).startswith('_')
+
+    def resolve(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Compute the given keys (all keys if None) and return them as a plain dict.
+
+        Args:
+            keys: Keys to resolve - names without a factory are ignored
+
+        Returns:
+            Dict of the resolved keys
+        """
+        if keys is None:
+            return {key: self[key] for key in self}
+        return {key: self[key] for key in keys if key in self}
+
+    @property
+    def computed_keys(self) -> FrozenSet[str]:
+        """Keys whose values have been computed so far."""
+        return frozenset(self._values)
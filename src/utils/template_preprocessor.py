@@ -0,0 +1,377 @@
+"""
+Template preprocessing.
+
+The shipped Word templates carry more than the reports need: unused styles and
+numbering definitions, media no relationship points at, logos saved as
+full-colour RGBA PNGs, and Jinja tags that Word split across several runs
+(docxtpl stitches those back together on every render). Several templates are
+also byte-identical copies of each other.
+
+``get_preprocessed_template()`` returns a slimmed copy of a template, built
+once and published to the template store (``template_store``) under a hash of
+the template's content - identical templates share one preprocessed file (and
+so one compiled template in the render cache). Run ``python -m src.utils.template_preprocessor``
+to preprocess all templates ahead of time and see what was removed.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+import zipfile
+from typing import Any, Dict, List, Set, Tuple
+
+from src.config import TEMPLATE_PREPROCESSING, TEMPLATE_IMAGE_COLORS
+
+# Bump when the preprocessing steps change, so cached templates are rebuilt
+PREPROCESSOR_VERSION = 2
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+# Parts docxtpl renders (their Jinja tags get the split-run fix)
+RENDERED_PARTS = re.compile(r'^word/(document|header\d*|footer\d*|footnotes)\.xml$')
+
+STYLE_REFERENCE = re.compile(
+    r'<w:(?:pStyle|rStyle|tblStyle|numStyleLink|styleLink)\b[^>]*?\bw:val="([^"]*)"'
+)
+NUMBERING_REFERENCE = re.compile(r'<w:numId\b[^>]*?\bw:val="(\d+)"')
+
+# abspath -> ((mtime_ns, size), preprocessed path)
+_preprocessed: Dict[str, tuple] = {}
+_preprocessed_lock = threading.Lock()
+
+def get_preprocessed_template(template_path: str) -> str:
+    """
+    Get the path of the preprocessed copy of a template, building and publishing it if needed.
+
+    The copy lives in the memory-mapped template store, so every process on the
+    host renders from the same file. With preprocessing disabled
+    (``CANOPY_TEMPLATE_PREPROCESSING=0``) the original bytes are published
+    unchanged. Falls back to the original template if anything fails.
+
+    Args:
+        template_path: Path to the Word template
+
+    Returns:
+        Path of the template to render
+    """
+    from src.utils.template_store import lookup_template, publish_template, has_file
+
+    path = os.path.abspath(template_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return template_path
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _preprocessed.get(path)
+    if cached and cached[0] == signature and os.path.exists(cached[1]):
+        return cached[1]
+
+    with _preprocessed_lock:
+        try:
+            # Another process may already have published this version
+            output_path = lookup_template(path, signature)
+            if output_path is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                file_name = _store_name(data)
+                output = None
+                if not has_file(file_name):
+                    output = preprocess_docx(data)[0] if TEMPLATE_PREPROCESSING else data
+                output_path = publish_template(path, signature, file_name, output)
+        except Exception:
+            return template_path
+
+        _preprocessed[path] = (signature, output_path)
+        return output_path
+
+def preprocess_docx(data: bytes) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Slim down a .docx template.
+
+    Steps: drop media no relationship refers to, join Jinja tags split across
+    runs, remove unused styles and numbering definitions and recompress images.
+
+    Args:
+        data: The template file contents
+
+    Returns:
+        Tuple of (preprocessed file contents, report dict with 'input_bytes',
+        'output_bytes', 'removed_media', 'fixed_parts', 'removed_styles',
+        'removed_numbering' and 'images' (name -> (bytes before, bytes after)))
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as source:
+        infos = source.infolist()
+        members = {info.filename: source.read(info.filename) for info in infos}
+
+    report = {
+        'input_bytes': len(data),
+        'removed_media': [],
+        'fixed_parts': [],
+        'removed_styles': [],
+        'removed_numbering': [],
+        'images': {},
+    }
+
+    # Orphaned media
+    targets = _relationship_targets(members)
+    for name in [name for name in members if name.startswith('word/media/') and name not in targets]:
+        del members[name]
+        report['removed_media'].append(name)
+
+    # Split Jinja tags
+    for name in [name for name in members if RENDERED_PARTS.match(name)]:
+        fixed = fix_split_jinja_tags(members[name].decode('utf-8'))
+        if fixed != members[name].decode('utf-8') and _is_well_formed(fixed):
+            members[name] = fixed.encode('utf-8')
+            report['fixed_parts'].append(name)
+
+    # Styles and numbering are referenced from the main document's parts (the glossary has its own)
+    referencing = [
+        value.decode('utf-8', errors='ignore') for name, value in members.items()
+        if name.startswith('word/') and name.endswith('.xml') and not name.startswith('word/glossary/')
+        and name not in ('word/styles.xml', 'word/numbering.xml')
+    ]
+    if 'word/styles.xml' in members:
+        members['word/styles.xml'], report['removed_styles'] = remove_unused_styles(
+            members['word/styles.xml'], referencing + [members.get('word/numbering.xml', b'').decode('utf-8')]
+        )
+    if 'word/numbering.xml' in members:
+        members['word/numbering.xml'], report['removed_numbering'] = remove_unused_numbering(
+            members['word/numbering.xml'], referencing + [members.get('word/styles.xml', b'').decode('utf-8')]
+        )
+
+    # Images
+    for name in [name for name in members if name.startswith('word/media/')]:
+        recompressed = recompress_image(name, members[name])
+        if len(recompressed) < len(members[name]):
+            report['images'][name] = (len(members[name]), len(recompressed))
+            members[name] = recompressed
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in infos:
+            if info.filename in members:
+                target.writestr(info.filename, members[info.filename])
+
+    report['output_bytes'] = output.tell()
+    return output.getvalue(), report
+
+def fix_split_jinja_tags(xml: str) -> str:
+    """
+    Join Jinja tags Word split across runs, e.g. ``{{ client_</w:t></w:r><w:r><w:t>name }}``.
+
+    These are the first two steps of docxtpl's ``patch_xml``; applying them to
+    the template file means they find nothing left to do at render time.
+
+    Args:
+        xml: Part XML
+
+    Returns:
+        Part XML with each Jinja tag inside a single run
+    """
+    # {<tags>{ -> {{ (and {%, {#, %}, }}, #})
+    xml = re.sub(r"(?<={)(<[^>]*>)+(?=[\{%\#])|(?<=[%\}\#])(<[^>]*>)+(?=\})", "", xml, flags=re.DOTALL)
+
+    def striptags(m):
+        return re.sub("</w:t>.*?(<w:t>|<w:t [^>]*>)", "", m.group(0), flags=re.DOTALL)
+
+    return re.sub(r"{%(?:(?!%}).)*|{#(?:(?!#}).)*|{{(?:(?!}}).)*", striptags, xml, flags=re.DOTALL)
+
+def remove_unused_styles(styles_xml: bytes, referencing: List[str]) -> Tuple[bytes, List[str]]:
+    """
+    Remove style definitions nothing refers to.
+
+    Default styles, styles referenced from any other part and the styles those
+    are based on, linked to or followed by are kept.
+
+    Args:
+        styles_xml: word/styles.xml contents
+        referencing: XML of the parts that can refer to styles
+
+    Returns:
+        Tuple of (new styles.xml contents, removed style IDs)
+    """
+    from lxml import etree
+
+    root = etree.fromstring(styles_xml)
+    w = f"{{{W_NS}}}"
+    styles = {style.get(f"{w}styleId"): style for style in root.iter(f"{w}style")}
+
+    used = {style_id for xml in referencing for style_id in STYLE_REFERENCE.findall(xml)}
+    used |= {style_id for style_id, style in styles.items() if style.get(f"{w}default") in ('1', 'true', 'on')}
+
+    pending = list(used)
+    while pending:
+        style = styles.get(pending.pop())
+        if style is None:
+            continue
+        for tag in ('basedOn', 'next', 'link'):
+            element = style.find(f"{w}{tag}")
+            if element is not None and element.get(f"{w}val") not in used:
+                used.add(element.get(f"{w}val"))
+                pending.append(element.get(f"{w}val"))
+
+    removed = [style_id for style_id in styles if style_id not in used]
+    if not removed:
+        return styles_xml, []
+
+    for style_id in removed:
+        styles[style_id].getparent().remove(styles[style_id])
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True), removed
+
+def remove_unused_numbering(numbering_xml: bytes, referencing: List[str]) -> Tuple[bytes, List[str]]:
+    """
+    Remove numbering instances nothing refers to and the abstract definitions only they used.
+
+    Abstract definitions tied to a numbering style are always kept.
+
+    Args:
+        numbering_xml: word/numbering.xml contents
+        referencing: XML of the parts that can refer to numbering
+
+    Returns:
+        Tuple of (new numbering.xml contents, removed entries as 'num:<id>' / 'abstractNum:<id>')
+    """
+    from lxml import etree
+
+    root = etree.fromstring(numbering_xml)
+    w = f"{{{W_NS}}}"
+    used_nums = {num_id for xml in referencing for num_id in NUMBERING_REFERENCE.findall(xml)}
+
+    removed = []
+    used_abstracts: Set[str] = set()
+    for num in root.findall(f"{w}num"):
+        if num.get(f"{w}numId") in used_nums:
+            abstract = num.find(f"{w}abstractNumId")
+            if abstract is not None:
+                used_abstracts.add(abstract.get(f"{w}val"))
+        else:
+            root.remove(num)
+            removed.append(f"num:{num.get(f'{w}numId')}")
+
+    for abstract in root.findall(f"{w}abstractNum"):
+        abstract_id = abstract.get(f"{w}abstractNumId")
+        styled = abstract.find(f"{w}styleLink") is not None or abstract.find(f"{w}numStyleLink") is not None
+        if abstract_id not in used_abstracts and not styled:
+            root.remove(abstract)
+            removed.append(f"abstractNum:{abstract_id}")
+
+    if not removed:
+        return numbering_xml, []
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True), removed
+
+def recompress_image(name: str, data: bytes) -> bytes:
+    """
+    Recompress a template image, keeping its format.
+
+    Only lossless changes are made. PNGs drop an alpha channel that is fully
+    opaque and, if ``TEMPLATE_IMAGE_COLORS`` is set, are stored as a palette
+    image when at most that many colours reproduce every pixel exactly (logos
+    and line art); photos and gradients keep full colour. JPEGs are re-encoded
+    with their original quantization tables and optimized Huffman coding.
+
+    Args:
+        name: Zip member name (its extension gives the format)
+        data: Image contents
+
+    Returns:
+        Recompressed image contents, or the original if that is not smaller
+    """
+    try:
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        output = io.BytesIO()
+        extension = os.path.splitext(name)[1].lower()
+
+        if extension == '.png':
+            dpi = image.info.get('dpi', (96, 96))
+            if image.mode == 'RGBA' and image.getchannel('A').getextrema() == (255, 255):
+                image = image.convert('RGB')
+            if TEMPLATE_IMAGE_COLORS and image.mode in ('RGB', 'RGBA') and image.getcolors(TEMPLATE_IMAGE_COLORS):
+                method = Image.Quantize.MEDIANCUT if image.mode == 'RGB' else Image.Quantize.FASTOCTREE
+                palette_image = image.quantize(TEMPLATE_IMAGE_COLORS, method=method, dither=Image.Dither.NONE)
+                # Quantizing may still merge close colours - keep the palette only if no pixel changed
+                if palette_image.convert(image.mode).tobytes() == image.tobytes():
+                    image = palette_image
+            image.save(output, 'PNG', optimize=True, dpi=dpi)
+        elif extension in ('.jpg', '.jpeg'):
+            image.save(output, 'JPEG', quality='keep', optimize=True)
+        else:
+            return data
+    except Exception:
+        return data
+
+    return output.getvalue() if output.tell() < len(data) else data
+
+def _relationship_targets(members: Dict[str, bytes]) -> Set[str]:
+    """Zip member names that any internal relationship points at."""
+    import posixpath
+
+    targets = set()
+    for name, value in members.items():
+        if not name.endswith('.rels'):
+            continue
+        # word/_rels/document.xml.rels -> relative targets resolve against word/
+        base = posixpath.dirname(posixpath.dirname(name))
+        for relationship in re.findall(r'<Relationship\b[^>]*>', value.decode('utf-8')):
+            target = re.search(r'\bTarget="([^"]*)"', relationship)
+            if not target or 'TargetMode="External"' in relationship:
+                continue
+            target = target.group(1)
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base, target))
+            targets.add(path)
+    return targets
+
+def _is_well_formed(xml: str) -> bool:
+    """Whether a part's XML still parses."""
+    from lxml import etree
+
+    try:
+        etree.fromstring(xml.encode('utf-8'))
+        return True
+    except etree.XMLSyntaxError:
+        return False
+
+def _store_name(data: bytes) -> str:
+    """Store file name for a template's preprocessed form (same contents and settings, same file)."""
+    digest = hashlib.sha256(data)
+    settings = f":v{PREPROCESSOR_VERSION}:enabled={TEMPLATE_PREPROCESSING}:colors={TEMPLATE_IMAGE_COLORS}"
+    digest.update(settings.encode('utf-8'))
+    return digest.hexdigest()[:24] + '.docx'
+
+def main():
+    """Preprocess every template in templates/ and report what changed."""
+    import glob
+
+    groups: Dict[str, List[str]] = {}
+    for template_path in sorted(glob.glob(os.path.join('templates', '*.docx'))):
+        name = os.path.basename(template_path)
+        try:
+            with open(template_path, 'rb') as f:
+                data = f.read()
+            _, report = preprocess_docx(data)
+        except Exception as e:
+            print(f"{name}: skipped ({type(e).__name__}: {e})")
+            continue
+
+        output_path = get_preprocessed_template(template_path)
+        groups.setdefault(output_path, []).append(name)
+        print(f"{name}: {report['input_bytes'] / 1024:.0f} KB -> {report['output_bytes'] / 1024:.0f} KB "
+              f"({len(report['removed_styles'])} styles, {len(report['removed_numbering'])} numbering entries, "
+              f"{len(report['removed_media'])} orphaned media removed; {len(report['images'])} images recompressed; "
+              f"split tags fixed in {len(report['fixed_parts'])} parts)")
+
+    for output_path, names in groups.items():
+        if len(names) > 1:
+            print(f"Identical templates sharing {os.path.basename(output_path)}: {', '.join(names)}")
+
+    from src.utils.template_store import collect_unused_files
+    deleted = collect_unused_files()
+    if deleted:
+        print(f"Removed {deleted} outdated template files from the store")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Memory-mapped template store.
+
+Templates are rendered from immutable, content-addressed files in
+``TEMPLATE_CACHE_DIR`` (the preprocessed copies, see ``template_preprocessor``).
+A small index maps each source template to its current file; it is rewritten
+with ``os.replace``, so publishing an updated template is one atomic swap and
+every process sees either the old or the new version, never a mix.
+
+Readers map the files read-only instead of reading them into memory, so the
+template bytes live once in the page cache however many app or render
+processes there are. A file is never modified once written - a process still
+rendering from an old mapping keeps a valid view even after an update.
+"""
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from src.config import TEMPLATE_CACHE_DIR
+
+try:
+    import fcntl  # Serializes index updates between processes (not available on Windows)
+except ImportError:
+    fcntl = None
+
+INDEX_FILE = 'index.json'
+
+# Parsed index, reloaded when the index file is replaced: ((mtime_ns, inode), index)
+_index_cache: Optional[tuple] = None
+_index_lock = threading.Lock()
+
+def lookup_template(source_path: str, signature: tuple) -> Optional[str]:
+    """
+    Find the published file for a source template.
+
+    Args:
+        source_path: Path of the source template
+        signature: (mtime_ns, size) of the source template
+
+    Returns:
+        Path of the published file, or None if the source isn't published at that version
+    """
+    entry = _read_index().get(os.path.abspath(source_path))
+    if not entry or tuple(entry['signature']) != tuple(signature):
+        return None
+    path = os.path.join(TEMPLATE_CACHE_DIR, entry['file'])
+    return path if os.path.exists(path) else None
+
+def publish_template(source_path: str, signature: tuple, file_name: str, data: Optional[bytes] = None) -> str:
+    """
+    Publish a file as the current version of a source template.
+
+    Args:
+        source_path: Path of the source template
+        signature: (mtime_ns, size) of the source template
+        file_name: Content-addressed name of the file in the store
+        data: File contents, written if the store doesn't have the file yet
+
+    Returns:
+        Path of the published file
+    """
+    path = os.path.join(TEMPLATE_CACHE_DIR, file_name)
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+
+    if not os.path.exists(path):
+        if data is None:
+            raise FileNotFoundError(path)
+        _write_atomically(path, data)
+
+    with _locked_index():
+        index = _load_index()
+        index[os.path.abspath(source_path)] = {'signature': list(signature), 'file': file_name}
+        _write_atomically(os.path.join(TEMPLATE_CACHE_DIR, INDEX_FILE), json.dumps(index, indent=1).encode('utf-8'))
+
+    return path
+
+def has_file(file_name: str) -> bool:
+    """Whether the store already holds a content-addressed file."""
+    return os.path.exists(os.path.join(TEMPLATE_CACHE_DIR, file_name))
+
+class MappedTemplate(mmap.mmap):
+    """Read-only mapping of a template file that zipfile (and so python-docx) can read from."""
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+def open_template(path: str) -> MappedTemplate:
+    """
+    Map a template file read-only.
+
+    Each call returns its own mapping (with its own read position), so
+    concurrent renders don't interfere; the pages themselves are shared.
+
+    Args:
+        path: Path of the template file
+
+    Returns:
+        Read-only mapping, usable as a binary file object
+    """
+    with open(path, 'rb') as f:
+        return MappedTemplate(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def collect_unused_files(min_age_seconds: float = 3600) -> int:
+    """
+    Delete store files no index entry refers to.
+
+    Index entries whose source template no longer exists are dropped first.
+    Files younger than ``min_age_seconds`` are kept, as another process may be
+    about to publish them. Processes still mapping a deleted file are unaffected.
+
+    Args:
+        min_age_seconds: Minimum age of a file before it can be deleted
+
+    Returns:
+        Number of files deleted
+    """
+    if not os.path.isdir(TEMPLATE_CACHE_DIR):
+        return 0
+
+    with _locked_index():
+        index = _load_index()
+        live = {source: entry for source, entry in index.items() if os.path.exists(source)}
+        if len(live) != len(index):
+            _write_atomically(os.path.join(TEMPLATE_CACHE_DIR, INDEX_FILE), json.dumps(live, indent=1).encode('utf-8'))
+
+        referenced = {entry['file'] for entry in live.values()}
+        now = time.time()
+        deleted = 0
+        for name in os.listdir(TEMPLATE_CACHE_DIR):
+            path = os.path.join(TEMPLATE_CACHE_DIR, name)
+            if not name.endswith('.docx') or name in referenced:
+                continue
+            try:
+                if now - os.path.getmtime(path) >= min_age_seconds:
+                    os.remove(path)
+                    deleted += 1
+            except OSError:
+                pass
+    return deleted
+
+def _read_index() -> Dict[str, dict]:
+    """Current index, re-read only when the index file has been replaced."""
+    global _index_cache
+
+    try:
+        stat = os.stat(os.path.join(TEMPLATE_CACHE_DIR, INDEX_FILE))
+    except OSError:
+        return {}
+    version = (stat.st_mtime_ns, stat.st_ino)
+
+    cached = _index_cache
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _index_lock:
+        index = _load_index()
+        _index_cache = (version, index)
+        return index
+
+def _load_index() -> Dict[str, dict]:
+    """Read the index file (empty if missing or unreadable)."""
+    try:
+        with open(os.path.join(TEMPLATE_CACHE_DIR, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+@contextmanager
+def _locked_index():
+    """Hold the store's lock file while the index is read, modified and replaced."""
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    with open(os.path.join(TEMPLATE_CACHE_DIR, 'index.lock'), 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _write_atomically(path: str, data: bytes):
+    """Write a file via a temporary file and rename, so readers never see it half-written."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
@@ -0,0 +1,30 @@
+import os
+import threading
+
+from src.utils import render_pool, report_archive
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_generated_document_is_dropped_when_the_form_changes(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setattr(render_pool, 'RENDER_WORKERS', 0)
+    monkeypatch.setattr(report_archive, 'REPORT_ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setattr(report_archive, '_initialized', False)
+    monkeypatch.setattr(report_archive, '_local', threading.local())
+    monkeypatch.chdir(ROOT)
+
+    app = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=120).run()
+    app.selectbox(key='report_type').set_value('Supply Air Analysis').run()
+    app.text_input(key='client_name').set_value('ACME').run()
+    next(button for button in app.button if 'Generate & Download' in button.label).click().run()
+    assert not app.exception
+    assert not app.warning
+    assert app.session_state['generated_document']['file_name'].startswith('ACME')
+
+    app.run()  # Unchanged form - the download stays
+    assert 'generated_document' in app.session_state
+
+    app.text_input(key='client_name').set_value('ACME Kitchens').run()
+    assert 'generated_document' not in app.session_state
+    assert any('changed since the document was generated' in info.value for info in app.info)
@@ -0,0 +1,99 @@
+"""Tests for the derived values graph's incremental recomputation."""
+import copy
+import os
+import random
+import subprocess
+import sys
+
+from src.utils.derived_values import DerivedGraph
+
+SECTION = {'extract_ksa': 2, 'extract_tab_reading': '100', 'supply_plenum_length': 1500, 'supply_tab_reading': '50'}
+
+def make_form(num_canopies=3, num_sections=2):
+    return {
+        'report_type': 'Canopy Commissioning', 'client_name': 'Client', 'num_canopies': num_canopies, 'edge_box': {},
+        'canopies': [{'canopy_model': 'KVF', 'drawing_number': f'D{c}', 'design_airflow': 0.5, 'supply_airflow': 0.3,
+                      'number_of_sections': num_sections, 'sections': [dict(SECTION) for _ in range(num_sections)]}
+                     for c in range(num_canopies)],
+    }
+
+def all_values(graph, form_data):
+    values = {}
+    for c, canopy in enumerate(form_data['canopies']):
+        values[('free_area', c)] = graph.get(form_data, 'free_area', c)
+        values[('canopy_totals', c)] = graph.get(form_data, 'canopy_totals', c)
+        for s in range(len(canopy['sections'])):
+            values[('extract_flowrate', c, s)] = graph.get(form_data, 'extract_flowrate', c, s)
+            values[('supply_flowrate', c, s)] = graph.get(form_data, 'supply_flowrate', c, s)
+    values['results_summary'] = graph.get(form_data, 'results_summary')
+    values['progress'] = graph.get(form_data, 'progress')
+    return values
+
+def test_unchanged_form_is_answered_from_cache():
+    form_data = make_form()
+    graph = DerivedGraph()
+    all_values(graph, form_data)
+    computations = graph.computations
+    all_values(graph, form_data)
+    assert graph.computations == computations
+
+def test_edit_recomputes_only_affected_nodes():
+    form_data = make_form()
+    graph = DerivedGraph()
+    all_values(graph, form_data)
+    computations = graph.computations
+
+    form_data['canopies'][1]['sections'][0]['extract_tab_reading'] = '144'
+    graph.get(form_data, 'results_summary')
+    # The section's flowrate, its canopy's totals and the results summary
+    assert graph.computations - computations == 3
+    assert graph.get(form_data, 'extract_flowrate', 1, 0)[0] == graph.get(form_data, 'extract_k_factor', 1, 0) * 12
+
+def test_mid_run_write_is_seen_by_section_get():
+    form_data = make_form()
+    graph = DerivedGraph()
+    before = graph.get(form_data, 'extract_flowrate', 0, 1)
+    form_data['canopies'][0]['sections'][1]['extract_tab_reading'] = '400'
+    assert graph.get(form_data, 'extract_flowrate', 0, 1)[0] == before[0] * 2
+
+def test_matches_fresh_graph_after_random_edits():
+    rng = random.Random(7)
+    form_data = make_form()
+    graph = DerivedGraph()
+
+    for _ in range(300):
+        canopies = form_data['canopies']
+        action = rng.random()
+        if action < 0.1:
+            canopies.append(copy.deepcopy(rng.choice(canopies)) if canopies else make_form(1)['canopies'][0])
+            form_data['num_canopies'] = len(canopies)
+        elif action < 0.15 and canopies:
+            canopies.pop(rng.randrange(len(canopies)))
+            form_data['num_canopies'] = len(canopies)
+        elif action < 0.25 and canopies:
+            sections = rng.choice(canopies)['sections']
+            if sections and rng.random() < 0.5:
+                sections.pop()
+            else:
+                sections.append(dict(SECTION))
+        elif action < 0.35 and canopies:
+            rng.choice(canopies)['canopy_model'] = rng.choice(['KVF', 'KVI', 'UVF', 'CMWF', 'CXW', ''])
+        elif action < 0.4:
+            form_data['report_type'] = rng.choice(['Canopy Commissioning', 'Other'])
+        elif action < 0.45:
+            form_data = copy.deepcopy(form_data)  # e.g. a loaded job or an undo replacing the form data
+        elif canopies:
+            canopy = rng.choice(canopies)
+            if canopy['sections']:
+                section = rng.choice(canopy['sections'])
+                key = rng.choice(['extract_tab_reading', 'supply_tab_reading', 'extract_ksa', 'anemometer_reading'])
+                section[key] = rng.choice(['', '64', '121', 3, 1.5, None])
+
+        assert all_values(graph, form_data) == all_values(DerivedGraph(), form_data)
+
+def test_importing_does_not_load_document_generator():
+    code = ("import sys; import src.utils.derived_values, src.components.results_summary; "
+            "print('src.utils.document_generator' in sys.modules or 'docxtpl' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,87 @@
+import copy
+import io
+import json
+import os
+
+import pytest
+from docxtpl import DocxTemplate
+
+from src.config import K_FACTOR_CATALOGUE_PATH, REPORT_TEMPLATES, TEMPLATES_DIR
+from src.utils import k_factor_catalogue
+from src.utils.document_generator import canopy_cache_key, prepare_template_context
+from src.utils.template_analysis import get_template_variables
+from src.utils.template_engine import (BENCHMARK_FORM_DATA, BENCHMARK_TIMESTAMP, CompiledDocxTemplate,
+                                       compare_docx_outputs, get_fragment_cache_stats)
+
+TEMPLATE = os.path.join(TEMPLATES_DIR, REPORT_TEMPLATES["Canopy Commissioning"])
+
+def large_job(num_canopies=12):
+    form_data = copy.deepcopy(BENCHMARK_FORM_DATA)
+    form_data['canopies'] = [copy.deepcopy(form_data['canopies'][i % 2]) for i in range(num_canopies)]
+    form_data['num_canopies'] = num_canopies
+    return form_data
+
+def render(template_class, form_data):
+    doc = template_class(TEMPLATE)
+    context = prepare_template_context(form_data, doc).resolve(get_template_variables(TEMPLATE))
+    context.update(BENCHMARK_TIMESTAMP)
+    doc.render(context)
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+def test_edit_re_renders_only_the_changed_canopy():
+    form_data = large_job()
+    render(CompiledDocxTemplate, form_data)
+    rendered = get_fragment_cache_stats()['renders']
+
+    form_data['canopies'][5]['sections'] = [{'anemometer_reading': 2.5}] * 2
+    document = render(CompiledDocxTemplate, form_data)
+
+    assert get_fragment_cache_stats()['renders'] - rendered == 1
+    assert compare_docx_outputs(document, render(DocxTemplate, form_data)) == []
+
+@pytest.fixture
+def catalogue(tmp_path, monkeypatch):
+    """Load the catalogue from a temporary copy; returns a function writing new content to it."""
+    path = str(tmp_path / 'k_factors.json')
+    monkeypatch.setattr(k_factor_catalogue, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(k_factor_catalogue, 'K_FACTOR_CATALOGUE_PATH', path)
+    for name in ('_catalogue', '_catalogue_version', '_source_signature'):
+        monkeypatch.setattr(k_factor_catalogue, name, None)
+    with open(K_FACTOR_CATALOGUE_PATH) as f:
+        raw = json.load(f)
+
+    def write(edit=None, indent=2):
+        content = copy.deepcopy(raw)
+        if edit:
+            edit(content['models'])
+        with open(path, 'w') as f:
+            json.dump(content, f, indent=indent)
+        k_factor_catalogue.reload_k_factor_catalogue(path)
+    write()
+    return write
+
+def test_canopy_cache_key_follows_catalogue_content(catalogue):
+    form_data = large_job(1)
+    key = canopy_cache_key(0, form_data['canopies'][0], form_data)
+
+    catalogue(indent=None)  # Same content, different file
+    assert canopy_cache_key(0, form_data['canopies'][0], form_data) == key
+
+    catalogue(lambda models: models['KVF']['sections'].update({'2': 150.0}))
+    assert canopy_cache_key(0, form_data['canopies'][0], form_data) != key
+
+def test_concurrent_renders_share_the_fragment_cache_safely():
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = []
+    for i in range(6):
+        form_data = large_job(8)
+        form_data['canopies'][i]['design_airflow'] = 0.9 + i / 10  # One changed canopy per job
+        jobs.append(form_data)
+    expected = [render(CompiledDocxTemplate, form_data) for form_data in jobs]
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda form_data: render(CompiledDocxTemplate, form_data), jobs * 3))
+    assert all(compare_docx_outputs(result, expected[i % len(jobs)]) == [] for i, result in enumerate(results))
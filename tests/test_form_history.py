@@ -0,0 +1,120 @@
+import copy
+import datetime
+
+from src.utils.form_history import FormHistory, share_snapshot
+
+def make_form(num_canopies=20, num_sections=6):
+    return {
+        'client_name': 'ACME',
+        'date_of_visit': datetime.date(2024, 5, 1),
+        'canopies': [{'canopy_model': 'KVF', 'drawing_number': f'D{c}',
+                      'sections': [{'extract_ksa': 2, 'extract_tab_reading': str(100 + s)} for s in range(num_sections)]}
+                     for c in range(num_canopies)],
+    }
+
+def test_unchanged_subtrees_are_shared_with_the_previous_step():
+    form_data = make_form()
+    history = FormHistory()
+    history.record(form_data)
+    form_data['canopies'][3]['sections'][2]['extract_tab_reading'] = '144'
+    history.record(form_data)
+
+    before, after = history.steps[0]['snapshot'], history.steps[1]['snapshot']
+    assert after is not before
+    assert after['canopies'][0] is before['canopies'][0]
+    assert after['canopies'][3]['sections'][1] is before['canopies'][3]['sections'][1]
+    assert after['canopies'][3]['sections'][2] is not before['canopies'][3]['sections'][2]
+    assert history.steps[1]['keys'] == ['canopies']
+    # Only the path to the edited reading was copied
+    assert history.steps[1]['bytes'] < 4096
+
+def test_unchanged_form_records_nothing():
+    form_data = make_form()
+    history = FormHistory()
+    assert history.record(form_data)
+    assert not history.record(copy.deepcopy(form_data))
+    assert len(history.steps) == 1
+
+def test_snapshots_are_not_changed_by_later_edits():
+    form_data = make_form(2, 2)
+    history = FormHistory()
+    history.record(form_data)
+    form_data['canopies'][0]['sections'][0]['extract_tab_reading'] = '999'
+    form_data['date_of_visit'] = datetime.date(2024, 6, 1)
+    history.record(form_data)
+
+    assert history.steps[0]['snapshot']['canopies'][0]['sections'][0]['extract_tab_reading'] == '100'
+    assert history.steps[0]['snapshot']['date_of_visit'] == datetime.date(2024, 5, 1)
+
+def test_undo_and_redo_restore_each_step():
+    form_data = make_form(2, 2)
+    history = FormHistory()
+    versions = []
+    for reading in ['100', '121', '144']:
+        form_data['canopies'][1]['sections'][0]['extract_tab_reading'] = reading
+        history.record(form_data)
+        versions.append(copy.deepcopy(form_data))
+
+    assert history.undo() == versions[1]
+    restored = history.undo()
+    assert restored == versions[0]
+    assert history.undo() is None
+
+    # The restored copy is mutable without touching the history
+    restored['client_name'] = 'Changed'
+    assert history.steps[0]['snapshot']['client_name'] == 'ACME'
+
+    assert history.redo() == versions[1]
+    assert history.redo() == versions[2]
+    assert history.redo() is None
+
+def test_re_initialising_after_undo_keeps_redo_steps():
+    form_data = make_form(1, 1)
+    history = FormHistory()
+    history.record(form_data)
+    form_data['client_name'] = 'Other'
+    history.record(form_data)
+
+    form_data = history.undo()
+    form_data['canopies'][0]['sections'][0]['anemometer_reading'] = 0.0  # Widgets filling in defaults
+    history.record(form_data)
+    assert history.can_redo()
+    assert history.redo()['client_name'] == 'Other'
+
+def test_new_edit_after_undo_drops_redo_steps():
+    form_data = make_form(1, 1)
+    history = FormHistory()
+    for name in ['A', 'B', 'C']:
+        form_data['client_name'] = name
+        history.record(form_data)
+
+    form_data = history.undo()
+    history.record(form_data)  # Re-initialisation after the undo
+    form_data['client_name'] = 'D'
+    history.record(form_data)
+
+    assert not history.can_redo()
+    assert [step['snapshot']['client_name'] for step in history.steps] == ['A', 'B', 'D']
+
+def test_history_is_bounded_by_steps_and_memory():
+    form_data = make_form(1, 1)
+    history = FormHistory(max_steps=5, max_bytes=0)
+    for i in range(20):
+        form_data['client_name'] = f'Client {i}'
+        history.record(form_data)
+    assert history.get_stats()['steps'] == 5
+    assert history.undo()['client_name'] == 'Client 18'
+
+    history = FormHistory(max_steps=100, max_bytes=20000)
+    for i in range(20):
+        form_data['client_name'] = 'x' * 5000 + str(i)
+        history.record(form_data)
+    assert history.history_bytes() <= 20000
+    assert history.steps[-1]['snapshot']['client_name'].endswith('19')
+
+def test_share_snapshot_reuses_previous_when_equal():
+    form_data = make_form(3, 3)
+    snapshot, _ = share_snapshot(form_data, None)
+    same, added = share_snapshot(copy.deepcopy(form_data), snapshot)
+    assert same is snapshot
+    assert added == 0
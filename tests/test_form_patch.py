@@ -0,0 +1,122 @@
+import pytest
+
+from src.utils.form_patch import PatchError, apply_patch, diff_form_data, merge_form_data
+
+def canopy(drawing_number='', model='', readings=()):
+    return {
+        'drawing_number': drawing_number,
+        'canopy_model': model,
+        'sections': [{'extract_tab_reading': reading} for reading in readings],
+    }
+
+BASE = {
+    'client_name': 'ACME',
+    'num_canopies': 1,
+    'canopies': [canopy('DWG-1', 'KVF', ['100', '120'])],
+}
+
+def test_diff_of_equal_documents_is_empty():
+    assert diff_form_data(BASE, dict(BASE)) == []
+
+def test_diff_is_one_small_operation_per_change():
+    new = {**BASE, 'client_name': 'ACME Foods', 'canopies': [canopy('DWG-1', 'KVF', ['100', '125'])]}
+    assert diff_form_data(BASE, new) == [
+        ['replace', '/canopies/0/sections/1/extract_tab_reading', '125'],
+        ['replace', '/client_name', 'ACME Foods'],
+    ]
+
+def test_diff_appends_and_removes_at_the_end_of_lists():
+    grown = {**BASE, 'canopies': BASE['canopies'] + [canopy('DWG-2')]}
+    assert diff_form_data(BASE, grown) == [['add', '/canopies/-', canopy('DWG-2')]]
+    assert diff_form_data(grown, BASE) == [['remove', '/canopies/1']]
+
+def test_diff_adds_and_removes_keys_and_escapes_them():
+    assert diff_form_data({'a/b': 1, 'old': 2}, {'a/b': 1, 'm~n': 3}) == [['add', '/m~0n', 3], ['remove', '/old']]
+
+def test_diff_replaces_values_that_change_type():
+    assert diff_form_data({'value': 1}, {'value': 1.0}) == [['replace', '/value', 1.0]]
+
+@pytest.mark.parametrize('new', [
+    {**BASE, 'client_name': 'Other', 'notes_list': ['a', 'b']},
+    {**BASE, 'canopies': [canopy('DWG-1', 'UVI', ['90']), canopy('DWG-2', 'KVF', ['1', '2', '3'])]},
+    {'client_name': 'ACME', 'canopies': []},
+])
+def test_apply_patch_of_a_diff_gives_the_new_document(new):
+    patched, skipped = apply_patch(BASE, diff_form_data(BASE, new))
+    assert patched == new
+    assert skipped == []
+
+def test_apply_patch_does_not_modify_the_document():
+    apply_patch(BASE, [['replace', '/canopies/0/drawing_number', 'X'], ['add', '/canopies/-', canopy()]])
+    assert BASE['canopies'][0]['drawing_number'] == 'DWG-1'
+    assert len(BASE['canopies']) == 1
+
+def test_apply_patch_inserts_at_a_list_index():
+    patched, _ = apply_patch({'items': [1, 3]}, [['add', '/items/1', 2]])
+    assert patched == {'items': [1, 2, 3]}
+
+@pytest.mark.parametrize('operation', [
+    ['remove', '/missing'],
+    ['replace', '/canopies/5', {}],
+    ['replace', '/canopies/x', {}],
+    ['replace', '/client_name/inner', 1],
+    ['move', '/client_name', 1],
+    ['remove', ''],
+])
+def test_apply_patch_raises_for_operations_that_do_not_fit(operation):
+    with pytest.raises(PatchError):
+        apply_patch(BASE, [operation])
+
+def test_apply_patch_skips_operations_that_do_not_fit_when_lenient():
+    patched, skipped = apply_patch(BASE, [['remove', '/missing'], ['replace', '/client_name', 'B']], lenient=True)
+    assert patched['client_name'] == 'B'
+    assert skipped == [['remove', '/missing']]
+
+def test_merge_keeps_edits_to_different_fields():
+    local = {**BASE, 'client_name': 'Local Client'}
+    remote_patch = [['replace', '/canopies/0/sections/0/extract_tab_reading', '105']]
+    merged, new_base, visible = merge_form_data(BASE, local, remote_patch)
+    assert merged['client_name'] == 'Local Client'
+    assert merged['canopies'][0]['sections'][0]['extract_tab_reading'] == '105'
+    assert new_base['client_name'] == 'ACME'
+    assert visible == remote_patch
+
+def test_merge_local_edit_wins_over_remote_edit_of_the_same_value():
+    local = {**BASE, 'client_name': 'Local'}
+    merged, _, visible = merge_form_data(BASE, local, [['replace', '/client_name', 'Remote']])
+    assert merged['client_name'] == 'Local'
+    assert visible == []
+
+def test_merge_drops_local_edits_to_removed_items():
+    local = {**BASE, 'canopies': [canopy('DWG-1', 'KVF', ['100', '130'])]}
+    merged, _, _ = merge_form_data(BASE, local, [['remove', '/canopies/0/sections/1']])
+    assert merged['canopies'][0]['sections'] == [{'extract_tab_reading': '100'}]
+
+def test_merge_pairs_items_appended_on_both_sides():
+    # Both sides add a second canopy: the office fills it in, the technician's is still blank
+    remote = {**BASE, 'num_canopies': 2, 'canopies': BASE['canopies'] + [canopy('DWG-2', 'UVI', ['80'])]}
+    local = {**BASE, 'num_canopies': 2, 'canopies': BASE['canopies'] + [canopy('', '', [''])]}
+    merged, new_base, visible = merge_form_data(BASE, local, diff_form_data(BASE, remote))
+    assert merged['num_canopies'] == 2
+    assert merged['canopies'] == remote['canopies']
+    assert new_base == remote
+    assert ['replace', '/canopies/1', canopy('DWG-2', 'UVI', ['80'])] in visible
+
+def test_merge_paired_items_keep_local_values_where_both_are_filled_in():
+    remote = {**BASE, 'canopies': BASE['canopies'] + [canopy('DWG-2', 'UVI', ['80', '90'])]}
+    local = {**BASE, 'canopies': BASE['canopies'] + [canopy('', 'KVF', ['85'])]}
+    merged, _, _ = merge_form_data(BASE, local, diff_form_data(BASE, remote))
+    assert merged['canopies'][1] == canopy('DWG-2', 'KVF', ['85', '90'])
+
+def test_merge_keeps_extra_local_appends():
+    remote = {**BASE, 'canopies': BASE['canopies'] + [canopy('DWG-2')]}
+    local = {**BASE, 'canopies': BASE['canopies'] + [canopy(), canopy('DWG-3')]}
+    merged, _, _ = merge_form_data(BASE, local, diff_form_data(BASE, remote))
+    assert [c['drawing_number'] for c in merged['canopies']] == ['DWG-1', 'DWG-2', 'DWG-3']
+
+def test_merge_is_the_same_on_both_sides_for_separate_edits():
+    local = {**BASE, 'client_name': 'Local'}
+    remote = {**BASE, 'canopies': [canopy('DWG-1', 'KVF', ['100', '140'])]}
+    merged_here, _, _ = merge_form_data(BASE, local, diff_form_data(BASE, remote))
+    merged_there, _, _ = merge_form_data(BASE, remote, diff_form_data(BASE, local))
+    assert merged_here == merged_there
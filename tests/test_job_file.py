@@ -0,0 +1,39 @@
+import datetime
+import zlib
+
+import msgpack
+import pytest
+
+from src.utils.job_file import JOB_FILE_MAGIC, SCHEMA_VERSION, JobFileError, decode_job_file, encode_job_file
+
+def envelope(form_data=None, **fields):
+    packed = {'schema': SCHEMA_VERSION, 'form_data': zlib.compress(msgpack.packb(form_data if form_data is not None else {}))}
+    packed.update(fields)
+    return JOB_FILE_MAGIC + msgpack.packb(packed, use_bin_type=True)
+
+def test_round_trip():
+    form_data = {'client_name': 'ACME', 'date_of_visit': datetime.date(2024, 5, 1), 'canopies': [{'sections': []}]}
+    blobs = {'signature': b'strokes', 'photo/' + 'a' * 64: b'\xff\xd8jpeg'}
+    assert decode_job_file(encode_job_file(form_data, blobs)) == (form_data, blobs)
+
+def test_plain_json_is_schema_0():
+    form_data, blobs = decode_job_file(b'{"client_name": "ACME", "signature_strokes": "M 1 2"}')
+    assert form_data['client_name'] == 'ACME'
+    assert blobs == {'signature': b'M 1 2'}
+
+@pytest.mark.parametrize('data', [
+    b'not a job file',
+    JOB_FILE_MAGIC + b'\xc1',  # Invalid msgpack
+    JOB_FILE_MAGIC + msgpack.packb([1, 2]),  # Not a map
+    JOB_FILE_MAGIC + msgpack.packb(5),
+    envelope(schema='1'),
+    envelope(schema=SCHEMA_VERSION + 1),
+    envelope(form_data=[1, 2]),
+    envelope(form_data='text'),
+    envelope(blobs=[b'photo']),
+    envelope(blobs={'signature': 'not bytes'}),
+    JOB_FILE_MAGIC + msgpack.packb({'schema': SCHEMA_VERSION, 'form_data': b'not deflated'}),
+])
+def test_invalid_files_raise_job_file_error(data):
+    with pytest.raises(JobFileError):
+        decode_job_file(data)
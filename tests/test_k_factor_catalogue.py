@@ -0,0 +1,78 @@
+import copy
+import json
+import os
+
+import pytest
+
+from src.config import K_FACTOR_CATALOGUE_PATH
+from src.utils import k_factor_catalogue
+from src.utils.k_factor_catalogue import compile_k_factor_catalogue, get_k_factor_catalogue
+
+with open(K_FACTOR_CATALOGUE_PATH) as f:
+    RAW = json.load(f)
+
+@pytest.fixture
+def catalogue_file(tmp_path, monkeypatch):
+    """A copy of the catalogue as the active catalogue file, checked for edits on every read."""
+    path = tmp_path / 'k_factors.json'
+    path.write_text(json.dumps(RAW))
+    monkeypatch.setattr(k_factor_catalogue, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(k_factor_catalogue, 'K_FACTOR_CATALOGUE_PATH', str(path))
+    monkeypatch.setattr(k_factor_catalogue, 'K_FACTOR_CATALOGUE_CHECK_INTERVAL', 0)
+    for name in ('_catalogue', '_catalogue_version', '_source_signature'):
+        monkeypatch.setattr(k_factor_catalogue, name, None)
+    return path
+
+def edit(path, content):
+    """Rewrite the file so its signature changes even within the filesystem's timestamp resolution."""
+    stat = os.stat(path)
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def test_load_compiles_the_catalogue_and_caches_it(catalogue_file):
+    catalogue = get_k_factor_catalogue()
+    assert catalogue['KVF'] == {'type': 'section_based', 'sections': {int(k): v for k, v in RAW['models']['KVF']['sections'].items()}}
+    assert os.listdir(k_factor_catalogue.CACHE_DIR)
+
+    # Touched but unchanged: served from the compiled cache
+    edit(catalogue_file, json.dumps(RAW, indent=4))
+    cached = k_factor_catalogue.load_k_factor_catalogue(str(catalogue_file))
+    assert cached == catalogue
+
+def test_edited_file_is_reloaded(catalogue_file):
+    version = k_factor_catalogue.get_k_factor_catalogue_version()
+    raw = copy.deepcopy(RAW)
+    raw['models']['KVF']['sections']['2'] = 150.0
+    edit(catalogue_file, raw)
+
+    assert get_k_factor_catalogue()['KVF']['sections'][2] == 150.0
+    assert k_factor_catalogue.get_k_factor_catalogue_version() != version
+
+def bad_catalogues():
+    def with_models(**models):
+        raw = copy.deepcopy(RAW)
+        raw['models'].update(models)
+        return raw
+    return [
+        '{"version": 1, "models": {',
+        [],
+        {**RAW, 'version': 2},
+        {key: value for key, value in RAW.items() if key != 'version'},
+        {**RAW, 'models': {}},
+        with_models(KVF='section_based'),
+        with_models(KVF=None),
+        with_models(KVF={'type': 'unknown'}),
+        with_models(KVF={'type': 'section_based', 'sections': [71.8]}),
+        with_models(KVF={'type': 'section_based', 'sections': {'one': 71.8}}),
+        with_models(KVF={'type': 'length_based', 'length_ranges': {}}),
+    ]
+
+@pytest.mark.parametrize('content', bad_catalogues())
+def test_bad_edit_keeps_the_last_good_catalogue(catalogue_file, content):
+    catalogue = get_k_factor_catalogue()
+    edit(catalogue_file, content)
+
+    if not isinstance(content, str):
+        with pytest.raises(ValueError):
+            compile_k_factor_catalogue(content)
+    assert get_k_factor_catalogue() is catalogue
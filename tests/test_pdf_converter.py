@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from src.config import REPORT_TEMPLATES, TEMPLATES_DIR
+from src.utils import pdf_converter
+from src.utils.document_generator import render_document
+from src.utils.output_optimizer import optimize_docx
+from src.utils.template_engine import BENCHMARK_FORM_DATA
+
+TEMPLATE = os.path.join(TEMPLATES_DIR, REPORT_TEMPLATES["Canopy Commissioning"])
+
+def restamp(data: bytes, date_time: tuple) -> bytes:
+    """The same document with every zip entry dated ``date_time``, as if it was rendered then."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(output, 'w') as target:
+        for info in source.infolist():
+            info.date_time = date_time
+            target.writestr(info, source.read(info.filename))
+    return output.getvalue()
+
+@pytest.fixture
+def stub_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_converter, 'PDF_CACHE_DIR', str(tmp_path))
+    pool = pdf_converter.PdfConverterPool('stub', size=1)
+    monkeypatch.setattr(pdf_converter, '_pool', pool)
+    yield pool
+    pool.shutdown()
+
+def test_same_report_converted_twice_uses_cache(stub_pool):
+    first = restamp(render_document(TEMPLATE, BENCHMARK_FORM_DATA), (2024, 5, 1, 9, 0, 0))
+    second = restamp(render_document(TEMPLATE, BENCHMARK_FORM_DATA), (2024, 5, 1, 9, 0, 10))
+    assert first != second
+
+    first_docx, _ = optimize_docx(first)
+    second_docx, _ = optimize_docx(second)
+    assert first_docx == second_docx
+
+    first_pdf = pdf_converter.convert_to_pdf(first_docx)
+    second_pdf = pdf_converter.convert_to_pdf(second_docx)
+    assert second_pdf == first_pdf
+    assert stub_pool.stats['conversions'] == 1
+
+def test_changed_report_is_converted_again(stub_pool):
+    changed = {**BENCHMARK_FORM_DATA, 'client_name': 'Another Client'}
+    pdf_converter.convert_to_pdf(optimize_docx(render_document(TEMPLATE, BENCHMARK_FORM_DATA))[0])
+    pdf_converter.convert_to_pdf(optimize_docx(render_document(TEMPLATE, changed))[0])
+    assert stub_pool.stats['conversions'] == 2
+
+class HangingStartConverter(pdf_converter.PdfConverter):
+    """Converter whose first instance never finishes starting until it is killed."""
+    instances = []
+
+    def __init__(self, index):
+        self.hangs = not self.instances
+        self.killed = threading.Event()
+        self.instances.append(self)
+
+    def start(self):
+        if self.hangs:
+            self.killed.wait(30)
+            raise pdf_converter.PdfConversionError("killed while starting")
+
+    def convert(self, docx_bytes):
+        return b'%PDF-1.4 ' + docx_bytes
+
+    def is_alive(self):
+        return not self.killed.is_set()
+
+    def kill(self):
+        self.killed.set()
+
+def test_timed_out_job_kills_a_converter_that_hangs_starting(monkeypatch):
+    monkeypatch.setitem(pdf_converter.CONVERTERS, 'hanging', HangingStartConverter)
+    monkeypatch.setattr(HangingStartConverter, 'instances', [])
+    pool = pdf_converter.PdfConverterPool('hanging', size=1)
+    try:
+        with pytest.raises(pdf_converter.PdfConversionError, match="timed out"):
+            pool.convert(b'report', timeout=0.5)
+        assert HangingStartConverter.instances[0].killed.is_set()
+
+        # The worker is free again and restarts its converter for the next job
+        assert pool.convert(b'next report', timeout=5) == b'%PDF-1.4 next report'
+        assert len(HangingStartConverter.instances) == 2
+    finally:
+        pool.shutdown()
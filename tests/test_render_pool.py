@@ -0,0 +1,78 @@
+import copy
+import io
+import os
+import time
+import zipfile
+
+import pytest
+
+from src.config import REPORT_TEMPLATES, TEMPLATES_DIR
+from src.utils import render_pool
+from src.utils.template_engine import BENCHMARK_FORM_DATA
+
+TEMPLATE = os.path.join(TEMPLATES_DIR, REPORT_TEMPLATES["Canopy Commissioning"])
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A warm render pool with a short timeout, so a hung worker fails the test instead of stalling it."""
+    monkeypatch.setattr(render_pool, 'RENDER_TIMEOUT', 20.0)
+    for name, value in [('_state', 'cold'), ('_renders', 0), ('_fallback_renders', 0), ('_restarts', 0), ('_error', None)]:
+        monkeypatch.setattr(render_pool, name, value)
+
+    render_pool.start_render_pool()
+    deadline = time.time() + 120
+    while render_pool._state == 'starting' and time.time() < deadline:
+        time.sleep(0.1)
+    assert render_pool._state == 'warm', render_pool._error
+    yield render_pool
+    render_pool.stop_render_pool()
+
+def media(document):
+    with zipfile.ZipFile(io.BytesIO(document)) as package:
+        return sorted(package.read(name) for name in package.namelist() if name.startswith('word/media/'))
+
+def test_pooled_render_draws_new_charts(pool):
+    from src.utils.document_generator import render_document
+
+    # Airflows the warm-up didn't chart, so the worker has to draw them
+    form_data = copy.deepcopy(BENCHMARK_FORM_DATA)
+    for i, canopy in enumerate(form_data['canopies']):
+        canopy['design_airflow'] = 0.61 + i / 100
+
+    start = time.perf_counter()
+    document = pool.render_report(TEMPLATE, form_data)
+    assert time.perf_counter() - start < pool.RENDER_TIMEOUT
+
+    status = pool.get_render_pool_status()
+    assert status['renders'] == 1
+    assert status['fallback_renders'] == 0
+    assert media(document) == media(render_document(TEMPLATE, form_data))
+
+def test_warm_up_leaves_fork_server_without_threads(pool):
+    pool.render_report(TEMPLATE, BENCHMARK_FORM_DATA)
+    status = pool.get_render_pool_status()
+    assert status['renders'] > 0
+    assert status['worker']['warmup_error'] is None
+    assert len(status['worker']['warmed_templates']) == len(REPORT_TEMPLATES)
+
+def test_timed_out_render_restarts_the_pool(pool, monkeypatch, tmp_path):
+    from src.utils import document_generator
+
+    # Opening a FIFO nobody writes to blocks, so the worker never finishes
+    stuck_template = str(tmp_path / 'stuck.docx')
+    os.mkfifo(stuck_template)
+    old_workers = list(pool._pool._pool)
+    with monkeypatch.context() as patch:
+        patch.setattr(pool, 'RENDER_TIMEOUT', 2.0)
+        patch.setattr(document_generator, 'render_document', lambda template_path, form_data: b'in-process')
+        assert pool.render_report(stuck_template, BENCHMARK_FORM_DATA) == b'in-process'
+    assert pool.get_render_pool_status()['restarts'] == 1
+
+    deadline = time.time() + 120
+    while pool._state != 'warm' and time.time() < deadline:
+        time.sleep(0.1)
+    assert pool.get_render_pool_status()['state'] == 'warm'
+    assert not any(worker.is_alive() for worker in old_workers)
+
+    pool.render_report(TEMPLATE, BENCHMARK_FORM_DATA)
+    assert pool.get_render_pool_status()['renders'] == 1
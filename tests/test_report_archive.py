@@ -0,0 +1,65 @@
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from src.utils import report_archive
+from src.utils.output_optimizer import optimize_docx
+
+FORM_DATA = {'client_name': 'ACME', 'project_number': 'P-1', 'report_type': 'Canopy Commissioning',
+             'canopies': [{'canopy_model': 'KVF'}, {'canopy_model': 'UVF'}]}
+
+def render(date_time, text='Airflow results'):
+    """A minimal .docx written at the given time, as python-docx stamps entries with the time of saving."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, content in [('[Content_Types].xml', '<Types/>'), ('_rels/.rels', '<Relationships/>'),
+                              ('word/document.xml', f'<w:document>{text}</w:document>')]:
+            target.writestr(zipfile.ZipInfo(name, date_time=date_time), content)
+    return output.getvalue()
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_archive, 'REPORT_ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setattr(report_archive, '_initialized', False)
+    monkeypatch.setattr(report_archive, '_local', threading.local())
+    return tmp_path
+
+def stored_objects(archive_dir):
+    return [name for _, _, names in os.walk(archive_dir / 'objects') for name in names]
+
+def test_same_report_rendered_twice_is_stored_once(archive_dir):
+    first = report_archive.archive_report(render((2024, 5, 6, 9, 0, 0)), FORM_DATA, 'ACME_P-1.docx')
+    second = report_archive.archive_report(render((2024, 5, 6, 9, 0, 2)), FORM_DATA, 'ACME_P-1.docx')
+
+    assert first == second
+    assert report_archive.get_report(first)['generations'] == 2
+    assert report_archive.get_report(first)['models'] == 'KVF, UVF'
+    assert len(stored_objects(archive_dir)) == 1
+
+def test_optimized_report_rendered_twice_is_stored_once(archive_dir):
+    first = report_archive.archive_report(optimize_docx(render((2024, 5, 6, 9, 0, 0)))[0], FORM_DATA, 'r.docx')
+    second = report_archive.archive_report(optimize_docx(render((2024, 5, 6, 9, 0, 2)))[0], FORM_DATA, 'r.docx')
+
+    assert first == second
+    assert len(stored_objects(archive_dir)) == 1
+
+def test_optimized_report_is_archived_as_downloaded(archive_dir):
+    optimized = optimize_docx(render((2024, 5, 6, 9, 0, 0)))[0]
+    sha256 = report_archive.archive_report(optimized, FORM_DATA, 'r.docx')
+    assert report_archive.read_report(sha256) == optimized
+
+def test_different_reports_are_stored_separately(archive_dir):
+    first = report_archive.archive_report(render((2024, 5, 6, 9, 0, 0)), FORM_DATA, 'r.docx')
+    second = report_archive.archive_report(render((2024, 5, 6, 9, 0, 0), 'Other results'), FORM_DATA, 'r.docx')
+
+    assert first != second
+    assert report_archive.get_archive_stats()['reports'] == 2
+    assert len(stored_objects(archive_dir)) == 2
+
+def test_pdf_is_kept_with_the_report(archive_dir):
+    sha256 = report_archive.archive_report(render((2024, 5, 6, 9, 0, 0)), FORM_DATA, 'r.docx', pdf=b'%PDF-1.7')
+    report_archive.archive_report(render((2024, 5, 6, 9, 0, 2)), FORM_DATA, 'r.docx')
+    assert report_archive.read_report(sha256, pdf=True) == b'%PDF-1.7'
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+from src.utils.schedule_importer import read_schedule, validate_schedule
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_errors_name_the_file_row_after_blank_lines():
+    data = (b"Drawing No,Model,Sections,Design Airflow\n"
+            b"D1,KVF,2,0.5\n"
+            b"\n"
+            b",,,\n"
+            b"D2,NOPE,2,0.5\n"
+            b"D3,KVF,two,0.5\n")
+    canopies, errors = validate_schedule(read_schedule('schedule.csv', data))
+    assert canopies == []
+    assert errors == ["Row 6: 'number_of_sections' is not a number", "Row 5: unknown canopy model 'NOPE'"]
+
+def test_blank_lines_are_not_imported():
+    data = b"Drawing No,Model,Sections\nD1,KVF,2\n\n\nD2,KVI,3\n\n"
+    canopies, errors = validate_schedule(read_schedule('schedule.csv', data))
+    assert errors == []
+    assert [canopy['drawing_number'] for canopy in canopies] == ['D1', 'D2']
+
+def test_invalid_max_canopies_setting_falls_back_to_the_default():
+    for value in ('twenty', '0', ''):
+        result = subprocess.run([sys.executable, '-c', 'from src.config import MAX_CANOPIES; print(MAX_CANOPIES)'],
+                                capture_output=True, text=True, cwd=ROOT, env={**os.environ, 'CANOPY_MAX_CANOPIES': value})
+        assert result.stdout.strip() == '20', result.stderr
@@ -0,0 +1,33 @@
+import copy
+
+import pytest
+
+from src.components import section_grid_editor
+from src.utils import derived_values
+from src.utils.template_engine import BENCHMARK_FORM_DATA
+
+@pytest.fixture
+def form_data(monkeypatch):
+    """The benchmark job as the current form data (outside a session, derived values need it passed in)."""
+    form_data = copy.deepcopy(BENCHMARK_FORM_DATA)
+    form_data['canopies'][0]['sections'] = [dict(section, extract_tab_reading=str(100 + 10 * s))
+                                            for s, section in enumerate(form_data['canopies'][0]['sections'])]
+    monkeypatch.setattr(section_grid_editor, 'get_derived_value',
+                        lambda name, *args: derived_values.get_derived_value(name, *args, form_data=form_data))
+    return form_data
+
+@pytest.mark.parametrize('canopy_index', [0, 1], ids=['KVF', 'CXW'])
+def test_grid_shows_the_derived_flowrates(form_data, canopy_index):
+    canopy = form_data['canopies'][canopy_index]
+    grid = section_grid_editor.build_section_grid(canopy, with_marvel=False)
+    calculated = section_grid_editor.calculate_section_grid(canopy_index, grid)
+
+    expected = [derived_values.get_derived_value('extract_flowrate', canopy_index, s, form_data=form_data)[1]
+                for s in range(len(grid))]
+    assert calculated['flowrate_m3s'].tolist() == [round(flowrate, 3) for flowrate in expected]
+    assert all(flowrate > 0 for flowrate in expected)
+    if canopy_index == 0:
+        assert calculated['k_factor'].tolist() == [
+            derived_values.get_derived_value('extract_k_factor', 0, s, form_data=form_data) for s in range(len(grid))]
+    else:
+        assert 'k_factor' not in calculated.columns
@@ -0,0 +1,115 @@
+import os
+import types
+
+import pytest
+import streamlit.runtime.scriptrunner_utils.script_run_context as script_run_context
+from streamlit.runtime.state import SafeSessionState, SessionState
+
+from src.utils import session_memory
+from src.utils.session_memory import SpilledPayload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    """Fake script run contexts: ``run(state)`` makes a run of the session with that SessionState current."""
+    monkeypatch.setattr(session_memory, 'SESSION_SPILL_DIR', str(tmp_path))
+    monkeypatch.setattr(session_memory, '_sessions', {})
+    current = {}
+    monkeypatch.setattr(script_run_context, 'get_script_run_ctx', lambda suppress_warning=False: current.get('ctx'))
+
+    def run(state, session_id='session'):
+        # Like the ScriptRunner, every run wraps the session's SessionState in a new SafeSessionState
+        current['ctx'] = types.SimpleNamespace(session_id=session_id, session_state=SafeSessionState(state, lambda: None))
+        return current['ctx'].session_state
+    return run
+
+def make_idle(session_id='session'):
+    session_memory._sessions[session_id]['last_seen'] -= 10 ** 6
+
+def new_state():
+    state = SessionState()
+    state['form_data'] = {'client_name': 'ACME', 'canopies': [{'drawing_number': 'x' * 40000}]}
+    state['form_history'] = {'steps': ['y' * 40000]}
+    return state
+
+def test_idle_session_is_spilled_and_restored_on_its_next_run(sessions):
+    state = new_state()
+    sessions(state)
+    with session_memory.track_session():
+        pass
+    make_idle()
+
+    assert session_memory.sweep_idle_sessions(force=True) > 0
+    assert isinstance(state['form_history'], SpilledPayload)
+    assert isinstance(state['form_data']['canopies'], SpilledPayload)
+
+    session_state = sessions(state)
+    with session_memory.track_session():
+        assert session_state['form_history'] == {'steps': ['y' * 40000]}
+        assert session_state['form_data']['canopies'][0]['drawing_number'] == 'x' * 40000
+
+def test_callback_sees_restored_payloads(sessions):
+    state = new_state()
+    sessions(state)
+    with session_memory.track_session():
+        pass
+    make_idle()
+    session_memory.sweep_idle_sessions(force=True)
+
+    seen = []
+
+    @session_memory.session_callback
+    def callback():
+        seen.append((state['form_history'], state['form_data']['canopies']))
+
+    # Streamlit runs callbacks before the script body (and so before track_session())
+    sessions(state)
+    callback()
+    assert seen == [({'steps': ['y' * 40000]}, [{'drawing_number': 'x' * 40000}])]
+
+def test_failed_spill_is_rolled_back(sessions, monkeypatch):
+    state = new_state()
+    sessions(state)
+    with session_memory.track_session():
+        pass
+    make_idle()
+
+    write_payload = session_memory._write_payload
+    writes = []
+
+    def failing_write(directory, label, value):
+        if writes:
+            raise OSError("No space left on device")
+        writes.append(label)
+        return write_payload(directory, label, value)
+    monkeypatch.setattr(session_memory, '_write_payload', failing_write)
+
+    assert session_memory.sweep_idle_sessions(force=True) == 0
+    assert writes  # The first payload was spilled before the failure
+    assert state['form_data']['canopies'] == [{'drawing_number': 'x' * 40000}]
+    assert state['form_history'] == {'steps': ['y' * 40000]}
+    assert session_memory._sessions['session']['spilled_bytes'] == 0
+
+def test_undo_after_idle_spill(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    from src.utils import render_pool
+
+    monkeypatch.setattr(session_memory, 'SESSION_SPILL_DIR', str(tmp_path))
+    monkeypatch.setattr(render_pool, 'RENDER_WORKERS', 0)
+    monkeypatch.chdir(ROOT)
+
+    app = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=60).run()
+    app.text_input(key='client_name').set_value('ACME').run()
+    app.session_state['form_data']['notes'] = 'n' * 40000
+    app.run()
+
+    for entry in session_memory._sessions.values():
+        entry['last_seen'] -= 10 ** 6
+    session_memory.sweep_idle_sessions(force=True)
+    assert isinstance(app.session_state['form_history'], SpilledPayload)
+
+    app.button(key='undo_form_change').click().run()
+    assert not app.exception
+    assert 'notes' not in app.session_state['form_data']
+    assert app.session_state['form_data']['client_name'] == 'ACME'
@@ -0,0 +1,40 @@
+import copy
+import io
+import os
+
+import pytest
+
+from src.config import REPORT_TEMPLATES, TEMPLATES_DIR
+from src.utils import photo_store
+from src.utils.template_engine import BENCHMARK_FORM_DATA, benchmark_template
+
+def sample_photo(tmp_path, monkeypatch):
+    """A processed photo in a temporary photo store."""
+    import hashlib
+    from PIL import Image
+
+    monkeypatch.setattr(photo_store, 'PHOTO_DIR', str(tmp_path))
+    output = io.BytesIO()
+    Image.new('RGB', (640, 480), (200, 120, 40)).save(output, 'JPEG')
+    image, thumbnail = photo_store.process_photo(output.getvalue())
+    photo_id = hashlib.sha256(image).hexdigest()
+    assert photo_store.store_photo(photo_id, image, thumbnail)
+    return photo_id
+
+@pytest.mark.parametrize('template', sorted(set(REPORT_TEMPLATES.values())))
+def test_output_matches_docxtpl_with_images(template, tmp_path, monkeypatch):
+    form_data = copy.deepcopy(BENCHMARK_FORM_DATA)
+    photo_id = sample_photo(tmp_path, monkeypatch)
+    form_data['canopies'][0]['photos'] = [{'id': photo_id, 'caption': 'Canopy <1> & filters'}]
+    form_data['edge_box'] = {'photos': [{'id': photo_id, 'caption': ''}]}
+
+    result = benchmark_template(os.path.join(TEMPLATES_DIR, template), form_data, runs=1)
+    assert result['differences'] == []
+
+@pytest.mark.parametrize('separator', ['\n', '\t', '\a', '\f'])
+def test_output_matches_docxtpl_with_listing_characters(separator):
+    form_data = copy.deepcopy(BENCHMARK_FORM_DATA)
+    form_data['notes_list'] = [f'Filters cleaned{separator}Lights replaced']
+
+    template = os.path.join(TEMPLATES_DIR, REPORT_TEMPLATES["Canopy Commissioning"])
+    assert benchmark_template(template, form_data, runs=1)['differences'] == []
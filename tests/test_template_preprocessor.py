@@ -0,0 +1,42 @@
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.utils.template_preprocessor import recompress_image
+
+def png(image):
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+def photo():
+    """A gradient with sensor-like noise - thousands of colours."""
+    rng = random.Random(3)
+    image = Image.new('RGB', (256, 64))
+    image.putdata([(x, min(255, y * 4 + rng.randrange(8)), (x + y + rng.randrange(8)) % 256) for y in range(64) for x in range(256)])
+    return image
+
+def logo(mode):
+    image = Image.new(mode, (200, 80), (255, 255, 255, 0) if mode == 'RGBA' else (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((10, 10, 100, 60), fill=(200, 30, 30, 255) if mode == 'RGBA' else (200, 30, 30))
+    draw.ellipse((110, 10, 190, 70), fill=(20, 60, 200, 255) if mode == 'RGBA' else (20, 60, 200))
+    return image
+
+@pytest.mark.parametrize('image', [photo(), logo('RGB'), logo('RGBA'), logo('RGB').convert('RGBA')],
+                         ids=['photo', 'logo', 'transparent logo', 'opaque RGBA logo'])
+def test_png_recompression_is_lossless(image):
+    recompressed = Image.open(io.BytesIO(recompress_image('word/media/image1.png', png(image))))
+    assert recompressed.convert('RGBA').tobytes() == image.convert('RGBA').tobytes()
+
+def test_few_colour_png_becomes_a_palette_image():
+    data = png(logo('RGB'))
+    recompressed = recompress_image('word/media/image1.png', data)
+    assert len(recompressed) < len(data)
+    assert Image.open(io.BytesIO(recompressed)).mode == 'P'
+
+def test_many_colour_png_keeps_full_colour():
+    recompressed = recompress_image('word/media/image1.png', png(photo()))
+    assert Image.open(io.BytesIO(recompressed)).mode == 'RGB'